@@ -0,0 +1,330 @@
+import numpy as np
+
+from engine import (Engine, Move, DECK, DRAW, RESERVE, FINAL, TABLEAU,
+                    RANK_MASK, SUIT_MASK, RED_BIT, HIDDEN_BIT, KING)
+
+# Pakiet wielu gier (poziom łatwy - dobieranie po jednej karcie) przechowywany jako tablice NumPy,
+# w których każdy wiersz to jedna gra: wszystkie gry sprawdzają i wykonują ruchy jednocześnie,
+# operacjami na całych tablicach, bez pętli po grach w Pythonie. Przeznaczony do masowych losowych
+# partii (analizy Monte Carlo); pojedynczą grę można przenieść do silnika i z powrotem
+# (from_engines, to_engine).
+#
+# Reguły są takie same jak w silniku (Engine._can_place_on_final, Engine._can_place_on_tableau,
+# legal_moves), z jedną różnicą w numeracji: kupki końcowe są przypisane do kolorów (kupka s to
+# kolor SUITS[s]), więc As ma jeden ruch na kupkę końcową zamiast ruchu na każdą pustą kupkę.
+
+MAX_ROWS = 19   # Najwyższa możliwa kolumna: 6 kart zakrytych i pełny ciąg od Króla do Asa
+STOCK_SIZE = 24 # Karty rezerwy (stos i waste razem)
+NONE = 0xFF     # Brak karty (pusta aktywna karta rezerwy, pola poza kolumną)
+
+# Numeracja ruchów w tablicy dozwolonych ruchów (legal_moves): stała lista "miejsc" na ruch.
+# Ruch między kolumnami ma jedno miejsce na parę kolumn - w ciągu kart każda wartość występuje
+# najwyżej raz, więc liczba przenoszonych kart wynika z karty na wierzchu kolumny docelowej.
+SLOT_DRAW = 0
+SLOT_RESERVE_FINAL = 1
+SLOT_RESERVE_TABLEAU = 2   # + kolumna docelowa (7 miejsc)
+SLOT_TABLEAU_FINAL = 9     # + kolumna źródłowa (7 miejsc)
+SLOT_TABLEAU_TABLEAU = 16  # + 7 * kolumna źródłowa + kolumna docelowa (49 miejsc, bez ruchów na tę samą kolumnę)
+SLOT_FINAL_TABLEAU = 65    # + 7 * kolor + kolumna docelowa (28 miejsc)
+MOVE_SLOTS = 93
+
+_RED_SUITS = np.array([0, RED_BIT, RED_BIT, 0], dtype=np.uint8) # Bit czerwieni dla kolorów ♠ ♥ ♦ ♣
+_COLUMN_STARTS = [i * (i + 1) // 2 for i in range(7)]            # Pierwsza karta kolumny w potasowanej talii
+
+# Kod karty o podanych wartościach i kolorach (tablice), jak engine.card_code
+def _card_codes(ranks, suits):
+    return (ranks.astype(np.uint8) | (suits.astype(np.uint8) << 4) | _RED_SUITS[suits]).astype(np.uint8)
+
+# Reguły układania kart jako tablice odczytywane dla wszystkich gier naraz. Karta jest w nich
+# opisana kluczem - kodem bez bitu czerwieni (wartość i kolor, 0-63); klucz _EMPTY (wartość 15,
+# której nie ma żadna karta) oznacza pustą kolumnę albo brak karty.
+_KEY_MASK = RANK_MASK | SUIT_MASK
+_EMPTY = _KEY_MASK
+_NO_RUN = _EMPTY * 16 # Klucz kolumny bez odkrytych kart (wierzch _EMPTY - nic nie pasuje)
+_COLUMNS = np.arange(7)
+_SUIT_KEYS = np.arange(4) << 4
+
+def _build_rule_tables():
+    keys = np.arange(64)
+    ranks = keys & RANK_MASK
+    red = _RED_SUITS[keys >> 4] != 0
+    card_ranks, card_red = ranks[:, None], red[:, None]
+    top_ranks, top_red = ranks[None, :], red[None, :]
+    empty = top_ranks == _EMPTY & RANK_MASK
+    # _ACCEPTS[karta, wierzch kolumny]: czy kartę można położyć na kolumnie (Engine._can_place_on_tableau)
+    accepts = np.where(empty, card_ranks == KING, (top_ranks == card_ranks + 1) & (top_red != card_red))
+    accepts &= card_ranks <= KING
+    # _RUN_COUNTS[wierzch ciągu * 16 + wartość najniższej karty ciągu, wierzch kolumny docelowej]:
+    # ile kart ciągu trzeba przenieść, żeby pierwsza z nich pasowała do kolumny docelowej (0 - żadna
+    # nie pasuje). Kolory w ciągu się przeplatają, więc karta o wartości needed ma kolor wierzchniej
+    # karty ciągu, jeśli różnica wartości jest parzysta.
+    run_tops = np.repeat(keys, 16)[:, None]
+    run_bases = np.tile(np.arange(16), 64)[:, None]
+    run_top_ranks = run_tops & RANK_MASK
+    needed = np.where(empty, KING, top_ranks - 1)
+    needed_red = red[run_tops] ^ (((needed - run_top_ranks) & 1) == 1)
+    fits = (needed >= run_top_ranks) & (needed <= run_bases) & (run_top_ranks <= KING) & \
+        (empty | (needed_red != top_red))
+    run_counts = np.where(fits, needed - run_top_ranks + 1, 0).astype(np.int8)
+    return accepts.ravel(), run_counts.ravel()
+
+_ACCEPTS, _RUN_COUNTS = _build_rule_tables()
+
+class GameBatch:
+    def __init__(self, games):
+        self.size = games
+        self.cards = np.full((games, 7, MAX_ROWS), NONE, dtype=np.uint8) # Karty kolumn (bez bitu zakrycia)
+        self.heights = np.zeros((games, 7), dtype=np.int16)              # Liczba kart w kolumnie
+        self.first_up = np.zeros((games, 7), dtype=np.int16)             # Liczba kart zakrytych w kolumnie
+        self.foundation = np.zeros((games, 4), dtype=np.int16)           # Liczba kart każdego koloru na kupkach końcowych
+        self.stock = np.full((games, STOCK_SIZE), NONE, dtype=np.uint8)  # Stos rezerwowy (wierzch na pozycji stock_len - 1)
+        self.stock_len = np.zeros(games, dtype=np.int16)
+        self.waste = np.full((games, STOCK_SIZE), NONE, dtype=np.uint8)  # Waste (wierzch na pozycji waste_len - 1)
+        self.waste_len = np.zeros(games, dtype=np.int16)
+        self.current = np.full(games, NONE, dtype=np.uint8)              # Aktywna karta rezerwy
+        self.revealed = np.zeros(games, dtype=bool)                      # Czy dobrano już kartę (Engine.first_reveal_done)
+        self.move_count = np.zeros(games, dtype=np.int32)
+
+    # Maska kart zakrytych (games, 7, MAX_ROWS)
+    @property
+    def hidden_mask(self):
+        return np.arange(MAX_ROWS) < self.first_up[:, :, None]
+
+    # Nowe, losowo potasowane rozdania (generator NumPy - inne niż rozdania o numerach z gry)
+    @classmethod
+    def random_deals(cls, games, rng=None):
+        rng = np.random.default_rng(rng)
+        decks = rng.permuted(np.tile(np.array(DECK, dtype=np.uint8), (games, 1)), axis=1)
+        batch = cls(games)
+        for col, start in enumerate(_COLUMN_STARTS):
+            batch.cards[:, col, :col + 1] = decks[:, start:start + col + 1]
+            batch.heights[:, col] = col + 1
+            batch.first_up[:, col] = col
+        batch.stock[:] = decks[:, :27:-1] # Pierwsza karta rezerwy (deck[28]) na wierzchu stosu
+        batch.stock_len[:] = STOCK_SIZE
+        return batch
+
+    # Rozdania o podanych numerach - te same, co w grze
+    @classmethod
+    def from_deals(cls, deal_numbers):
+        engines = []
+        for deal_number in deal_numbers:
+            engine = Engine('łatwy')
+            engine.new_deal(deal_number)
+            engines.append(engine)
+        return cls.from_engines(engines)
+
+    # Pakiet ze stanów silników (np. pozycji w trakcie gry); tylko poziom łatwy
+    @classmethod
+    def from_engines(cls, engines):
+        batch = cls(len(engines))
+        for game, engine in enumerate(engines):
+            if engine.difficulty != 'łatwy':
+                raise ValueError("Pakiet gier obsługuje tylko poziom łatwy (dobieranie po jednej karcie).")
+            for col, column in enumerate(engine.tableau):
+                batch.cards[game, col, :len(column)] = [card & ~HIDDEN_BIT for card in column]
+                batch.heights[game, col] = len(column)
+                batch.first_up[game, col] = engine.column_info(col).first_up
+            batch.foundation[game] = engine.foundation_heights
+            stock = engine.reserve_stock[::-1]
+            batch.stock[game, :len(stock)] = stock
+            batch.stock_len[game] = len(stock)
+            waste = engine.waste_pile
+            batch.waste[game, :len(waste)] = waste
+            batch.waste_len[game] = len(waste)
+            batch.current[game] = NONE if engine.current_reserve_card is None else engine.current_reserve_card
+            batch.revealed[game] = engine.first_reveal_done
+            batch.move_count[game] = engine.move_count
+        return batch
+
+    # Silnik w stanie gry o podanym numerze (kupka końcowa s zawiera kolor s)
+    def to_engine(self, game):
+        engine = Engine('łatwy')
+        for col in range(7):
+            column = self.cards[game, col, :self.heights[game, col]].tolist()
+            for row in range(self.first_up[game, col]):
+                column[row] |= HIDDEN_BIT
+            engine.tableau[col] = column
+        for suit in range(4):
+            height = int(self.foundation[game, suit])
+            engine.final_stacks[suit] = _card_codes(np.arange(height), np.full(height, suit)).tolist()
+        engine.foundation_heights = self.foundation[game].tolist()
+        engine.set_reserve(self.stock[game, :self.stock_len[game]].tolist()[::-1],
+                           self.waste[game, :self.waste_len[game]].tolist())
+        current = int(self.current[game])
+        engine.current_reserve_card = None if current == NONE else current
+        engine.first_reveal_done = bool(self.revealed[game])
+        engine.move_count = int(self.move_count[game])
+        return engine
+
+    # Ruch silnika odpowiadający miejscu slot w grze game (przed wykonaniem ruchu)
+    def slot_move(self, game, slot):
+        if slot == SLOT_DRAW:
+            return DRAW
+        if slot == SLOT_RESERVE_FINAL:
+            return Move(RESERVE, 0, FINAL, (int(self.current[game]) & SUIT_MASK) >> 4, 1)
+        if slot < SLOT_TABLEAU_FINAL:
+            return Move(RESERVE, 0, TABLEAU, slot - SLOT_RESERVE_TABLEAU, 1)
+        if slot < SLOT_TABLEAU_TABLEAU:
+            src = slot - SLOT_TABLEAU_FINAL
+            top = int(self.cards[game, src, self.heights[game, src] - 1])
+            return Move(TABLEAU, src, FINAL, (top & SUIT_MASK) >> 4, 1)
+        if slot < SLOT_FINAL_TABLEAU:
+            src, dst = divmod(slot - SLOT_TABLEAU_TABLEAU, 7)
+            tops, runs = self._column_keys([game])
+            return Move(TABLEAU, src, TABLEAU, dst, int(self._run_counts(tops, runs)[0, src, dst]))
+        suit, dst = divmod(slot - SLOT_FINAL_TABLEAU, 7)
+        return Move(FINAL, suit, TABLEAU, dst, 1)
+
+    # Klucze (kod karty bez bitu czerwieni, _KEY_MASK) wierzchnich kart kolumn - dla pustych _EMPTY -
+    # oraz klucze ciągów odkrytych kart (_RUN_COUNTS) - dla kolumn bez odkrytych kart _NO_RUN
+    def _column_keys(self, games=slice(None)):
+        heights = self.heights[games]
+        first_up = self.first_up[games]
+        rows = np.arange(len(heights))[:, None]
+        cards = self.cards[games]
+        tops = np.where(heights > 0, cards[rows, _COLUMNS, np.maximum(heights - 1, 0)] & _KEY_MASK, _EMPTY)
+        bases = cards[rows, _COLUMNS, np.minimum(first_up, MAX_ROWS - 1)] & RANK_MASK
+        runs = np.where(heights > first_up, tops.astype(np.int32) * 16 + bases, _NO_RUN)
+        return tops, runs
+
+    # Liczba kart przenoszonych z kolumny src na kolumnę dst (games, 7, 7); 0 - ruch niemożliwy
+    @staticmethod
+    def _run_counts(tops, runs):
+        return _RUN_COUNTS.take(runs[:, :, None] * 64 + tops[:, None, :])
+
+    # Dozwolone ruchy gier games (tablica numerów; domyślnie wszystkich): tablica (len(games), MOVE_SLOTS)
+    # wartości logicznych oraz liczba przenoszonych kart dla ruchów między kolumnami (len(games), 7, 7),
+    # wiersz i dla gry games[i]. Reguły układania kart są sprawdzane przez odczyt z tablic _ACCEPTS
+    # i _RUN_COUNTS (jedna operacja na wszystkie gry).
+    def legal_moves(self, games=None):
+        size = self.size if games is None else len(games)
+        if games is None:
+            games = slice(None) # Widoki całych tablic zamiast kopii wybranych wierszy
+        tops, runs = self._column_keys(games)
+        rows = np.arange(size)
+        foundation = self.foundation[games]
+        legal = np.empty((size, MOVE_SLOTS), dtype=bool)
+        legal[:, SLOT_DRAW] = (self.stock_len[games] > 0) | (self.waste_len[games] > 0) | (self.current[games] != NONE)
+
+        current = np.where(self.revealed[games], self.current[games] & _KEY_MASK, _EMPTY) # Bez aktywnej karty: _EMPTY
+        legal[:, SLOT_RESERVE_FINAL] = (current != _EMPTY) & \
+            (foundation[rows, current >> 4] == (current & RANK_MASK))
+        legal[:, SLOT_RESERVE_TABLEAU:SLOT_TABLEAU_FINAL] = _ACCEPTS.take(current[:, None].astype(np.int32) * 64 + tops)
+
+        legal[:, SLOT_TABLEAU_FINAL:SLOT_TABLEAU_TABLEAU] = (runs != _NO_RUN) & \
+            (np.take_along_axis(foundation, tops >> 4, axis=1) == (tops & RANK_MASK))
+
+        counts = self._run_counts(tops, runs)
+        legal[:, SLOT_TABLEAU_TABLEAU:SLOT_FINAL_TABLEAU] = (counts > 0).reshape(size, 49)
+
+        # Wierzchnie karty kupek końcowych (kolor s, wartość o jeden mniejsza od wysokości kupki)
+        final_tops = np.where(foundation > 0, _SUIT_KEYS + foundation - 1, _EMPTY)
+        legal[:, SLOT_FINAL_TABLEAU:] = _ACCEPTS.take(final_tops[:, :, None].astype(np.int32) * 64
+                                                      + tops[:, None, :]).reshape(size, 28)
+        return legal, counts
+
+    # Gry, które da się dokończyć samymi ruchami na kupki końcowe (jak Engine.can_auto_finish)
+    def can_auto_finish(self):
+        return (self.stock_len == 0) & (self.waste_len == 0) & (self.current == NONE) & (self.first_up == 0).all(axis=1)
+
+    # Wykonuje w każdej grze z maską active jeden losowy dozwolony ruch (każdy z równym
+    # prawdopodobieństwem); zwraca maskę gier, w których wykonano ruch. Ruchy są wyliczane
+    # tylko dla gier z maską active.
+    def random_step(self, rng, active=None):
+        games = np.arange(self.size) if active is None else np.nonzero(active)[0]
+        legal, counts = self.legal_moves(None if len(games) == self.size else games)
+        can_move = legal.any(axis=1)
+        # Losowe klucze (16 bitów, nieparzyste - ruch dozwolony ma zawsze klucz większy od zera),
+        # z których wybierany jest największy spośród ruchów dozwolonych
+        keys = np.frombuffer(rng.bytes(legal.size * 2), dtype=np.uint16).reshape(legal.shape) | 1
+        slots = (keys * legal).argmax(axis=1)
+        self.apply_slots(games[can_move], slots[can_move], counts[can_move])
+        moved = np.zeros(self.size, dtype=bool)
+        moved[games[can_move]] = True
+        return moved
+
+    # Wykonuje w grach games (tablica numerów) ruchy o numerach slots; counts pochodzi z legal_moves(games)
+    # dla tego samego stanu (wiersz i dla gry games[i]). Ruchy muszą być dozwolone - nie są ponownie
+    # sprawdzane.
+    def apply_slots(self, games, slots, counts):
+        self.move_count[games] += 1
+        self._draw(games[slots == SLOT_DRAW])
+
+        selected = (slots >= SLOT_RESERVE_FINAL) & (slots < SLOT_TABLEAU_FINAL)
+        g = games[selected]
+        cards = self.current[g]
+        self.current[g] = NONE
+        to_final = slots[selected] == SLOT_RESERVE_FINAL
+        self.foundation[g[to_final], (cards[to_final] & SUIT_MASK) >> 4] += 1
+        self._push(g[~to_final], slots[selected][~to_final] - SLOT_RESERVE_TABLEAU, cards[~to_final])
+
+        selected = (slots >= SLOT_TABLEAU_FINAL) & (slots < SLOT_TABLEAU_TABLEAU)
+        g = games[selected]
+        src = slots[selected] - SLOT_TABLEAU_FINAL
+        self.heights[g, src] -= 1
+        cards = self.cards[g, src, self.heights[g, src]]
+        self.foundation[g, (cards & SUIT_MASK) >> 4] += 1
+        self._flip(g, src)
+
+        selected = (slots >= SLOT_TABLEAU_TABLEAU) & (slots < SLOT_FINAL_TABLEAU)
+        g = games[selected]
+        src, dst = np.divmod(slots[selected] - SLOT_TABLEAU_TABLEAU, 7)
+        count = counts[np.nonzero(selected)[0], src, dst]
+        src_start = self.heights[g, src] - count
+        dst_start = self.heights[g, dst]
+        for offset in range(int(count.max()) if len(count) else 0):
+            m = offset < count
+            self.cards[g[m], dst[m], dst_start[m] + offset] = self.cards[g[m], src[m], src_start[m] + offset]
+        self.heights[g, src] = src_start
+        self.heights[g, dst] = dst_start + count
+        self._flip(g, src)
+
+        selected = slots >= SLOT_FINAL_TABLEAU
+        g = games[selected]
+        suit, dst = np.divmod(slots[selected] - SLOT_FINAL_TABLEAU, 7)
+        self.foundation[g, suit] -= 1
+        self._push(g, dst, _card_codes(self.foundation[g, suit], suit))
+
+    # Dobranie karty (jak Engine._draw_from_stock na poziomie łatwym): aktywna karta trafia do waste,
+    # pusty stos jest uzupełniany z waste, a wierzchnia karta stosu staje się aktywna
+    def _draw(self, g):
+        self.revealed[g] = True
+        had_card = g[self.current[g] != NONE]
+        self.waste[had_card, self.waste_len[had_card]] = self.current[had_card]
+        self.waste_len[had_card] += 1
+        self.current[g] = NONE
+        # Silnik na poziomie łatwym odwraca kolejność waste (Engine._recycle_waste), więc pierwsza
+        # dobrana jest ostatnia karta waste - tu stos ma wierzch na końcu, więc to zwykłe skopiowanie
+        recycle = g[(self.stock_len[g] == 0) & (self.waste_len[g] > 0)]
+        self.stock[recycle] = self.waste[recycle]
+        self.stock_len[recycle] = self.waste_len[recycle]
+        self.waste_len[recycle] = 0
+        drawn = g[self.stock_len[g] > 0]
+        self.stock_len[drawn] -= 1
+        self.current[drawn] = self.stock[drawn, self.stock_len[drawn]]
+
+    def _push(self, g, cols, cards):
+        self.cards[g, cols, self.heights[g, cols]] = cards
+        self.heights[g, cols] += 1
+
+    # Odkrywa wierzchnią kartę kolumn, w których po zdjęciu kart zostały same zakryte
+    def _flip(self, g, cols):
+        flip = (self.heights[g, cols] > 0) & (self.heights[g, cols] == self.first_up[g, cols])
+        self.first_up[g[flip], cols[flip]] -= 1
+
+    # Rozgrywa losowe partie we wszystkich grach: losowe dozwolone ruchy aż do wygranej (można
+    # dokończyć grę ruchami na kupki końcowe), braku ruchów albo max_moves ruchów. Zwraca maskę
+    # wygranych gier.
+    def play_random(self, max_moves=200, rng=None):
+        rng = np.random.default_rng(rng)
+        active = np.ones(self.size, dtype=bool)
+        won = np.zeros(self.size, dtype=bool)
+        for _ in range(max_moves):
+            won |= self.can_auto_finish()
+            active &= ~won
+            if not active.any():
+                break
+            active &= self.random_step(rng, active)
+        won |= self.can_auto_finish()
+        return won
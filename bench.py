@@ -0,0 +1,272 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from engine import Engine, Move, legal_moves, DRAW, STOCK, RESERVE, FINAL, TABLEAU
+
+# Korpus testowy: stałe rozdania (numery od CORPUS_FIRST_DEAL, oba poziomy trudności) i pozycje
+# z losowych partii rozegranych z ziarnem równym numerowi rozdania - przy każdym uruchomieniu te same
+CORPUS_FIRST_DEAL = 1000
+CORPUS_DEALS = 20
+CORPUS_PLAYOUT_MOVES = 120
+CORPUS_SNAPSHOT_EVERY = 10
+PLAYOUT_MAX_MOVES = 200 # Limit ruchów jednej losowej partii w pomiarze playout
+STOCK_CYCLE_DRAWS = 30 # Dobrania w pomiarze stock_cycle (więcej niż kart w rezerwie - z przełożeniem waste)
+
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.10 # Spadek wydajności względem wzorca, od którego wynik jest oznaczany jako regresja
+MIN_RUN_SECONDS = 0.2 # Najkrótszy czas jednego przebiegu pomiaru (krótsze są zbyt podatne na zakłócenia)
+
+# Wszystkie ruchy, o które gracz może poprosić interfejs (każde źródło i cel, ciągi do 13 kart),
+# również niedozwolone - sprawdzanie ich to ta sama praca, co zatwierdzanie ruchu w confirm_selection
+CANDIDATE_MOVES = (
+    [Move(STOCK, 0, RESERVE, 0, 0)]
+    + [Move(RESERVE, 0, dst, idx, 1) for dst, count in ((FINAL, 4), (TABLEAU, 7)) for idx in range(count)]
+    + [Move(FINAL, src, dst, idx, 1) for src in range(4) for dst, count in ((FINAL, 4), (TABLEAU, 7))
+       for idx in range(count) if (dst, idx) != (FINAL, src)]
+    + [Move(TABLEAU, src, FINAL, idx, 1) for src in range(7) for idx in range(4)]
+    + [Move(TABLEAU, src, TABLEAU, dst, n) for src in range(7) for dst in range(7) if src != dst for n in range(1, 14)]
+)
+
+# Pozycje korpusu: kopie silnika w kolejnych etapach losowych partii
+def build_corpus():
+    positions = []
+    for difficulty in ('łatwy', 'trudny'):
+        for deal_number in range(CORPUS_FIRST_DEAL, CORPUS_FIRST_DEAL + CORPUS_DEALS):
+            engine = Engine(difficulty)
+            engine.new_deal(deal_number)
+            rng = random.Random(deal_number)
+            for step in range(CORPUS_PLAYOUT_MOVES):
+                if step % CORPUS_SNAPSHOT_EVERY == 0:
+                    positions.append(engine.copy())
+                moves = list(legal_moves(engine))
+                if not moves:
+                    break
+                engine.apply(rng.choice(moves))
+    return positions
+
+# Losowa partia: losowe dozwolone ruchy aż do wygranej, braku ruchów lub limitu ruchów
+def random_playout(engine, rng, max_moves=PLAYOUT_MAX_MOVES):
+    for _ in range(max_moves):
+        moves = list(legal_moves(engine))
+        if not moves:
+            break
+        engine.apply(rng.choice(moves), auto_play=True)
+        if engine.is_won():
+            break
+    return engine
+
+# Pomiary: każdy wykonuje porcję pracy na korpusie i zwraca liczbę wykonanych operacji
+
+def bench_legal_moves(positions):
+    count = 0
+    for engine in positions:
+        for _ in legal_moves(engine):
+            count += 1
+    return count
+
+def bench_move_validation(positions):
+    for engine in positions:
+        is_legal = engine.is_legal
+        for move in CANDIDATE_MOVES:
+            is_legal(move)
+    return len(positions) * len(CANDIDATE_MOVES)
+
+def bench_can_place_on_final(positions):
+    can_place = Engine._can_place_on_final
+    count = 0
+    for engine in positions:
+        cards = [column[-1] for column in engine.tableau if column]
+        for card in cards:
+            for stack in engine.final_stacks:
+                can_place(card, stack)
+        count += len(cards) * 4
+    return count
+
+# Wykonanie ruchu i jego cofnięcie (zapis i odtworzenie stanu przez dziennik cofania)
+def bench_apply_undo(positions):
+    count = 0
+    for position in positions:
+        engine = position.copy()
+        for move in list(legal_moves(engine)):
+            engine.apply(move)
+            engine.undo()
+            count += 1
+    return count
+
+# Pełny obieg rezerwy (dobrania z przełożeniem waste na stos) i cofnięcie wszystkich dobrań
+def bench_stock_cycle(positions):
+    count = 0
+    for position in positions:
+        engine = position.copy()
+        draws = sum(engine.apply(DRAW) for _ in range(STOCK_CYCLE_DRAWS)) # Przy pustej rezerwie dobranie jest niedozwolone
+        for _ in range(draws):
+            engine.undo()
+        count += 2 * draws
+    return count
+
+# Wyliczenie kart osiągalnych w rezerwie (Engine.reserve_reach) od nowa dla każdej pozycji
+def bench_reserve_reach(positions):
+    for engine in positions:
+        engine._compute_reach()
+    return len(positions)
+
+def bench_deal(positions):
+    engine = Engine()
+    for deal_number in range(CORPUS_FIRST_DEAL, CORPUS_FIRST_DEAL + 500):
+        engine.new_deal(deal_number)
+    return 500
+
+def bench_playout(positions):
+    games = 50
+    for deal_number in range(CORPUS_FIRST_DEAL, CORPUS_FIRST_DEAL + games):
+        engine = Engine('łatwy' if deal_number % 2 else 'trudny')
+        engine.new_deal(deal_number)
+        random_playout(engine, random.Random(deal_number))
+    return games
+
+# Te same losowe partie w pakiecie gier NumPy (batch.py) - wszystkie gry naraz
+def bench_batch_playout(positions):
+    from batch import GameBatch
+    games = 2000
+    batch = GameBatch.from_deals(range(CORPUS_FIRST_DEAL, CORPUS_FIRST_DEAL + games))
+    batch.play_random(PLAYOUT_MAX_MOVES, rng=CORPUS_FIRST_DEAL)
+    return games
+
+_render_game = None
+
+# Gra rysująca klatki do pustego strumienia, o stałym rozmiarze ekranu (niezależnie od terminala)
+def _get_render_game():
+    global _render_game
+    if _render_game is None:
+        os.environ["COLUMNS"], os.environ["LINES"] = "160", "60"
+        from rich.console import Console
+        from pasjans import Game
+        from render import TerminalRenderer
+        sink = open(os.devnull, "w", encoding="utf-8")
+        _render_game = Game()
+        _render_game.rich_console = Console(file=sink, width=160, force_terminal=True, color_system="standard")
+        _render_game.renderer = TerminalRenderer(sink)
+    return _render_game
+
+# Budowanie i wysyłanie klatki gry (display_game) do pustego strumienia - kolejne pozycje korpusu,
+# więc renderer za każdym razem wysyła rzeczywiste różnice między klatkami
+def bench_render(positions):
+    game = _get_render_game()
+    for engine in positions:
+        game.difficulty = engine.difficulty
+        game._set_engine(engine)
+        game.display_game()
+    return len(positions)
+
+# Nazwa pomiaru -> (funkcja, jednostka operacji)
+BENCHMARKS = {
+    "legal_moves": (bench_legal_moves, "ruchów/s"),
+    "move_validation": (bench_move_validation, "sprawdzeń/s"),
+    "can_place_on_final": (bench_can_place_on_final, "sprawdzeń/s"),
+    "apply_undo": (bench_apply_undo, "par/s"),
+    "stock_cycle": (bench_stock_cycle, "operacji/s"),
+    "reserve_reach": (bench_reserve_reach, "pozycji/s"),
+    "deal": (bench_deal, "rozdań/s"),
+    "playout": (bench_playout, "partii/s"),
+    "render": (bench_render, "klatek/s"),
+}
+if importlib.util.find_spec("numpy") is not None: # NumPy jest opcjonalny
+    BENCHMARKS["batch_playout"] = (bench_batch_playout, "partii/s")
+
+# Wykonuje porcję pracy pomiaru loops razy; zwraca łączną liczbę operacji i czas
+def _timed_run(func, positions, loops):
+    ops = 0
+    start = time.perf_counter()
+    for _ in range(loops):
+        ops += func(positions)
+    return ops, time.perf_counter() - start
+
+# Wykonuje pomiary i zwraca wyniki: dla każdego pomiaru najlepszy z repeat przebiegów
+# (najmniej zakłócony przez inne procesy) w operacjach na sekundę. Przebieg powtarza porcję pracy
+# tyle razy, żeby trwał co najmniej MIN_RUN_SECONDS.
+def run_benchmarks(names=None, repeat=5, on_result=None):
+    positions = build_corpus()
+    results = {}
+    for name in names or BENCHMARKS:
+        func, unit = BENCHMARKS[name]
+        loops = 1
+        while _timed_run(func, positions, loops)[1] < MIN_RUN_SECONDS: # Również rozgrzewka (atlas kart, pamięci podręczne)
+            loops *= 2
+        runs = [_timed_run(func, positions, loops) for _ in range(repeat)]
+        ops, best = min(runs, key=lambda run: run[1])
+        results[name] = {"unit": unit, "ops": ops, "best_s": best, "value": ops / best,
+                         "loops": loops, "runs_s": [elapsed for _, elapsed in runs]}
+        if on_result:
+            on_result(name, results[name])
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+# Porównuje wyniki ze wzorcem; zwraca listę (nazwa, wynik, wzorzec, zmiana, regresja) dla pomiarów
+# obecnych w obu zestawach. Regresja to spadek wydajności o więcej niż threshold (np. 0.1 = 10%).
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    rows = []
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        change = result["value"] / base["value"] - 1
+        rows.append((name, result["value"], base["value"], change, change < -threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pomiary wydajności silnika, renderera i rozdań")
+    parser.add_argument("names", nargs="*", metavar="POMIAR",
+                        help=f"pomiary do wykonania (domyślnie wszystkie: {', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="liczba przebiegów każdego pomiaru")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="plik JSON z wynikami")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="plik JSON z wynikami wzorcowymi")
+    parser.add_argument("--save-baseline", action="store_true", help="zapisz wyniki jako nowy wzorzec")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="dopuszczalny spadek wydajności względem wzorca (ułamek, domyślnie 0.10)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"nieznany pomiar: {', '.join(unknown)}")
+
+    def show(name, result):
+        print(f"{name:<20} {result['value']:>14,.0f} {result['unit']}")
+
+    report = run_benchmarks(args.names, args.repeat, on_result=show)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Wyniki zapisane w pliku {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Wzorzec zapisany w pliku {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print(f"Brak wzorca do porównania ({args.baseline}) - zapisz go opcją --save-baseline.")
+        return 0
+
+    rows = compare(report, baseline, args.threshold)
+    print(f"\nPorównanie ze wzorcem {args.baseline} ({baseline.get('timestamp', '?')}):")
+    for name, value, base, change, regression in rows:
+        print(f"{name:<20} {value:>14,.0f} {base:>14,.0f} {change:>+8.1%}{'  REGRESJA' if regression else ''}")
+    return 1 if any(row[4] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
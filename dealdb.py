@@ -0,0 +1,284 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from deals import deal_rank
+from engine import Engine
+from scores import locked
+
+# Wynik analizy rozdania zapisany w bazie: solvable (True/False/None jak w SolveResult), liczba ruchów
+# najkrótszego znanego rozwiązania, największa liczba kart na kupkach końcowych, liczba węzłów
+# i czas analizy oraz limit węzłów, z jakim ją wykonano (ważny dla rozdań nierozstrzygniętych)
+DealRecord = namedtuple("DealRecord", ["solvable", "moves", "foundation", "nodes", "elapsed_ms", "max_nodes"])
+
+# Klucz rozdania: poziom trudności (1 bajt) i numer permutacji talii (deals.deal_rank) zapisany
+# od najstarszego bajtu, więc kolejność kluczy jako bajtów to kolejność liczb
+KEY_SIZE = 30
+_DIFFICULTY_CODES = {'łatwy': 0, 'trudny': 1}
+
+# Rekord w pliku: klucz, stan (0 - nierozstrzygnięte, 1 - wygrywalne, 2 - przegrane), karty na
+# kupkach końcowych, liczba ruchów, węzły, czas w ms i limit węzłów
+_RECORD = struct.Struct("<30sBBHIfI")
+_STATUS = {None: 0, True: 1, False: 2}
+_SOLVABLE = {status: solvable for solvable, status in _STATUS.items()}
+_MAGIC = b"PSD1"
+# Nagłówek dziennika: znacznik i numer generacji, zwiększany przy każdym scaleniu (które czyści
+# dziennik) - po nim czytelnik poznaje, że jego pozycja w dzienniku jest już nieaktualna
+_LOG_HEADER = struct.Struct("<4sQ")
+_LOG_MAGIC = b"PSL1"
+
+# Klucz rozdania o podanej kolejności kart w talii
+def deal_key(deck, difficulty):
+    return bytes([_DIFFICULTY_CODES[difficulty]]) + deal_rank(deck).to_bytes(KEY_SIZE - 1, "big")
+
+# Klucz rozdania o podanym numerze
+def deal_number_key(deal_number, difficulty):
+    engine = Engine(difficulty)
+    engine.new_deal(deal_number)
+    return deal_key(engine.deck_source_data, difficulty)
+
+def _pack(key, record):
+    return _RECORD.pack(key, _STATUS[record.solvable], record.foundation, min(record.moves, 0xFFFF),
+                        min(record.nodes, 0xFFFFFFFF), record.elapsed_ms, min(record.max_nodes, 0xFFFFFFFF))
+
+def _unpack(data, offset=0):
+    key, status, foundation, moves, nodes, elapsed_ms, max_nodes = _RECORD.unpack_from(data, offset)
+    return key, DealRecord(_SOLVABLE[status], moves, foundation, nodes, elapsed_ms, max_nodes)
+
+# Który z dwóch wyników analizy tego samego rozdania zachować: rozstrzygnięty zamiast
+# nierozstrzygniętego (z nierozstrzygniętych ten z większym limitem węzłów), a z wygrywalnych
+# ten z krótszym rozwiązaniem; poza tym nowszy
+def preferred(old, new):
+    if old.solvable is None and new.solvable is None:
+        return new if new.max_nodes >= old.max_nodes else old
+    if new.solvable is None:
+        return old
+    if old.solvable and new.solvable and old.moves <= new.moves:
+        return old
+    return new
+
+# Baza przeanalizowanych rozdań na dysku, w dwóch plikach:
+#   - indeks (path.idx): rekordy stałej długości posortowane według klucza; nie jest wczytywany,
+#     tylko mapowany w pamięć (mmap), a rozdanie jest wyszukiwane binarnie - O(log n) odczytów,
+#   - dziennik (path.log): nagłówek z numerem generacji i rekordy dopisywane porcjami (append_many)
+#     w kolejności analizy; jest wczytywany do słownika i doczytywany przyrostowo, gdy urośnie.
+# compact() scala posortowany dziennik z indeksem w jednym przebiegu (jak sortowanie przez scalanie)
+# do nowego pliku indeksu, podmienia go i czyści dziennik, zwiększając jego generację. Dopisywanie
+# i scalanie odbywają się pod wyłączną blokadą dziennika, więc z bazy może korzystać kilka procesów
+# naraz.
+class DealDatabase:
+    COMPACT_THRESHOLD = 100000 # Liczba rekordów w dzienniku, po której maybe_compact() scala go z indeksem
+
+    def __init__(self, path):
+        self.index_path = f"{path}.idx"
+        self.log_path = f"{path}.log"
+        self._log = {}
+        self._log_records = 0
+        self._log_offset = 0
+        self._log_id = None
+        self._log_generation = None
+        self._index = None
+        self._index_file = None
+        self._index_count = 0
+        self._index_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index_file.close()
+            self._index = self._index_file = None
+        self._index_id = None
+
+    # Liczba rekordów (z powtórzeniami między indeksem a dziennikiem)
+    def __len__(self):
+        self.refresh()
+        return self._index_count + len(self._log)
+
+    # Wynik analizy rozdania o podanym kluczu albo None
+    def get(self, key):
+        self.refresh()
+        return self._lookup(key)
+
+    # Wyniki dla wielu kluczy naraz (słownik klucz -> DealRecord, bez kluczy nieobecnych w bazie)
+    def get_many(self, keys):
+        self.refresh()
+        found = {}
+        for key in keys:
+            record = self._lookup(key)
+            if record is not None:
+                found[key] = record
+        return found
+
+    # Dopisuje porcję wyników (pary klucz, DealRecord) do dziennika jednym zapisem
+    def append_many(self, items):
+        data = b"".join(_pack(key, record) for key, record in items)
+        if not data:
+            return
+        with open(self.log_path, "ab") as f:
+            with locked(f, exclusive=True):
+                if f.seek(0, os.SEEK_END) == 0: # Nowy dziennik
+                    data = _LOG_HEADER.pack(_LOG_MAGIC, 0) + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # Scala dziennik z indeksem, jeśli dziennik ma co najmniej COMPACT_THRESHOLD rekordów;
+    # zwraca, czy scalono
+    def maybe_compact(self):
+        self.refresh()
+        if self._log_records < self.COMPACT_THRESHOLD:
+            return False
+        self.compact()
+        return True
+
+    # Scala dziennik z indeksem do nowego pliku indeksu (podmienianego atomowo) i czyści dziennik
+    def compact(self):
+        open(self.log_path, "ab").close() # Dziennik musi istnieć, żeby otworzyć go do nadpisania
+        with open(self.log_path, "r+b") as log:
+            with locked(log, exclusive=True):
+                self._log_id = None # Dziennik czytany od nowa, pod blokadą
+                self.refresh()
+                pending = sorted(self._log.items())
+                temp_path = f"{self.index_path}.tmp"
+                with open(temp_path, "wb") as out:
+                    out.write(_MAGIC)
+                    for key, record in self._merged(pending):
+                        out.write(_pack(key, record))
+                    out.flush()
+                    os.fsync(out.fileno())
+                self.close()
+                os.replace(temp_path, self.index_path)
+                # Nowa generacja jest zapisywana przed obcięciem dziennika, więc czytelnik nigdy
+                # nie zobaczy pustego dziennika starej generacji, do którego dopisano nowe rekordy
+                generation = self._read_generation(log)
+                log.seek(0)
+                log.write(_LOG_HEADER.pack(_LOG_MAGIC, 0 if generation is None else generation + 1))
+                log.truncate()
+                log.flush()
+                os.fsync(log.fileno())
+        self._log_id = None
+        self.refresh()
+
+    # Rekordy indeksu i posortowanego dziennika w kolejności kluczy; przy powtórzonym kluczu
+    # zostaje rekord wybrany przez preferred()
+    def _merged(self, pending):
+        pos = 0
+        for idx in range(self._index_count):
+            key, record = _unpack(self._index, len(_MAGIC) + idx * _RECORD.size)
+            while pos < len(pending) and pending[pos][0] < key:
+                yield pending[pos]
+                pos += 1
+            if pos < len(pending) and pending[pos][0] == key:
+                record = preferred(record, pending[pos][1])
+                pos += 1
+            yield key, record
+        yield from pending[pos:]
+
+    # Odświeża widok bazy: mapuje na nowo indeks podmieniony przez scalanie (także w innym procesie)
+    # i doczytuje rekordy dopisane do dziennika od poprzedniego odczytu. Dziennik jest czytany od
+    # początku, gdy zmieniła się jego generacja (scalenie w innym procesie, także takie, po którym
+    # dziennik zdążył urosnąć ponad zapamiętaną pozycję), plik został podmieniony albo skrócony,
+    # lub zmienił się bez zmiany rozmiaru.
+    def refresh(self):
+        index_id = self._file_id(self.index_path)
+        if index_id != self._index_id:
+            self.close()
+            self._open_index(index_id)
+        while True:
+            log_id = self._file_id(self.log_path)
+            if log_id == self._log_id:
+                return
+            if log_id is None:
+                self._reset_log(None)
+                self._log_id = None
+                return
+            with open(self.log_path, "rb") as f:
+                generation = self._read_generation(f)
+                known = self._log_id
+                if generation != self._log_generation or known is None or log_id[0] != known[0] \
+                        or log_id[2] < self._log_offset or log_id[2] == known[2]:
+                    self._reset_log(generation)
+                f.seek(self._log_offset)
+                data = f.read()
+                if self._read_generation(f) == generation: # Bez scalenia w trakcie odczytu
+                    break
+            self._log_id = None # Scalono w trakcie odczytu - dziennik czytany jeszcze raz
+        if generation is None: # Nagłówek jeszcze niezapisany - dziennik zostanie przeczytany później
+            return
+        self._log_id = log_id
+        data = data[:len(data) - len(data) % _RECORD.size] # Urwany ostatni rekord (trwa dopisywanie) jest pomijany
+        for offset in range(0, len(data), _RECORD.size):
+            key, record = _unpack(data, offset)
+            known = self._log.get(key)
+            self._log[key] = record if known is None else preferred(known, record)
+        self._log_records += len(data) // _RECORD.size
+        self._log_offset += len(data)
+
+    def _reset_log(self, generation):
+        self._log = {}
+        self._log_records = 0
+        self._log_offset = _LOG_HEADER.size
+        self._log_generation = generation
+
+    # Numer generacji z nagłówka dziennika albo None, jeśli nagłówka jeszcze nie ma
+    @staticmethod
+    def _read_generation(f):
+        f.seek(0)
+        header = f.read(_LOG_HEADER.size)
+        if len(header) < _LOG_HEADER.size: # Pusty dziennik albo trwa zapisywanie nagłówka
+            return None
+        if header[:len(_LOG_MAGIC)] != _LOG_MAGIC:
+            raise ValueError("Nieprawidłowy plik bazy rozdań.")
+        return _LOG_HEADER.unpack(header)[1]
+
+    @staticmethod
+    def _file_id(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _open_index(self, index_id):
+        self._index_id = index_id
+        self._index_count = 0
+        if index_id is None or index_id[2] <= len(_MAGIC):
+            return
+        self._index_file = open(self.index_path, "rb")
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._index[:len(_MAGIC)] != _MAGIC:
+            self.close()
+            raise ValueError("Nieprawidłowy plik bazy rozdań.")
+        self._index_count = (len(self._index) - len(_MAGIC)) // _RECORD.size
+
+    def _lookup(self, key):
+        record = self._index_lookup(key)
+        newer = self._log.get(key)
+        if newer is not None:
+            record = newer if record is None else preferred(record, newer)
+        return record
+
+    # Wyszukiwanie binarne klucza w zmapowanym indeksie
+    def _index_lookup(self, key):
+        index = self._index
+        lo, hi = 0, self._index_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = len(_MAGIC) + mid * _RECORD.size
+            if index[offset:offset + KEY_SIZE] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._index_count:
+            return None
+        offset = len(_MAGIC) + lo * _RECORD.size
+        if index[offset:offset + KEY_SIZE] != key:
+            return None
+        return _unpack(index, offset)[1]
@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import random
+import struct
+from collections import namedtuple
+
+from dealdb import DealDatabase
+from engine import Engine, rank_of, is_hidden
+from simulate import solve_deal
+
+# Stopnie trudności rozdań w puli (od najprostszego); niezależne od poziomu gry (łatwy/trudny)
+GRADES = ("proste", "średnie", "wymagające")
+DIFFICULTIES = ('łatwy', 'trudny')
+
+# Rozdanie w puli: numer rozdania i miary trudności - węzły solvera, liczba ruchów rozwiązania
+# i zakryte karty blokujące (blocking_cards)
+PoolEntry = namedtuple("PoolEntry", ["deal_number", "nodes", "moves", "blockers"])
+
+# Plik puli: nagłówek z liczbą rozdań w każdej sekcji (poziom gry x stopień trudności),
+# a po nim rekordy stałej długości, sekcja po sekcji. Rekord: numer rozdania (8 bajtów - jak w dzienniku
+# gry, więc pula przyjmuje każde ziarno --seed do 2^64 - 1), węzły, ruchy i karty blokujące.
+_MAGIC = b"PSG2"
+_HEADER = struct.Struct(f"<4s{len(DIFFICULTIES) * len(GRADES)}I")
+_ENTRY = struct.Struct("<QIHB")
+MAX_DEAL_NUMBER = (1 << 64) - 1
+
+# Liczba zakrytych kart, które leżą na asie lub dwójce w tej samej kolumnie - żeby zacząć
+# budować kupki końcowe, trzeba je najpierw odkryć
+def blocking_cards(engine):
+    blockers = 0
+    for column in engine.tableau:
+        low_card_below = False
+        for card in column:
+            if low_card_below and is_hidden(card):
+                blockers += 1
+            if rank_of(card) <= 1:
+                low_card_below = True
+    return blockers
+
+# Pula rozdań do losowania na początku gry. Nagłówek jest czytany przy otwarciu, a losowanie
+# rozdania to jeden odczyt rekordu spod wyliczonego miejsca w pliku - bez analizy rozdań.
+class DealPool:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size or header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("Nieprawidłowy plik puli rozdań.")
+        self._counts = _HEADER.unpack(header)[1:]
+        self._offsets = []
+        offset = _HEADER.size
+        for count in self._counts:
+            self._offsets.append(offset)
+            offset += count * _ENTRY.size
+
+    # Otwiera pulę, jeśli plik istnieje i jest poprawny; w przeciwnym razie zwraca None
+    @classmethod
+    def open(cls, path):
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    def _section(self, difficulty, grade):
+        return DIFFICULTIES.index(difficulty) * len(GRADES) + GRADES.index(grade)
+
+    # Liczba rozdań danego poziomu gry i stopnia trudności
+    def count(self, difficulty, grade):
+        return self._counts[self._section(difficulty, grade)]
+
+    # Rozdanie o podanym indeksie w sekcji
+    def entry(self, difficulty, grade, index):
+        section = self._section(difficulty, grade)
+        if not 0 <= index < self._counts[section]:
+            raise IndexError(index)
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[section] + index * _ENTRY.size)
+            return PoolEntry._make(_ENTRY.unpack(f.read(_ENTRY.size)))
+
+    # Losowy numer rozdania danego poziomu gry i stopnia trudności (None, jeśli sekcja jest pusta)
+    def draw(self, difficulty, grade, rng=random):
+        count = self.count(difficulty, grade)
+        if not count:
+            return None
+        return self.entry(difficulty, grade, rng.randrange(count)).deal_number
+
+# Analizuje rozdania o numerach z przedziału [first_deal, end_deal) - zadanie dla jednego procesu.
+# Zwraca rozdania wygrywalne (PoolEntry) i nowe wyniki do dopisania do bazy rozdań.
+def _grade_shard(shard):
+    first_deal, end_deal, difficulty, max_nodes, db_path = shard
+    entries = []
+    new_records = []
+    database = DealDatabase(db_path) if db_path else None
+    try:
+        for deal_number in range(first_deal, end_deal):
+            result, record = solve_deal(deal_number, difficulty, max_nodes, database)
+            if record is not None:
+                new_records.append(record)
+            if result.solvable:
+                engine = Engine(difficulty)
+                engine.new_deal(deal_number)
+                entries.append(PoolEntry(deal_number, result.nodes, result.moves, blocking_cards(engine)))
+    finally:
+        if database is not None:
+            database.close()
+    return entries, new_records
+
+# Dzieli rozdania wygrywalne na stopnie trudności. Każda miara (węzły, ruchy, blokujące karty)
+# jest zamieniana na pozycję w kolejności od najprostszego rozdania (0..1), a o stopniu decyduje
+# średnia tych pozycji - po równo rozdań w każdym stopniu.
+def grade_entries(entries):
+    if not entries:
+        return [[] for _ in GRADES]
+    score = [0.0] * len(entries)
+    for field in ("nodes", "moves", "blockers"):
+        order = sorted(range(len(entries)), key=lambda i: getattr(entries[i], field))
+        for position, i in enumerate(order):
+            score[i] += position / len(entries)
+    order = sorted(range(len(entries)), key=lambda i: (score[i], entries[i].deal_number))
+    return [[entries[i] for i in order[grade * len(order) // len(GRADES):(grade + 1) * len(order) // len(GRADES)]]
+            for grade in range(len(GRADES))]
+
+# Tworzy plik puli z count kolejnych rozdań (od numeru first_deal) dla każdego poziomu gry.
+# Rozdania są analizowane w puli procesów jak w symulacji (simulate.py), z użyciem bazy rozdań
+# (database); nierozstrzygnięte i przegrane rozdania są pomijane. on_progress(difficulty, done)
+# jest wywoływane po każdej ukończonej porcji. Zwraca liczby rozdań w sekcjach puli.
+def build_pool(path, count, workers=None, first_deal=0, max_nodes=20000, database=None,
+               shard_size=None, on_progress=None):
+    if first_deal < 0 or first_deal + count - 1 > MAX_DEAL_NUMBER:
+        raise ValueError(f"Numery rozdań w puli muszą mieścić się w zakresie 0-{MAX_DEAL_NUMBER}.")
+    workers = workers or os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(1, min(250, count // (workers * 8)))
+    db = DealDatabase(database) if database else None
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    sections = []
+    try:
+        for difficulty in DIFFICULTIES:
+            shards = [(start, min(start + shard_size, first_deal + count), difficulty, max_nodes, database)
+                      for start in range(first_deal, first_deal + count, shard_size)]
+            results = pool.imap(_grade_shard, shards) if pool else map(_grade_shard, shards)
+            entries = []
+            done = 0
+            for (shard_entries, new_records), shard in zip(results, shards):
+                entries += shard_entries
+                if db is not None:
+                    db.append_many(new_records)
+                done += shard[1] - shard[0]
+                if on_progress:
+                    on_progress(difficulty, done)
+            sections += grade_entries(entries)
+        if db is not None:
+            db.maybe_compact()
+    finally:
+        if pool:
+            pool.terminate()
+        if db is not None:
+            db.close()
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, *(len(section) for section in sections)))
+        for section in sections:
+            f.write(b"".join(_ENTRY.pack(*entry) for entry in section))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return [len(section) for section in sections]
+
+# Tworzy pulę rozdań z wiersza poleceń, wypisując postęp i liczby rozdań w stopniach trudności
+def run_build_pool(path, count, workers=None, first_deal=0, max_nodes=20000, database=None):
+    print(f"Tworzenie puli rozdań {path}: {count} rozdań na poziom (rozdania od nr {first_deal}, "
+          f"limit węzłów solvera: {max_nodes})")
+
+    def show_progress(difficulty, done):
+        print(f"\rPoziom {difficulty}: {done}/{count}", end="", flush=True)
+
+    counts = build_pool(path, count, workers, first_deal, max_nodes, database, on_progress=show_progress)
+    print()
+    for level, difficulty in enumerate(DIFFICULTIES):
+        section = counts[level * len(GRADES):(level + 1) * len(GRADES)]
+        print(f"Poziom {difficulty}: " + ", ".join(f"{grade} {n}" for grade, n in zip(GRADES, section)))
+    return counts
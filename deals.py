@@ -0,0 +1,76 @@
+import string
+from math import factorial
+
+from engine import DECK
+
+# Identyfikator rozdania to numer permutacji talii (kod Lehmera) zapisany w systemie o podstawie 62.
+# Każda z 52! permutacji ma własny identyfikator o stałej długości DEAL_ID_LENGTH.
+_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+_DIGIT_VALUES = {char: value for value, char in enumerate(_ALPHABET)}
+_PERMUTATIONS = factorial(len(DECK))
+_DECK_INDEX = {card: index for index, card in enumerate(DECK)}
+
+DEAL_ID_LENGTH = 1
+while len(_ALPHABET) ** DEAL_ID_LENGTH < _PERMUTATIONS:
+    DEAL_ID_LENGTH += 1
+
+# Numer permutacji talii (kod Lehmera, 0 <= numer < 52!) dla kolejności kart w talii (kody kart,
+# jak Engine.deck_source_data)
+def deal_rank(deck):
+    if len(deck) != len(DECK):
+        raise ValueError("Talia musi zawierać 52 karty.")
+    used = 0
+    value = 0
+    for position, card in enumerate(deck):
+        index = _DECK_INDEX.get(card)
+        if index is None or used >> index & 1:
+            raise ValueError("Talia zawiera nieprawidłową lub powtórzoną kartę.")
+        # Cyfra kodu Lehmera: liczba jeszcze niewykorzystanych kart o mniejszym indeksie
+        smaller_used = (used & ((1 << index) - 1)).bit_count()
+        value = value * (len(DECK) - position) + index - smaller_used
+        used |= 1 << index
+    return value
+
+# Koduje kolejność kart w talii jako identyfikator rozdania
+def encode_deal(deck):
+    value = deal_rank(deck)
+    chars = []
+    for _ in range(DEAL_ID_LENGTH):
+        value, digit = divmod(value, len(_ALPHABET))
+        chars.append(_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+# Odtwarza kolejność kart w talii z identyfikatora rozdania
+def decode_deal(deal_id):
+    if len(deal_id) != DEAL_ID_LENGTH:
+        raise ValueError("Nieprawidłowy identyfikator rozdania.")
+    value = 0
+    for char in deal_id:
+        digit = _DIGIT_VALUES.get(char)
+        if digit is None:
+            raise ValueError("Nieprawidłowy identyfikator rozdania.")
+        value = value * len(_ALPHABET) + digit
+    if value >= _PERMUTATIONS:
+        raise ValueError("Nieprawidłowy identyfikator rozdania.")
+
+    digits = [0] * len(DECK)
+    for position in reversed(range(len(DECK))):
+        value, digits[position] = divmod(value, len(DECK) - position)
+    remaining = list(DECK)
+    return [remaining.pop(digit) for digit in digits]
+
+# Zamienia tekst podany przez gracza na rozdanie: zwraca parę (numer rozdania, talia), z której
+# ustawiony jest dokładnie jeden element. Akceptuje numer rozdania albo identyfikator rozdania.
+def parse_deal(deal):
+    if isinstance(deal, int):
+        deal_number = deal
+    else:
+        deal = deal.strip()
+        if len(deal) == DEAL_ID_LENGTH:
+            return None, decode_deal(deal)
+        if not deal.isdigit():
+            raise ValueError("Nieprawidłowy numer lub identyfikator rozdania.")
+        deal_number = int(deal)
+    if deal_number < 0:
+        raise ValueError("Numer rozdania nie może być ujemny.")
+    return deal_number, None
@@ -0,0 +1,846 @@
+import random
+from collections import namedtuple
+
+# Strefy planszy używane do adresowania ruchów
+STOCK = 0    # zakryty stos rezerwowy
+RESERVE = 1  # odkryta karta rezerwy (w trybie trudnym wierzchnia karta z okna trzech kart)
+FINAL = 2    # kupki końcowe
+TABLEAU = 3  # kolumny robocze
+
+# Pojedynczy ruch: strefa i indeks źródła, strefa i indeks celu oraz liczba przenoszonych kart
+Move = namedtuple("Move", ["src", "src_idx", "dst", "dst_idx", "count"])
+
+# Dobranie karty/kart ze stosu rezerwowego
+DRAW = Move(STOCK, 0, RESERVE, 0, 0)
+
+# Dane kolumny tableau zapamiętywane do jej następnej zmiany: indeks pierwszej odkrytej karty,
+# długość poprawnego ciągu na wierzchu kolumny (malejące wartości, naprzemienne kolory)
+# i wierzchnia karta (None dla pustej kolumny)
+ColumnInfo = namedtuple("ColumnInfo", ["first_up", "run_length", "top"])
+
+# Wpis dziennika cofania: ruch, informacja o odkryciu karty w kolumnie źródłowej, operacje
+# wykonane na stosie rezerwowym oraz stan rezerwy sprzed ruchu (tylko dla ruchów, które ją zmieniają:
+# aktywna karta, okno trzech kart, znacznik pierwszego dobrania i karty osiągalne w rezerwie)
+UndoEntry = namedtuple("UndoEntry", ["move", "flipped", "stock_ops", "reserve_before"])
+
+# Wpis dziennika cofania dla kilku ruchów cofanych i ponawianych razem (np. ruch gracza wraz
+# z automatycznym odłożeniem kart na kupki końcowe): krotka ruchów i krotka ich wpisów UndoEntry
+BatchEntry = namedtuple("BatchEntry", ["moves", "entries"])
+
+# Znaczniki operacji na stosie rezerwowym zapisywanych w UndoEntry.stock_ops
+# (liczba nieujemna to kod karty zdjętej z wierzchu stosu rezerwowego)
+WASTE_PUSH = -1
+RECYCLE = -2
+
+# Stos rezerwowy i waste to jedna tablica cykliczna o RING_SIZE polach (tyle kart zostaje po
+# rozdaniu). Pole o numerze k leży w tablicy pod indeksem (początek + kierunek * k) % RING_SIZE.
+# Waste zajmuje pola od 0 (spód) w górę, a stos rezerwowy ostatnie pola (wierzch pierwszy); luka
+# między wierzchami to miejsce po kartach odkrytych i zabranych z rezerwy. Dobranie, zabranie
+# karty i ich cofnięcie zmieniają tylko liczniki kart, a przełożenie waste na stos - początek
+# i kierunek tablicy (na poziomie łatwym kolejność kart się odwraca), bez kopiowania kart.
+RING_SIZE = 24
+
+VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+SUITS = ["♠", "♥", "♦", "♣"]
+
+# Karta zakodowana w jednym bajcie: bity 0-3 to wartość (0 = As, 12 = Król),
+# bity 4-5 to indeks koloru w SUITS, bit 6 oznacza kartę czerwoną, a bit 7 kartę zakrytą
+RANK_MASK = 0x0F
+SUIT_MASK = 0x30
+RED_BIT = 0x40
+HIDDEN_BIT = 0x80
+ACE = 0
+KING = 12
+
+# Tworzy kod odkrytej karty o podanej wartości i kolorze (indeksy w VALUES i SUITS)
+def card_code(rank, suit):
+    return rank | suit << 4 | (RED_BIT if SUITS[suit] in "♥♦" else 0)
+
+# Wszystkie 52 karty w kolejności talii (kolor po kolorze, od Asa do Króla)
+DECK = [card_code(rank, suit) for suit in range(4) for rank in range(13)]
+
+# Bajt oznaczający brak karty (puste miejsce w oknie trzech kart, brak aktywnej karty rezerwy)
+# w stanie zapisanym przez Engine.save_state
+NO_CARD = 0xFF
+
+# Zakres numerów losowanych dla nowych rozdań (numer rozdania to ziarno generatora tasującego talię)
+DEAL_NUMBERS = 1000000000
+
+def rank_of(code):
+    return code & RANK_MASK
+
+def suit_of(code):
+    return (code & SUIT_MASK) >> 4
+
+def is_red(code):
+    return bool(code & RED_BIT)
+
+def is_hidden(code):
+    return bool(code & HIDDEN_BIT)
+
+# Pojedyncza karta do gry - lekka nakładka na kod karty używana przez interfejs
+class Card:
+    __slots__ = ("code",)
+
+    def __init__(self, value, suit, hidden=False):
+        self.code = card_code(VALUES.index(value), SUITS.index(suit)) | (HIDDEN_BIT if hidden else 0)
+
+    # Zwraca współdzieloną nakładkę dla kodu karty (bez tworzenia nowego obiektu)
+    @staticmethod
+    def from_code(code):
+        return _CARD_FACES[code]
+
+    @property
+    def value(self):
+        return VALUES[self.code & RANK_MASK]
+
+    @property
+    def suit(self):
+        return SUITS[(self.code & SUIT_MASK) >> 4]
+
+    @property
+    def hidden(self):
+        return bool(self.code & HIDDEN_BIT)
+
+    def __repr__(self):
+        return f"Card({self.value}{self.suit}{'H' if self.hidden else ''})"
+
+    def is_red(self):
+        return bool(self.code & RED_BIT)
+
+# Wylicza dane kolumny tableau (ColumnInfo) jednym przejściem od wierzchu kolumny
+def _scan_column(column):
+    if not column:
+        return ColumnInfo(0, 0, None)
+    top = column[-1]
+    if top & HIDDEN_BIT:
+        return ColumnInfo(len(column), 0, top)
+    start = len(column) - 1
+    while start > 0:
+        under = column[start - 1]
+        if under & HIDDEN_BIT or not (under ^ column[start]) & RED_BIT or \
+                (under & RANK_MASK) - (column[start] & RANK_MASK) != 1:
+            break
+        start -= 1
+    first_up = start
+    while first_up > 0 and not column[first_up - 1] & HIDDEN_BIT:
+        first_up -= 1
+    return ColumnInfo(first_up, len(column) - start, top)
+
+_CARD_FACES = {}
+for _code in DECK:
+    for _flag in (0, HIDDEN_BIT):
+        _face = object.__new__(Card)
+        _face.code = _code | _flag
+        _CARD_FACES[_code | _flag] = _face
+
+# Silnik zasad gry: przechowuje stan planszy i wykonuje ruchy bez żadnego wyświetlania.
+# Wszystkie karty w strefach są przechowywane jako kody (int), a nie obiekty Card.
+class Engine:
+    VALUES = VALUES
+    SUITS = SUITS
+
+    # Inicjalizuje pusty stan planszy dla wybranego poziomu trudności
+    def __init__(self, difficulty='łatwy'):
+        self.difficulty = difficulty
+        self.deal_number = None
+        self.deck_source_data = []
+        self.tableau = [[] for _ in range(7)]
+        self._ring = [0] * RING_SIZE
+        self.stock_count = 0 # Liczba kart w stosie rezerwowym
+        self.waste_count = 0 # Liczba kart w waste
+        self._set_ring(0, 1)
+        self._reach = None   # Karty osiągalne w rezerwie (reserve_reach), None - do wyliczenia
+        self.visible_draw3_cards = [None, None, None]
+        self.final_stacks = [[] for _ in range(4)]
+        self.foundation_heights = [0] * 4 # Liczba kart każdego koloru (indeks w SUITS) na kupkach końcowych
+        self.current_reserve_card = None
+        self.first_reveal_done = False
+        self.stock_seen = False # Czy waste było już przełożone na stos - gracz zna wtedy kolejność kart stosu
+        self.move_count = 0
+        self.undo_journal = []
+        self.redo_moves = []
+        self._stock_ops = []
+        self._column_info = [None] * 7
+
+    # Rozdaje nową grę: rozdanie o podanym numerze, z podanej kolejności kart (np. odczytanej
+    # z identyfikatora rozdania) albo, gdy nie podano żadnego, rozdanie o losowym numerze
+    def new_deal(self, deal_number=None, deck=None):
+        self.final_stacks = [[] for _ in range(4)]
+        self.foundation_heights = [0] * 4
+        self.move_count = 0
+        self.undo_journal = []
+        self.redo_moves = []
+        if deck is not None:
+            if sorted(deck) != sorted(DECK):
+                raise ValueError("Talia musi zawierać każdą z 52 kart dokładnie raz.")
+            self.deal_number = None
+            self.deck_source_data = list(deck)
+        else:
+            self.deal_number = random.randrange(DEAL_NUMBERS) if deal_number is None else deal_number
+            self._generate_deck_data()
+        self._generate_tableau_and_reserve()
+
+    # Tworzy talię potasowaną własnym generatorem gry zainicjowanym numerem rozdania,
+    # więc to samo rozdanie można zawsze odtworzyć
+    def _generate_deck_data(self):
+        self.deck_source_data = DECK[:]
+        random.Random(self.deal_number).shuffle(self.deck_source_data)
+
+    # Rozdaje karty do kolumn tableau i tworzy stos rezerwowy
+    def _generate_tableau_and_reserve(self):
+        deck = self.deck_source_data
+        card_counter = 0
+        self.tableau = [[] for _ in range(7)]
+        for i in range(7):
+            column = deck[card_counter:card_counter + i + 1]
+            for j in range(i): # Wszystkie karty poza ostatnią są zakryte
+                column[j] |= HIDDEN_BIT
+            self.tableau[i] = column
+            card_counter += i + 1
+        self._column_info = [None] * 7
+        self.set_reserve(deck[card_counter:])
+        self.current_reserve_card = None
+        self.visible_draw3_cards = [None,None,None]
+        self.first_reveal_done = False
+        self.stock_seen = False
+
+    # Tworzy niezależną kopię stanu planszy (bez dziennika cofania)
+    def copy(self):
+        clone = Engine.__new__(Engine)
+        clone.difficulty = self.difficulty
+        clone.deal_number = self.deal_number
+        clone.deck_source_data = self.deck_source_data
+        clone.tableau = [col[:] for col in self.tableau]
+        clone._ring = self._ring[:]
+        clone._ring_base = self._ring_base
+        clone._ring_dir = self._ring_dir
+        clone._stock_at = self._stock_at
+        clone._waste_at = self._waste_at
+        clone.stock_count = self.stock_count
+        clone.waste_count = self.waste_count
+        clone._reach = self._reach
+        clone.visible_draw3_cards = self.visible_draw3_cards[:]
+        clone.final_stacks = [stack[:] for stack in self.final_stacks]
+        clone.foundation_heights = self.foundation_heights[:]
+        clone.current_reserve_card = self.current_reserve_card
+        clone.first_reveal_done = self.first_reveal_done
+        clone.stock_seen = self.stock_seen
+        clone.move_count = self.move_count
+        clone.undo_journal = []
+        clone.redo_moves = []
+        clone._stock_ops = []
+        clone._column_info = self._column_info[:]
+        return clone
+
+    # Karty stosu rezerwowego (wierzch pierwszy)
+    @property
+    def reserve_stock(self):
+        return self._ring_cards(RING_SIZE - self.stock_count, self.stock_count)
+
+    # Karty waste (wierzch ostatni)
+    @property
+    def waste_pile(self):
+        return self._ring_cards(0, self.waste_count)
+
+    # Ustawia zawartość stosu rezerwowego (wierzch pierwszy) i waste (wierzch ostatni)
+    def set_reserve(self, stock, waste=()):
+        if len(stock) + len(waste) > RING_SIZE:
+            raise ValueError("Rezerwa może zawierać najwyżej 24 karty.")
+        self._ring = [0] * (RING_SIZE - len(stock)) + list(stock)
+        self._ring[:len(waste)] = waste
+        self.stock_count = len(stock)
+        self.waste_count = len(waste)
+        self._set_ring(0, 1)
+        self._reach = None
+
+    # Ustawia początek i kierunek tablicy cyklicznej oraz indeksy wierzchu stosu (_stock_at) i miejsca
+    # na następną kartę waste (_waste_at). Początek jest dobierany tak, żeby indeksy wszystkich pól
+    # mieściły się w zakresie -RING_SIZE..RING_SIZE-1 - lista sama zawija indeksy ujemne, więc
+    # dobranie i odłożenie karty to tylko przesunięcie indeksu o kierunek, bez dzielenia modulo.
+    def _set_ring(self, base, direction):
+        base %= RING_SIZE
+        if direction == 1:
+            base -= RING_SIZE
+        self._ring_base = base
+        self._ring_dir = direction
+        self._waste_at = base + direction * self.waste_count
+        self._stock_at = base + direction * (RING_SIZE - self.stock_count)
+
+    # Indeks pola k rezerwy w tablicy cyklicznej
+    def _ring_pos(self, k):
+        return (self._ring_base + self._ring_dir * k) % RING_SIZE
+
+    # Karty z pól start..start+count-1 rezerwy (co najwyżej dwa wycinki tablicy)
+    def _ring_cards(self, start, count):
+        if not count:
+            return []
+        ring = self._ring
+        first = self._ring_pos(start)
+        if self._ring_dir == 1:
+            end = first + count
+            if end <= RING_SIZE:
+                return ring[first:end]
+            return ring[first:] + ring[:end - RING_SIZE]
+        last = first - count + 1
+        if last >= 0:
+            return ring[last:first + 1][::-1]
+        return ring[first::-1] + ring[last + RING_SIZE:][::-1]
+
+    # Zapisuje stan planszy (bez dziennika cofania) jako bajty: dla każdej kolumny, kupki końcowej,
+    # stosu rezerwowego i waste liczba kart i ich kody, następnie okno trzech kart, aktywna karta
+    # rezerwy, znacznik pierwszego dobrania i licznik ruchów
+    def save_state(self):
+        out = bytearray()
+        for pile in (*self.tableau, *self.final_stacks, self.reserve_stock, self.waste_pile):
+            out.append(len(pile))
+            out += bytes(pile)
+        for card in (*self.visible_draw3_cards, self.current_reserve_card):
+            out.append(NO_CARD if card is None else card)
+        out.append(self.first_reveal_done)
+        out += self.move_count.to_bytes(4, "little")
+        return bytes(out)
+
+    # Przywraca stan zapisany przez save_state; dziennik cofania i ponawiania jest czyszczony
+    def load_state(self, data):
+        piles = []
+        pos = 0
+        for _ in range(13):
+            if pos >= len(data):
+                raise ValueError("Nieprawidłowy zapis stanu planszy.")
+            count = data[pos]
+            piles.append(list(data[pos + 1:pos + 1 + count]))
+            pos += 1 + count
+        if len(data) != pos + 9:
+            raise ValueError("Nieprawidłowy zapis stanu planszy.")
+        self.tableau = piles[:7]
+        self.final_stacks = piles[7:11]
+        self.set_reserve(piles[11], piles[12])
+        window = [None if card == NO_CARD else card for card in data[pos:pos + 4]]
+        self.visible_draw3_cards = window[:3]
+        self.current_reserve_card = window[3]
+        self.first_reveal_done = bool(data[pos + 4])
+        self.stock_seen = False # Zapis stanu tego nie obejmuje - przyjmuje się, że kolejność stosu nie jest znana
+        self.move_count = int.from_bytes(data[pos + 5:pos + 9], "little")
+        self.foundation_heights = [0] * 4
+        for stack in self.final_stacks:
+            if stack:
+                self.foundation_heights[(stack[0] & SUIT_MASK) >> 4] = len(stack)
+        self._column_info = [None] * 7
+        self.undo_journal = []
+        self.redo_moves = []
+
+    # Liczba ruchów możliwych do cofnięcia
+    @property
+    def undo_actions_available(self):
+        return len(self.undo_journal)
+
+    # Liczba cofniętych ruchów możliwych do ponowienia
+    @property
+    def redo_actions_available(self):
+        return len(self.redo_moves)
+
+    # Zwraca dane kolumny tableau (ColumnInfo); są wyliczane ponownie dopiero po zmianie kolumny
+    def column_info(self, idx):
+        info = self._column_info[idx]
+        if info is None:
+            info = self._column_info[idx] = _scan_column(self.tableau[idx])
+        return info
+
+    # Sprawdza, czy daną kartę można umieścić na kupce końcowej
+    @staticmethod
+    def _can_place_on_final(card, final_stack_list):
+        if not final_stack_list:
+            return card & RANK_MASK == ACE
+        top = final_stack_list[-1]
+        return (card ^ top) & SUIT_MASK == 0 and (card & RANK_MASK) == (top & RANK_MASK) + 1
+
+    # Sprawdza, czy kartę (lub pierwszą kartę sekwencji) można położyć na kolumnie tableau
+    @staticmethod
+    def _can_place_on_tableau(card, column):
+        if not column:
+            return card & RANK_MASK == KING
+        under = column[-1]
+        return not under & HIDDEN_BIT and (card ^ under) & RED_BIT != 0 and \
+               (under & RANK_MASK) - (card & RANK_MASK) == 1
+
+    # Zwraca karty, które ruch zabiera ze strefy źródłowej (bez ich zdejmowania)
+    def _source_cards(self, zone, idx, count):
+        if zone == RESERVE:
+            if count != 1 or not self.first_reveal_done or self.current_reserve_card is None:
+                return []
+            return [self.current_reserve_card]
+        if zone == FINAL:
+            if count != 1 or not 0 <= idx < 4 or not self.final_stacks[idx]:
+                return []
+            return self.final_stacks[idx][-1:]
+        if zone == TABLEAU:
+            if not 0 <= idx < 7 or not 0 < count <= len(self.tableau[idx]):
+                return []
+            cards = self.tableau[idx][-count:]
+            if cards[0] & HIDDEN_BIT: # Zakryte karty leżą zawsze pod odkrytymi
+                return []
+            return cards
+        return []
+
+    # Sprawdza, czy z danej strefy można podnieść podaną liczbę kart
+    def can_pick_up(self, zone, idx, count=1):
+        return bool(self._source_cards(zone, idx, count))
+
+    # Sprawdza, czy ruch jest zgodny z zasadami gry (nie zmienia stanu). Dobranie jest dozwolone,
+    # jeśli w rezerwie jest jakakolwiek karta (jak w legal_moves).
+    def is_legal(self, move):
+        if move.src == STOCK:
+            return move == DRAW and bool(self.stock_count or self.waste_count or self.current_reserve_card is not None)
+        if move.src == RESERVE and move.src_idx != 0:
+            return False
+        cards = self._source_cards(move.src, move.src_idx, move.count)
+        if not cards:
+            return False
+        if move.dst == FINAL:
+            if move.count != 1 or not 0 <= move.dst_idx < 4:
+                return False
+            if move.src == FINAL and move.src_idx == move.dst_idx:
+                return False
+            return self._can_place_on_final(cards[0], self.final_stacks[move.dst_idx])
+        if move.dst == TABLEAU:
+            if not 0 <= move.dst_idx < 7:
+                return False
+            if move.src == TABLEAU and move.src_idx == move.dst_idx:
+                return False
+            return self._can_place_on_tableau(cards[0], self.tableau[move.dst_idx])
+        return False
+
+    # Wykonuje ruch, jeśli jest dozwolony; zwraca informację, czy stan się zmienił.
+    # Z auto_play=True po ruchu wykonywane jest automatyczne odkładanie kart (_play_safe_cards),
+    # a ruch razem z odłożonymi kartami jest cofany i ponawiany jako jeden wpis dziennika.
+    def apply(self, move, auto_play=False):
+        if not self.is_legal(move):
+            return False
+        self.redo_moves.clear()
+        start = len(self.undo_journal)
+        self._perform(move)
+        if auto_play:
+            self._play_safe_cards()
+            self._merge_journal(start)
+        return True
+
+    # Odkłada na kupki końcowe bezpieczne karty (jako jeden wpis dziennika); zwraca wykonane ruchy
+    def auto_play(self):
+        start = len(self.undo_journal)
+        moves = self._play_safe_cards()
+        if moves:
+            self.redo_moves.clear()
+            self._merge_journal(start)
+        return moves
+
+    # Sprawdza, czy kartę można bezpiecznie odłożyć na kupkę końcową: żadna karta przeciwnego
+    # koloru nie będzie już potrzebowała jej jako podkładki w tableau (obie kupki przeciwnego
+    # koloru sięgają już wartości o jeden niższej). Asy i dwójki są zawsze bezpieczne.
+    def is_safe_for_final(self, card):
+        rank = card & RANK_MASK
+        if rank <= 1:
+            return True
+        heights = self.foundation_heights
+        if card & RED_BIT:
+            return heights[0] >= rank and heights[3] >= rank # ♠ i ♣
+        return heights[1] >= rank and heights[2] >= rank # ♥ i ♦
+
+    # Sprawdza, czy grę da się dokończyć samymi ruchami na kupki końcowe: rezerwa jest pusta,
+    # a w tableau nie ma kart zakrytych
+    def can_auto_finish(self):
+        if self.stock_count or self.waste_count or self.current_reserve_card is not None:
+            return False
+        if any(card is not None for card in self.visible_draw3_cards):
+            return False
+        for column in self.tableau:
+            if column and column[0] & HIDDEN_BIT:
+                return False
+        return True
+
+    # Zwraca indeks kupki końcowej, na którą można położyć kartę (dla Asa pierwsza pusta) albo None
+    def final_target(self, card):
+        for idx, stack in enumerate(self.final_stacks):
+            if self._can_place_on_final(card, stack):
+                return idx
+        return None
+
+    # Przenosi na kupki końcowe kolejne bezpieczne karty z wierzchu kolumn tableau i z rezerwy,
+    # dopóki jakaś się znajduje. Gdy grę da się dokończyć (can_auto_finish), przenoszone są
+    # wszystkie karty. Każde przeniesienie to osobny wpis dziennika; zwraca wykonane ruchy.
+    def _play_safe_cards(self):
+        moves = []
+        finishing = self.can_auto_finish()
+        while True:
+            sources = [(TABLEAU, idx, column[-1]) for idx, column in enumerate(self.tableau) if column]
+            if self.first_reveal_done and self.current_reserve_card is not None:
+                sources.append((RESERVE, 0, self.current_reserve_card))
+            for zone, idx, card in sources:
+                if not finishing and not self.is_safe_for_final(card):
+                    continue
+                dst_idx = self.final_target(card)
+                if dst_idx is not None:
+                    move = Move(zone, idx, FINAL, dst_idx, 1)
+                    self._perform(move)
+                    moves.append(move)
+                    break
+            else:
+                return moves
+
+    # Łączy wpisy dziennika cofania od pozycji start w jeden wpis BatchEntry
+    def _merge_journal(self, start):
+        if len(self.undo_journal) - start < 2:
+            return
+        moves = []
+        entries = []
+        for entry in self.undo_journal[start:]:
+            if isinstance(entry, BatchEntry):
+                moves.extend(entry.moves)
+                entries.extend(entry.entries)
+            else:
+                moves.append(entry.move)
+                entries.append(entry)
+        self.undo_journal[start:] = [BatchEntry(tuple(moves), tuple(entries))]
+
+    # Wykonuje sprawdzony ruch i dopisuje do dziennika cofania tylko to, co się zmieniło
+    def _perform(self, move):
+        self.move_count += 1
+        self._stock_ops = []
+        flipped = False
+        reserve_before = None
+        if move.src == STOCK or move.src == RESERVE:
+            reserve_before = (self.current_reserve_card, tuple(self.visible_draw3_cards), self.first_reveal_done,
+                              self._reach)
+            self._reach = None
+
+        if move.src == STOCK:
+            self._draw_from_stock()
+            self.undo_journal.append(UndoEntry(move, False, self._stock_ops, reserve_before))
+            return
+
+        if move.src == RESERVE:
+            cards = [self._take_reserve_card()]
+        elif move.src == FINAL:
+            cards = [self.final_stacks[move.src_idx].pop()]
+            self.foundation_heights[(cards[0] & SUIT_MASK) >> 4] -= 1
+        else:
+            column = self.tableau[move.src_idx]
+            cards = column[-move.count:]
+            del column[-move.count:]
+            if column and column[-1] & HIDDEN_BIT: # Odkryj kartę pod spodem w kolumnie źródłowej
+                column[-1] ^= HIDDEN_BIT
+                flipped = True
+            self._column_info[move.src_idx] = None
+
+        if move.dst == FINAL:
+            self.final_stacks[move.dst_idx].extend(cards)
+            self.foundation_heights[(cards[0] & SUIT_MASK) >> 4] += 1
+        else:
+            self.tableau[move.dst_idx].extend(cards)
+            self._column_info[move.dst_idx] = None
+        self.undo_journal.append(UndoEntry(move, flipped, self._stock_ops, reserve_before))
+
+    # Zdejmuje aktywną kartę z rezerwy
+    def _take_reserve_card(self):
+        card = self.current_reserve_card
+        if self.difficulty == 'trudny':
+            self._refill_draw3_window(card_just_used=card)
+        else:
+            self.current_reserve_card = None
+        return card
+
+    # Odkrywa nową kartę/karty z rezerwy.
+    def _draw_from_stock(self):
+        if not self.first_reveal_done:
+            self.first_reveal_done = True
+
+        if self.difficulty == 'łatwy':
+            if self.current_reserve_card is not None:
+                self._push_waste(self.current_reserve_card)
+                self.current_reserve_card = None
+
+            if not self.stock_count and self.waste_count:
+                self._recycle_waste()
+
+            if self.stock_count:
+                self.current_reserve_card = self._pop_stock()
+
+        elif self.difficulty == 'trudny':
+            for card_in_window in reversed(self.visible_draw3_cards): # Przenieś widoczne karty do waste
+                if card_in_window is not None:
+                    self._push_waste(card_in_window)
+
+            self.visible_draw3_cards = [None, None, None]
+            drawn_this_turn = []
+
+            for _ in range(3): # Dobierz do 3 kart
+                if self.stock_count:
+                    drawn_this_turn.append(self._pop_stock())
+                elif self.waste_count: # Jeśli rezerwa pusta, odwróć waste
+                    self._recycle_waste()
+                    drawn_this_turn.append(self._pop_stock())
+                else: break # Rezerwa i waste są puste
+
+            for i in range(len(drawn_this_turn)):
+                self.visible_draw3_cards[i] = drawn_this_turn[i]
+
+            self._refill_draw3_window()
+
+    # Zdejmuje kartę z wierzchu stosu rezerwowego
+    def _pop_stock(self):
+        card = self._ring[self._stock_at]
+        self._stock_at += self._ring_dir
+        self.stock_count -= 1
+        self._stock_ops.append(card)
+        return card
+
+    # Odkłada kartę na stos kart odrzuconych (waste)
+    def _push_waste(self, card):
+        self._ring[self._waste_at] = card
+        self._waste_at += self._ring_dir
+        self.waste_count += 1
+        self._stock_ops.append(WASTE_PUSH)
+
+    # Przekłada waste na pusty stos rezerwowy: waste zajmuje teraz ostatnie pola tablicy cyklicznej
+    # (w trybie łatwym przy odwróconym kierunku, bo kolejność kart się odwraca)
+    def _recycle_waste(self):
+        count = self.waste_count
+        self.stock_count, self.waste_count = count, 0
+        self.stock_seen = True # Cofnięcie ruchu nie sprawia, że gracz zapomina kolejność kart
+        if self.difficulty == 'trudny':
+            self._set_ring(self._ring_base + self._ring_dir * count, self._ring_dir)
+        else:
+            self._set_ring(self._ring_base - self._ring_dir, -self._ring_dir)
+        self._stock_ops.append(RECYCLE)
+
+    # Odwraca zapisane operacje na stosie rezerwowym (w kolejności odwrotnej do wykonania)
+    def _revert_stock_ops(self, stock_ops):
+        for op in reversed(stock_ops):
+            if op == WASTE_PUSH:
+                self.waste_count -= 1
+                self._waste_at -= self._ring_dir
+            elif op == RECYCLE:
+                count = self.stock_count
+                self.stock_count, self.waste_count = 0, count
+                if self.difficulty == 'trudny':
+                    self._set_ring(self._ring_base - self._ring_dir * count, self._ring_dir)
+                else: # Odwrócenie kierunku jest swoją własną odwrotnością
+                    self._set_ring(self._ring_base - self._ring_dir, -self._ring_dir)
+            else:
+                self.stock_count += 1
+                self._stock_at -= self._ring_dir
+                self._ring[self._stock_at] = op
+
+    # Uzupełnia zestaw trzech kart w trybie trudnym: karty okna (bez zabranej) są dosuwane do prawej,
+    # a puste miejsca z lewej zapełniane kartami ze stosu rezerwowego; aktywna jest skrajna prawa karta
+    def _refill_draw3_window(self, card_just_used=None):
+        if self.difficulty != 'trudny':
+            return
+        window = self.visible_draw3_cards
+        if card_just_used is None and None not in window: # Pełne okno po dobraniu - nic do uzupełnienia
+            self.current_reserve_card = window[2]
+            return
+        kept = [card for card in window if card is not None and card != card_just_used]
+        window = [None] * (3 - len(kept)) + kept
+        for i in range(3 - len(kept)):
+            if not self.stock_count:
+                if not self.waste_count:
+                    break
+                self._recycle_waste()
+            window[i] = self._pop_stock()
+        self.visible_draw3_cards = window
+        self.current_reserve_card = None
+        for card in reversed(window):
+            if card is not None:
+                self.current_reserve_card = card
+                break
+
+    # Zwraca karty osiągalne w rezerwie w jednym pełnym obiegu stosu jako pary (liczba dobrań, karta).
+    # Wynik jest wyliczany raz dla stanu rezerwy: przechodzi do kopii planszy, nie zmieniają go ruchy
+    # w tableau i na kupkach końcowych, a cofnięcie ruchu z rezerwy przywraca poprzedni wynik.
+    # Opcjonalny cache (z metodami get i store, np. solver.TranspositionTable) przechowuje wyniki
+    # dla stanów rezerwy osiąganych różnymi drogami.
+    def reserve_reach(self, cache=None):
+        if self._reach is None:
+            if cache is None:
+                self._reach = self._compute_reach()
+            else:
+                key = self._reserve_key()
+                self._reach = cache.get(key)
+                if self._reach is None:
+                    self._reach = self._compute_reach()
+                    cache.store(key, self._reach)
+        return self._reach
+
+    # Dobiera karty (jak _draw_from_stock, na zwykłych listach - stos ma tu wierzch na końcu),
+    # dopóki stan rezerwy się nie powtórzy
+    def _compute_reach(self):
+        stock = self.reserve_stock[::-1]
+        waste = self.waste_pile
+        window = self.visible_draw3_cards[:]
+        current = self.current_reserve_card
+        revealed = self.first_reveal_done
+        draw3 = self.difficulty == 'trudny'
+        found = []
+        seen = {(tuple(stock), tuple(waste), tuple(window), current, revealed)}
+        draws = 0
+        while True:
+            if revealed and current is not None:
+                found.append((draws, current))
+            revealed = True
+            if draw3:
+                waste.extend(card for card in reversed(window) if card is not None)
+                drawn = []
+                for _ in range(3):
+                    if not stock:
+                        if not waste:
+                            break
+                        stock, waste = waste[::-1], []
+                    drawn.append(stock.pop())
+                window = [None] * (3 - len(drawn)) + drawn
+                current = drawn[-1] if drawn else None
+            else:
+                if current is not None:
+                    waste.append(current)
+                    current = None
+                if not stock and waste:
+                    stock, waste = waste, [] # Odwrócenie kolejności: wierzch waste staje się wierzchem stosu
+                if stock:
+                    current = stock.pop()
+            draws += 1
+            key = (tuple(stock), tuple(waste), tuple(window), current, revealed)
+            if key in seen:
+                return tuple(found)
+            seen.add(key)
+
+    # Stan rezerwy jako wartość do porównań (niezależny od położenia kart w tablicy cyklicznej)
+    def _reserve_key(self):
+        return (tuple(self.reserve_stock), tuple(self.waste_pile), tuple(self.visible_draw3_cards),
+                self.current_reserve_card, self.first_reveal_done)
+
+    # Sprawdza, czy wszystkie karty leżą na kupkach końcowych
+    def is_won(self):
+        for stack in self.final_stacks:
+            if len(stack) != 13:
+                return False
+        return True
+
+    # Cofa ostatni wykonany ruch (lub grupę ruchów zapisaną jako BatchEntry) na podstawie wpisu
+    # w dzienniku; licznik ruchów nie jest cofany
+    def undo(self):
+        if not self.undo_journal:
+            return False
+        entry = self.undo_journal.pop()
+        if isinstance(entry, BatchEntry):
+            for sub_entry in reversed(entry.entries):
+                self._revert(sub_entry)
+            self.redo_moves.append(entry.moves)
+        else:
+            self._revert(entry)
+            self.redo_moves.append(entry.move)
+        return True
+
+    # Odwraca zmiany zapisane w jednym wpisie UndoEntry
+    def _revert(self, entry):
+        move, flipped, stock_ops, reserve_before = entry
+        if move.src != STOCK:
+            if move.dst == FINAL:
+                cards = [self.final_stacks[move.dst_idx].pop()]
+                self.foundation_heights[(cards[0] & SUIT_MASK) >> 4] -= 1
+            else:
+                column = self.tableau[move.dst_idx]
+                cards = column[-move.count:]
+                del column[-move.count:]
+                self._column_info[move.dst_idx] = None
+
+            if move.src == FINAL:
+                self.final_stacks[move.src_idx].extend(cards)
+                self.foundation_heights[(cards[0] & SUIT_MASK) >> 4] += 1
+            elif move.src == TABLEAU:
+                column = self.tableau[move.src_idx]
+                if flipped:
+                    column[-1] |= HIDDEN_BIT
+                column.extend(cards)
+                self._column_info[move.src_idx] = None
+
+        if reserve_before is not None:
+            self._revert_stock_ops(stock_ops)
+            current, window, first_reveal_done, reach = reserve_before
+            self.current_reserve_card = current
+            self.visible_draw3_cards = list(window)
+            self.first_reveal_done = first_reveal_done
+            self._reach = reach
+
+    # Ponawia ostatnio cofnięty ruch (lub grupę ruchów)
+    def redo(self):
+        if not self.redo_moves:
+            return False
+        moves = self.redo_moves.pop()
+        if isinstance(moves, Move):
+            self._perform(moves)
+        else:
+            start = len(self.undo_journal)
+            for move in moves:
+                self._perform(move)
+            self._merge_journal(start)
+        return True
+
+# Generuje wszystkie dozwolone ruchy w danym stanie, nie zmieniając go: dobranie z rezerwy, ruchy
+# karty z rezerwy, ruchy z kolumn tableau (wierzchnia karta na kupkę końcową, ciągi kart na inne
+# kolumny) i ruchy z kupek końcowych na tableau (przełożenie Asa na inną pustą kupkę końcową niczego
+# nie zmienia i jest pomijane). Cele są wyszukiwane w słownikach budowanych raz
+# na wywołanie, a nie przez sprawdzanie każdej pary źródło-cel.
+def legal_moves(state):
+    infos = [state.column_info(idx) for idx in range(7)]
+    empty_columns = []
+    tableau_targets = {} # (wartość, bit czerwieni) karty -> kolumny, na których można ją położyć
+    for idx, info in enumerate(infos):
+        top = info.top
+        if top is None:
+            empty_columns.append(idx)
+        elif not top & HIDDEN_BIT and top & RANK_MASK != ACE:
+            tableau_targets.setdefault(((top & RANK_MASK) - 1, ~top & RED_BIT), []).append(idx)
+    empty_finals = []
+    final_targets = {} # kod karty -> kupka końcowa, na którą można ją położyć
+    for idx, stack in enumerate(state.final_stacks):
+        if not stack:
+            empty_finals.append(idx)
+        elif stack[-1] & RANK_MASK != KING:
+            final_targets[stack[-1] + 1] = idx # Następna karta tego samego koloru ma kod większy o 1
+
+    def to_tableau(card):
+        if card & RANK_MASK == KING:
+            return empty_columns
+        return tableau_targets.get((card & RANK_MASK, card & RED_BIT), ())
+
+    def to_final(card):
+        if card & RANK_MASK == ACE:
+            return empty_finals
+        idx = final_targets.get(card)
+        return () if idx is None else (idx,)
+
+    if state.stock_count or state.waste_count or state.current_reserve_card is not None:
+        yield DRAW
+
+    card = state.current_reserve_card
+    if state.first_reveal_done and card is not None:
+        for dst_idx in to_final(card):
+            yield Move(RESERVE, 0, FINAL, dst_idx, 1)
+        for dst_idx in to_tableau(card):
+            yield Move(RESERVE, 0, TABLEAU, dst_idx, 1)
+
+    for src_idx, info in enumerate(infos):
+        if not info.run_length:
+            continue
+        column = state.tableau[src_idx]
+        for dst_idx in to_final(info.top):
+            yield Move(TABLEAU, src_idx, FINAL, dst_idx, 1)
+        for count in range(info.run_length, 0, -1):
+            for dst_idx in to_tableau(column[-count]):
+                if dst_idx != src_idx:
+                    yield Move(TABLEAU, src_idx, TABLEAU, dst_idx, count)
+
+    for src_idx, stack in enumerate(state.final_stacks):
+        if stack:
+            for dst_idx in to_tableau(stack[-1]):
+                yield Move(FINAL, src_idx, TABLEAU, dst_idx, 1)
@@ -0,0 +1,65 @@
+from engine import Card, HIDDEN_BIT
+
+CARD_WIDTH = 7
+CARD_HEIGHT = 5
+PARTIAL_WIDTH = 4 # Szerokość częściowo zasłoniętej karty w oknie trzech kart (tryb trudny)
+
+# Atlas gotowych wyglądów kart: każdy wariant (karta, kolor ramki, szerokość, zakryta) jest budowany
+# tylko raz, a kolejne klatki współdzielą te same krotki linii zamiast składać je od nowa
+class CardGlyphs:
+    def __init__(self):
+        self._faces = {}
+        self._slots = {}
+
+    # Zwraca linie karty; card to kod karty albo None (rysowana jest wtedy zakryta karta).
+    # Bez koloru ramki odkryta karta ma ramkę w swoim kolorze, a zakryta - szarą.
+    def face(self, card, border=None, width=CARD_WIDTH, hidden=False):
+        if card is None or hidden or card & HIDDEN_BIT:
+            key = (None, border, width, True) # Wszystkie zakryte karty wyglądają tak samo
+        else:
+            key = (card, border, width, False)
+        lines = self._faces.get(key)
+        if lines is None:
+            lines = self._faces[key] = self._build_face(*key)
+        return lines
+
+    # Zwraca linie pustego miejsca na kartę (sama ramka); bez koloru ramki jest ona szara
+    def slot(self, border=None):
+        lines = self._slots.get(border)
+        if lines is None:
+            from colorama import Fore, Style
+            color = Fore.LIGHTBLACK_EX if border is None else border
+            lines = self._slots[border] = tuple(color + l + Style.RESET_ALL for l in ["┌─────┐"] + ["│     │"] * 3 + ["└─────┘"])
+        return lines
+
+    @staticmethod
+    def _build_face(card, border, width, hidden):
+        from colorama import Fore, Style # Wczytywane przy pierwszej budowanej karcie, nie przy starcie programu
+        card_obj = Card.from_code(card) if not hidden else None
+        if width == PARTIAL_WIDTH:
+            if hidden:
+                border = Fore.LIGHTBLACK_EX if border is None else border
+                return (border + "┌───" + Style.RESET_ALL,
+                        border + "│││ " + Style.RESET_ALL,
+                        border + "│││ " + Style.RESET_ALL,
+                        border + "│││ " + Style.RESET_ALL,
+                        border + "└───" + Style.RESET_ALL)
+            color = Fore.RED if card_obj.is_red() else Fore.WHITE
+            pad = " " if card_obj.value != "10" else ""
+            border = border if border else color
+            return (border + "┌───" + Style.RESET_ALL,
+                    border + "│" + Style.RESET_ALL + color + f"{card_obj.value + pad}" + Style.RESET_ALL + border + " " + Style.RESET_ALL,
+                    border + "│ " + Style.RESET_ALL + color + f"{card_obj.suit} " + Style.RESET_ALL + border + "" + Style.RESET_ALL,
+                    border + "│   " + Style.RESET_ALL,
+                    border + "└───" + Style.RESET_ALL)
+
+        if hidden:
+            border = Fore.LIGHTBLACK_EX if border is None else border
+            return (border + "┌─────┐" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "└─────┘" + Style.RESET_ALL)
+        color = Fore.RED if card_obj.is_red() else Fore.WHITE
+        pad = " " if card_obj.value != "10" else ""
+        border = border if border else color
+        return (border + "┌─────┐" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"{card_obj.value + pad}   " + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"  {card_obj.suit}  " + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"   {pad + card_obj.value}" + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "└─────┘" + Style.RESET_ALL)
+
+# Atlas współdzielony przez cały program
+GLYPHS = CardGlyphs()
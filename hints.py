@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import namedtuple
+
+from engine import DRAW
+from solver import Solver, zobrist_hash
+
+# Podpowiedź: najlepsza znaleziona sekwencja ruchów silnika (dobrania i ruch zagrywający), jej ocena,
+# głębokość ostatniej ukończonej iteracji przeszukiwania, liczba węzłów i czas, a także skrót
+# stanu, dla którego jej szukano (state_key). moves jest puste, jeśli nie ma żadnego ruchu.
+Hint = namedtuple("Hint", ["moves", "score", "depth", "nodes", "elapsed_ms", "state_key"])
+
+# Wagi oceny pozycji: karty na kupkach końcowych, zakryte karty w kolumnach, puste kolumny
+FOUNDATION_WEIGHT = 10
+HIDDEN_WEIGHT = 8
+EMPTY_COLUMN_WEIGHT = 4
+WIN_SCORE = 10000
+
+# Ocena pozycji z punktu widzenia gracza (im więcej, tym lepiej)
+def evaluate(state):
+    score = FOUNDATION_WEIGHT * sum(map(len, state.final_stacks))
+    for idx, column in enumerate(state.tableau):
+        if column:
+            score -= HIDDEN_WEIGHT * state.column_info(idx).first_up
+        else:
+            score += EMPTY_COLUMN_WEIGHT
+    return score
+
+# Przeszukiwanie "w dowolnej chwili": iteracyjne pogłębianie, w którym każda ukończona iteracja
+# daje najlepszy ruch dla większej głębokości. Wartość pozycji to najlepsza ocena osiągalna
+# w co najwyżej depth ruchach (gracz może też nic nie robić), a wygrana jest warta WIN_SCORE -
+# tym więcej, im szybciej do niej dochodzi. Ruchy i ich kolejność pochodzą z solvera
+# (Solver._ordered_moves), więc dobrania są łączone z zagraniem karty z rezerwy.
+class HintSearch(Solver):
+    MAX_DEPTH = 40
+
+    def __init__(self, time_limit, cancel=None):
+        super().__init__(max_nodes=float("inf"), time_limit=time_limit, table_size=40000)
+        self.cancel = cancel # threading.Event przerywający przeszukiwanie z zewnątrz
+
+    # Zwraca najlepszą podpowiedź znalezioną w limicie czasu (stan silnika nie jest zmieniany)
+    def best_hint(self, engine):
+        started = time.perf_counter()
+        self._deadline = started + self.time_limit
+        self._aborted = False
+        self.nodes = 0
+        state = engine.copy()
+        state_key = zobrist_hash(state)
+        root_moves = self._ordered_moves(state)
+        best = (evaluate(state), ())
+        depth = 0
+        while root_moves and depth < self.MAX_DEPTH and not self._aborted:
+            self._cutoffs = 0
+            self._path = {state_key}
+            self._values = {} # skrót stanu -> (pozostała głębokość, wartość) - tylko w tej iteracji
+            iteration_best = None
+            for sequence in root_moves:
+                value = self._play(state, sequence, depth)
+                if self._aborted:
+                    break
+                if iteration_best is None or value > iteration_best[0]:
+                    iteration_best = (value, sequence)
+            if iteration_best is None:
+                break
+            # Przerwana iteracja też się liczy: poprzedni najlepszy ruch był sprawdzony jako pierwszy
+            best = iteration_best
+            if not self._aborted:
+                depth += 1
+            if best[0] >= WIN_SCORE or not self._cutoffs: # Wygrana albo przeszukano całe drzewo
+                break
+            root_moves = [best[1]] + [sequence for sequence in root_moves if sequence != best[1]]
+        if not best[1] and root_moves: # Limit czasu minął przed oceną pierwszego ruchu
+            best = (best[0], root_moves[0])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return Hint(best[1], best[0], depth, self.nodes, elapsed_ms, state_key)
+
+    # Wykonuje sekwencję ruchów, ocenia powstałą pozycję i cofa ruchy
+    def _play(self, state, sequence, depth):
+        for move in sequence:
+            state._perform(move)
+        value = self._value(state, depth)
+        for _ in sequence:
+            state.undo()
+        state.redo_moves.clear()
+        return value
+
+    def _value(self, state, depth):
+        self.nodes += 1
+        if self.nodes & 0x3F == 0 and (time.perf_counter() > self._deadline or
+                                       (self.cancel is not None and self.cancel.is_set())):
+            self._aborted = True
+        if state.can_auto_finish():
+            return WIN_SCORE + depth
+        score = evaluate(state)
+        if depth == 0:
+            self._cutoffs += 1
+            return score
+        if self._aborted:
+            return score
+
+        key = zobrist_hash(state)
+        if key in self._path:
+            return score
+        known = self._values.get(key)
+        if known is not None and known[0] >= depth:
+            return known[1]
+        self._path.add(key)
+        best = score
+        for sequence in self._ordered_moves(state):
+            value = self._play(state, sequence, depth - 1)
+            if value > best:
+                best = value
+            if self._aborted:
+                break
+        self._path.discard(key)
+        if not self._aborted:
+            self._values[key] = (depth, best)
+        return best
+
+# Opis podpowiedzi dla gracza
+def describe_hint(hint):
+    from replay import describe_move
+    if not hint.moves:
+        return "Brak ruchów poprawiających sytuację - dobierz kartę ('s') albo cofnij ruch ('c')."
+    # Sekwencja może składać się z kilku ruchów (Solver._ordered_moves) - podpowiadany jest pierwszy
+    draws = 0
+    for move in hint.moves:
+        if move != DRAW:
+            break
+        draws += 1
+    text = describe_move(move)
+    if draws:
+        text = f"dobierz kartę ('s', {draws}x), potem {text}"
+    return f"Podpowiedź: {text}"
+
+# Podpowiedzi liczone w osobnym wątku, żeby nie blokować obsługi klawiszy. Każde nowe zlecenie
+# przerywa poprzednie; gotowa podpowiedź jest przekazywana do on_ready (wywoływanego w wątku
+# roboczym) razem ze skrótem stanu, dla którego jej szukano.
+class HintEngine:
+    def __init__(self, on_ready, budget_ms=500):
+        self.on_ready = on_ready
+        self.budget_ms = budget_ms
+        self._cancel = None
+        self._thread = None
+
+    # Zaczyna szukać podpowiedzi dla podanego stanu (na jego kopii) i zwraca skrót tego stanu
+    def start(self, engine):
+        self.cancel()
+        cancel = self._cancel = threading.Event()
+        search = HintSearch(self.budget_ms / 1000, cancel)
+        state = engine.copy()
+        self._thread = threading.Thread(target=self._run, args=(search, state, cancel), daemon=True)
+        self._thread.start()
+        return zobrist_hash(state)
+
+    # Przerywa trwające przeszukiwanie (jego wynik nie zostanie przekazany)
+    def cancel(self):
+        if self._cancel is not None:
+            self._cancel.set()
+            self._cancel = None
+
+    def _run(self, search, state, cancel):
+        hint = search.best_hint(state)
+        if not cancel.is_set():
+            self.on_ready(hint)
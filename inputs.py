@@ -0,0 +1,203 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Klawisze nawigacji - przy przytrzymaniu klawisza system powtarza je wiele razy na sekundę
+NAVIGATION_KEYS = frozenset(("right", "left", "up", "down"))
+
+# Sekwencje terminala (po znaku ESC) odpowiadające klawiszom specjalnym
+_ESCAPE_SEQUENCES = {
+    b"[A": "up", b"[B": "down", b"[C": "right", b"[D": "left",
+    b"OA": "up", b"OB": "down", b"OC": "right", b"OD": "left",
+    b"[H": "home", b"[F": "end", b"OH": "home", b"OF": "end",
+    b"[1~": "home", b"[4~": "end", b"[7~": "home", b"[8~": "end",
+}
+# Klawisze specjalne w konsoli Windows (drugi znak po prefiksie '\x00' lub '\xe0')
+_WINDOWS_KEYS = {"H": "up", "P": "down", "K": "left", "M": "right", "G": "home", "O": "end"}
+
+# Zamienia bajty odczytane z terminala na nazwy klawiszy (jak w bibliotece keyboard: "up", "enter",
+# "esc", "space", "s"...). Zwraca nazwy klawiszy i niedokończoną sekwencję ESC do dołączenia do
+# następnego odczytu; z final=True samotny ESC na końcu danych to wciśnięcie klawisza Esc.
+def parse_keys(data, final=False):
+    keys = []
+    i = 0
+    while i < len(data):
+        byte = data[i]
+        if byte == 0x1B:
+            rest = data[i + 1:]
+            for sequence, name in _ESCAPE_SEQUENCES.items():
+                if rest.startswith(sequence):
+                    keys.append(name)
+                    i += 1 + len(sequence)
+                    break
+            else:
+                if not final and (not rest or any(sequence.startswith(rest) for sequence in _ESCAPE_SEQUENCES)):
+                    return keys, data[i:] # Reszta sekwencji jeszcze nie dotarła
+                if rest[:1] == b"[": # Nieobsługiwana sekwencja (np. PgUp) - pomijana do bajtu kończącego
+                    end = i + 2
+                    while end < len(data) and not 0x40 <= data[end] <= 0x7E:
+                        end += 1
+                    i = end + 1
+                else:
+                    keys.append("esc")
+                    i += 1
+            continue
+        if byte in (0x0D, 0x0A):
+            keys.append("enter")
+        elif byte == 0x20:
+            keys.append("space")
+        elif 0x21 <= byte <= 0x7E:
+            keys.append(chr(byte).lower())
+        i += 1
+    return keys, b""
+
+# Kolejka zdarzeń wejścia: dowolne wątki (obsługa klawiatury, czytnik terminala) dopisują nazwy
+# wciśniętych klawiszy, a jeden wątek gry je odbiera, więc stan gry zmienia tylko ten wątek.
+class InputQueue:
+    def __init__(self):
+        self._events = deque()
+        self._ready = threading.Condition()
+
+    def put(self, key):
+        with self._ready:
+            self._events.append(key)
+            self._ready.notify()
+
+    # Czeka (najwyżej timeout sekund, None - bez limitu) na pierwszy klawisz i zwraca go albo None
+    def get(self, timeout=None):
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._events, timeout):
+                return None
+            return self._events.popleft()
+
+    # Czeka na zdarzenia jak get() i odbiera wszystkie oczekujące naraz jako listę par
+    # (klawisz, liczba wciśnięć) - kolejne powtórzenia tego samego klawisza nawigacji
+    # (przytrzymana strzałka) są łączone w jedną parę
+    def get_batch(self, timeout=None):
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._events, timeout):
+                return []
+            events = list(self._events)
+            self._events.clear()
+        batch = []
+        for key in events:
+            if batch and batch[-1][0] == key and key in NAVIGATION_KEYS:
+                batch[-1][1] += 1
+            else:
+                batch.append([key, 1])
+        return [tuple(item) for item in batch]
+
+# Wejście przez globalne przechwytywanie klawiszy biblioteki keyboard: wciśnięcia wybranych
+# klawiszy trafiają do kolejki (i nie docierają do innych programów)
+class KeyboardInput:
+    def __init__(self, keys):
+        self.keys = keys
+        self.queue = InputQueue()
+        self._hooks = []
+
+    def __enter__(self):
+        import keyboard
+        for key in self.keys:
+            self._hooks.append(keyboard.on_press_key(key, lambda e, key=key: self.queue.put(key), suppress=True))
+        return self
+
+    def __exit__(self, *exc):
+        import keyboard
+        for hook in self._hooks:
+            keyboard.unhook(hook)
+        self._hooks = []
+
+    # Czeka na jeden wciśnięty klawisz (dowolny) i zwraca jego nazwę
+    @staticmethod
+    def read_key():
+        import keyboard
+        while True:
+            event = keyboard.read_event(suppress=True)
+            if event.event_type == keyboard.KEY_DOWN: # Zwolnienie klawisza nie jest wyborem
+                return event.name or str(event.scan_code)
+
+# Wejście bezpośrednio z terminala (standardowe wejście w trybie znakowym, bez echa) - nie wymaga
+# globalnego przechwytywania klawiatury ani uprawnień administratora, działa też przez SSH.
+# Znaki są czytane w osobnym wątku i trafiają do kolejki jako nazwy klawiszy.
+class StdinInput:
+    POLL_INTERVAL = 0.1 # Co ile sekund wątek czytający sprawdza, czy ma się zakończyć
+    ESC_TIMEOUT = 0.03  # Jak długo czekać na dalsze znaki po ESC, zanim zostanie uznany za klawisz Esc
+
+    def __init__(self, keys=None):
+        self.keys = keys # Klawisze przekazywane do kolejki (None - wszystkie)
+        self.queue = InputQueue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_mode = None
+
+    def __enter__(self):
+        if os.name != 'nt':
+            import termios
+            import tty
+            fd = sys.stdin.fileno()
+            self._saved_mode = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._read_windows if os.name == 'nt' else self._read_posix, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self._saved_mode is not None:
+            import termios
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, self._saved_mode)
+            self._saved_mode = None
+
+    # Czeka na jeden wciśnięty klawisz (dowolny) i zwraca jego nazwę
+    @classmethod
+    def read_key(cls):
+        with cls() as source:
+            return source.queue.get()
+
+    def _put(self, keys):
+        for key in keys:
+            if self.keys is None or key in self.keys:
+                self.queue.put(key)
+
+    def _read_posix(self):
+        import select
+        fd = sys.stdin.fileno()
+        pending = b""
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd], [], [], self.ESC_TIMEOUT if pending else self.POLL_INTERVAL)
+            if not ready:
+                if pending: # Po ESC nic więcej nie nadeszło - to był klawisz Esc
+                    keys, pending = parse_keys(pending, final=True)
+                    self._put(keys)
+                continue
+            data = os.read(fd, 64)
+            if not data: # Koniec wejścia
+                break
+            keys, pending = parse_keys(pending + data)
+            self._put(keys)
+
+    def _read_windows(self):
+        import msvcrt
+        while not self._stop.is_set():
+            if not msvcrt.kbhit():
+                time.sleep(self.ESC_TIMEOUT)
+                continue
+            char = msvcrt.getwch()
+            if char in ("\x00", "\xe0"):
+                key = _WINDOWS_KEYS.get(msvcrt.getwch())
+                if key:
+                    self._put([key])
+            elif char == "\x1b":
+                self._put(["esc"])
+            elif char == "\r":
+                self._put(["enter"])
+            elif char == " ":
+                self._put(["space"])
+            elif char.isprintable():
+                self._put([char.lower()])
+
+INPUT_BACKENDS = {"keyboard": KeyboardInput, "stdin": StdinInput}
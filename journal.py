@@ -0,0 +1,184 @@
+import os
+import struct
+import time
+
+from engine import Engine, Move
+
+# Plik dziennika gry: nagłówek opisujący rozdanie, a po nim rekordy operacji dopisywane po każdym
+# ruchu gracza. Odtworzenie gry to rozdanie tej samej talii i powtórzenie operacji w silniku.
+#
+# Nagłówek: znacznik _MAGIC i opis rozdania (pack_deal).
+# Rekord: kod operacji (1 bajt), a dla ruchów dodatkowo ruch zapisany w 2 bajtach (pack_move).
+_MAGIC = b"PSJ1"
+_DIFFICULTIES = ['łatwy', 'trudny']
+_DEAL_NUMBER = 0
+_DEAL_DECK = 1
+
+# Kody operacji zapisywanych w dzienniku
+OP_MOVE = 0       # ruch gracza
+OP_MOVE_AUTO = 1  # ruch gracza z automatycznym odłożeniem kart (Engine.apply z auto_play=True)
+OP_UNDO = 2
+OP_REDO = 3
+OP_AUTO_ON = 4    # włączenie automatycznego odkładania kart (z odłożeniem kart od razu - Engine.auto_play)
+OP_AUTO_OFF = 5
+
+_MOVE = struct.Struct("<H")
+_DEAL_NUMBER_FORMAT = struct.Struct("<Q")
+
+# Ruch w 16 bitach: strefa źródła (2), indeks źródła (3), strefa celu (2), indeks celu (3), liczba kart (6)
+def pack_move(move):
+    return move.src << 14 | move.src_idx << 11 | move.dst << 9 | move.dst_idx << 6 | move.count
+
+def unpack_move(code):
+    return Move(code >> 14, code >> 11 & 7, code >> 9 & 3, code >> 6 & 7, code & 0x3F)
+
+# Opis rozdania gry: poziom trudności (1 bajt), rodzaj rozdania (1 bajt) i numer rozdania (8 bajtów)
+# albo - dla talii podanej identyfikatorem lub bardzo dużych numerów - kolejność kart w talii (52 bajty)
+def pack_deal(engine):
+    if engine.deal_number is not None and engine.deal_number < 1 << 64:
+        deal = bytes([_DEAL_NUMBER]) + _DEAL_NUMBER_FORMAT.pack(engine.deal_number)
+    else:
+        deal = bytes([_DEAL_DECK]) + bytes(engine.deck_source_data)
+    return bytes([_DIFFICULTIES.index(engine.difficulty)]) + deal
+
+# Odczytuje opis rozdania zaczynający się od pozycji pos i rozdaje grę; zwraca silnik i pozycję
+# za opisem rozdania. Dla uszkodzonych danych zgłasza ValueError.
+def unpack_deal(data, pos=0):
+    if len(data) < pos + 2:
+        raise ValueError("Nieprawidłowy opis rozdania.")
+    difficulty, kind = data[pos], data[pos + 1]
+    pos += 2
+    if difficulty >= len(_DIFFICULTIES) or kind not in (_DEAL_NUMBER, _DEAL_DECK):
+        raise ValueError("Nieprawidłowy opis rozdania.")
+    engine = Engine(_DIFFICULTIES[difficulty])
+    if kind == _DEAL_NUMBER:
+        if len(data) < pos + _DEAL_NUMBER_FORMAT.size:
+            raise ValueError("Nieprawidłowy opis rozdania.")
+        engine.new_deal(_DEAL_NUMBER_FORMAT.unpack_from(data, pos)[0])
+        pos += _DEAL_NUMBER_FORMAT.size
+    else:
+        if len(data) < pos + 52:
+            raise ValueError("Nieprawidłowy opis rozdania.")
+        engine.new_deal(deck=list(data[pos:pos + 52])) # ValueError dla nieprawidłowej talii
+        pos += 52
+    return engine, pos
+
+# Dziennik bieżącej gry zapisywany na bieżąco do pliku. Każdy rekord od razu trafia do systemu
+# operacyjnego (przerwanie programu go nie gubi), a kosztowne utrwalenie na dysku (fsync) jest
+# wykonywane zbiorczo - co FSYNC_EVERY rekordów, co FSYNC_INTERVAL sekund i przy zamknięciu.
+class GameJournal:
+    FSYNC_EVERY = 32
+    FSYNC_INTERVAL = 2.0
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pending = 0
+        self._last_sync = 0.0
+
+    # Sprawdza, czy istnieje zapisana gra do wznowienia
+    def exists(self):
+        return os.path.exists(self.path)
+
+    # Rozpoczyna nowy dziennik dla rozdanej właśnie gry (poprzedni dziennik jest zastępowany).
+    # Jeśli pliku nie da się utworzyć, gra toczy się bez dziennika.
+    def start(self, engine):
+        self.close()
+        header = _MAGIC + pack_deal(engine)
+        try:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError:
+            return
+        self._write(header)
+        self.sync()
+
+    # Odtwarza zapisaną grę i otwiera dziennik do dalszego zapisu. Zwraca silnik w stanie z chwili
+    # ostatniego zapisanego ruchu oraz ustawienie automatycznego odkładania kart (None, jeśli gracz
+    # go nie zmieniał). Urwany ostatni rekord (awaria w trakcie zapisu) jest pomijany i obcinany.
+    def resume(self):
+        self.close()
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("Nieprawidłowy plik zapisanej gry.")
+        engine, header_size = unpack_deal(data, len(_MAGIC))
+        auto_play = None
+        pos = header_size
+        valid = pos
+        while pos < len(data):
+            op = data[pos]
+            if op in (OP_MOVE, OP_MOVE_AUTO):
+                if pos + 1 + _MOVE.size > len(data):
+                    break
+                move = unpack_move(_MOVE.unpack_from(data, pos + 1)[0])
+                if not engine.apply(move, auto_play=op == OP_MOVE_AUTO):
+                    break
+                pos += 1 + _MOVE.size
+            elif op == OP_UNDO:
+                engine.undo()
+                pos += 1
+            elif op == OP_REDO:
+                engine.redo()
+                pos += 1
+            elif op == OP_AUTO_ON:
+                engine.auto_play()
+                auto_play = True
+                pos += 1
+            elif op == OP_AUTO_OFF:
+                auto_play = False
+                pos += 1
+            else:
+                break
+            valid = pos
+
+        self._fd = os.open(self.path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        os.ftruncate(self._fd, valid)
+        os.lseek(self._fd, valid, os.SEEK_SET)
+        self.sync()
+        return engine, auto_play
+
+    def record_move(self, move, auto_play):
+        self._write(bytes([OP_MOVE_AUTO if auto_play else OP_MOVE]) + _MOVE.pack(pack_move(move)))
+
+    def record_undo(self):
+        self._write(bytes([OP_UNDO]))
+
+    def record_redo(self):
+        self._write(bytes([OP_REDO]))
+
+    def record_auto_play(self, enabled):
+        self._write(bytes([OP_AUTO_ON if enabled else OP_AUTO_OFF]))
+
+    # Utrwala na dysku wszystkie zapisane rekordy
+    def sync(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
+
+    # Zamyka i usuwa dziennik (gra zakończona, nie ma czego wznawiać)
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    # Dopisuje rekord; błąd zapisu (np. brak miejsca na dysku) wyłącza dziennik, ale nie przerywa gry
+    def _write(self, record):
+        if self._fd is None:
+            return
+        try:
+            os.write(self._fd, record)
+            self._pending += 1
+            if self._pending >= self.FSYNC_EVERY or time.monotonic() - self._last_sync >= self.FSYNC_INTERVAL:
+                self.sync()
+        except OSError:
+            os.close(self._fd)
+            self._fd = None
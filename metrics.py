@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+# Zmienna środowiskowa włączająca pomiary: ścieżka pliku z wynikami (albo "1" - plik DEFAULT_FILE)
+METRICS_ENV = "PASJANS_METRICS"
+DEFAULT_FILE = "metrics.json"
+
+# Histogram wartości (czasów w mikrosekundach albo rozmiarów w bajtach) o przedziałach rosnących
+# wykładniczo: SUBDIVISIONS przedziałów na każde podwojenie wartości, więc rozdzielczość jest
+# względna (ok. 19%), a pamięć nie zależy od liczby pomiarów
+class Histogram:
+    SUBDIVISIONS = 4
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        bucket = int(math.log2(value) * self.SUBDIVISIONS) if value >= 1 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    # Górna granica przedziału, w którym leży podany percentyl (np. 95)
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** ((bucket + 1) / self.SUBDIVISIONS), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": {f"{2 ** ((bucket + 1) / self.SUBDIVISIONS):.1f}": count
+                        for bucket, count in sorted(self.buckets.items())},
+        }
+
+# Pomiary interfejsu gry: dla każdego klawisza histogramy czasu zmiany stanu (akcja gry) i czasu
+# rysowania klatki (display_game) w mikrosekundach, liczba wpisów dodanych do dziennika cofania
+# oraz rozmiar danych wysłanych do terminala na klatkę. Wyłączone pomiary (Game.metrics = None)
+# kosztują jedno porównanie na zdarzenie.
+class Metrics:
+    def __init__(self, path=DEFAULT_FILE):
+        self.path = path
+        self.started = time.time()
+        self.updates = {}    # klawisz -> Histogram czasu akcji
+        self.renders = {}    # klawisz, po którym rysowano klatkę -> Histogram czasu rysowania
+        self.frame_bytes = Histogram()
+        self.undo_entries = 0
+
+    # Tworzy pomiary, jeśli włączono je zmienną środowiskową METRICS_ENV; w przeciwnym razie None
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get(METRICS_ENV)
+        if not path:
+            return None
+        return cls(DEFAULT_FILE if path == "1" else path)
+
+    def record_update(self, key, seconds, undo_entries):
+        histogram = self.updates.get(key)
+        if histogram is None:
+            histogram = self.updates[key] = Histogram()
+        histogram.add(seconds * 1e6)
+        if undo_entries > 0:
+            self.undo_entries += undo_entries
+
+    def record_render(self, key, seconds, bytes_written):
+        histogram = self.renders.get(key)
+        if histogram is None:
+            histogram = self.renders[key] = Histogram()
+        histogram.add(seconds * 1e6)
+        self.frame_bytes.add(bytes_written)
+
+    def to_dict(self):
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "duration_s": time.time() - self.started,
+            "frames": self.frame_bytes.count,
+            "undo_entries": self.undo_entries,
+            "frame_bytes": self.frame_bytes.to_dict(),
+            "handlers_us": {key: {"update": self.updates[key].to_dict(),
+                                  "render": self.renders[key].to_dict() if key in self.renders else None}
+                            for key in sorted(self.updates)},
+        }
+
+    # Zestawienie do wypisania w konsoli: dla każdego klawisza liczba akcji oraz mediana i 95. percentyl
+    # czasu akcji i rysowania klatki
+    def summary_lines(self):
+        lines = [f"{'Klawisz':<8} {'akcje':>6} {'akcja p50/p95 [µs]':>20} {'klatki':>7} {'klatka p50/p95 [µs]':>21}"]
+        for key in sorted(self.updates):
+            update = self.updates[key]
+            render = self.renders.get(key, Histogram())
+            lines.append(f"{key:<8} {update.count:>6} {update.percentile(50):>9.0f}/{update.percentile(95):<10.0f} "
+                         f"{render.count:>7} {render.percentile(50):>10.0f}/{render.percentile(95):<10.0f}")
+        lines.append(f"Klatki: {self.frame_bytes.count}, bajtów na klatkę: średnio "
+                     f"{self.frame_bytes.to_dict()['mean']:.0f}, maks. {self.frame_bytes.max:.0f}; "
+                     f"wpisy dziennika cofania: {self.undo_entries}")
+        return lines
+
+    # Zapisuje wyniki do pliku JSON (błąd zapisu nie przerywa programu); zwraca, czy się udało
+    def write(self):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,268 @@
+import math
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+from engine import Engine, HIDDEN_BIT, legal_moves, is_hidden
+from solver import Solver, TranspositionTable
+
+# Szansa wygranej jednego wariantu gry (pozycji albo pozycji po ruchu move; dla pozycji move jest
+# None): liczba wylosowanych ułożeń nieznanych kart (samples), ilu z nich solver nie rozstrzygnął
+# w limicie węzłów (unknown), w ilu znalazł wygraną (wins), odsetek wygranych wśród ułożeń
+# rozstrzygniętych (rate; None, jeśli żadnego nie rozstrzygnął) i przedział ufności 95% dla niego
+# (low, high)
+Odds = namedtuple("Odds", ["move", "samples", "unknown", "wins", "rate", "low", "high"])
+
+# Wynik szacowania: szanse pozycji (position), szanse po każdym dozwolonym ruchu (moves, od
+# najlepszego; puste, jeśli ich nie liczono), czy wynik jest ostateczny (przedział ufności dość wąski
+# albo osiągnięto limit losowań) oraz klucz informacji o pozycji, dla której go policzono
+Estimate = namedtuple("Estimate", ["position", "moves", "final", "key"])
+
+SAMPLE_NODES = 500          # Limit węzłów solvera na jedno ułożenie kart
+MIN_SAMPLES = 20            # Najmniejsza liczba losowań, po której wolno przerwać szacowanie
+MAX_SAMPLES = 2000          # Po tylu losowaniach szacowanie jest zawsze kończone
+TARGET_HALF_WIDTH = 0.05    # Szacowanie kończy się, gdy przedział ufności jest węższy niż ±5 punktów procentowych
+Z_95 = 1.96
+
+# Przedział ufności Wilsona (95%) dla prawdopodobieństwa sukcesu przy wins sukcesach na samples prób
+def wilson_interval(wins, samples):
+    if not samples:
+        return 0.0, 1.0
+    p = wins / samples
+    denominator = 1 + Z_95 ** 2 / samples
+    center = (p + Z_95 ** 2 / (2 * samples)) / denominator
+    margin = Z_95 * math.sqrt(p * (1 - p) / samples + Z_95 ** 2 / (4 * samples ** 2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+# Szanse wariantu gry z wyników wylosowanych ułożeń (Odds)
+def _odds(move, samples, unknown, wins):
+    decided = samples - unknown
+    return Odds(move, samples, unknown, wins, wins / decided if decided else None, *wilson_interval(wins, decided))
+
+# Klucz tego, co gracz wie o pozycji: zakryte karty w kolumnach są zastąpione samym znacznikiem
+# HIDDEN_BIT, a stos rezerwowy, dopóki gracz nie zna kolejności jego kart (Engine.stock_seen) - liczbą
+# kart. Pozycje o tym samym kluczu mają te same szanse.
+def information_key(engine):
+    return (
+        engine.difficulty,
+        tuple(tuple(HIDDEN_BIT if is_hidden(card) else card for card in column) for column in engine.tableau),
+        tuple(map(tuple, engine.final_stacks)),
+        tuple(engine.reserve_stock) if engine.stock_seen else len(engine.reserve_stock),
+        tuple(engine.waste_pile),
+        tuple(engine.visible_draw3_cards),
+        engine.current_reserve_card,
+        engine.first_reveal_done,
+    )
+
+# Rozkłada losowo nieznane karty (posortowane - ich faktyczne położenie nie jest przekazywane)
+# na miejsca zakrytych kart w kolumnach i, jeśli kolejność stosu nie jest znana, na stos rezerwowy
+def _deal_sample(state, unknown, stock_known, rng):
+    cards = list(unknown)
+    rng.shuffle(cards)
+    pos = 0
+    for idx, column in enumerate(state.tableau):
+        for row, card in enumerate(column):
+            if not is_hidden(card):
+                break
+            column[row] = cards[pos] | HIDDEN_BIT
+            pos += 1
+        state._column_info[idx] = None
+    if not stock_known:
+        state.set_reserve(cards[pos:], state.waste_pile)
+
+# Zadanie dla procesu roboczego: ocenia solverem jedno losowe ułożenie nieznanych kart - samą
+# pozycję i (jeśli podano ruchy) pozycję po każdym z ruchów. Wynik to (wynik pozycji, wyniki ruchów),
+# każdy True (wygrana), False (przegrana) albo None (nierozstrzygnięte w limicie węzłów).
+def _evaluate_sample(task):
+    difficulty, saved_state, unknown, stock_known, candidates, seed, max_nodes = task
+    state = Engine(difficulty)
+    state.load_state(saved_state)
+    _deal_sample(state, unknown, stock_known, random.Random(seed))
+    solver = Solver(max_nodes=max_nodes, table_size=max_nodes * 4)
+    result = solver.solve(state)
+    outcomes = []
+    for move in candidates:
+        if result.solvable is False: # Z przegranej pozycji żaden ruch nie prowadzi do wygranej
+            outcomes.append(False)
+        elif result.solvable and result.moves and result.moves[0] == move:
+            outcomes.append(True)
+        else:
+            state._perform(move)
+            outcomes.append(Solver(max_nodes=max_nodes, table_size=max_nodes * 4).solve(state).solvable)
+            state.undo()
+            state.redo_moves.clear()
+    return result.solvable, outcomes
+
+# Zebrane dotąd wyniki losowań dla jednej pozycji (przechowywane w pamięci podręcznej estymatora,
+# więc powrót do tej samej pozycji kontynuuje szacowanie zamiast zaczynać od nowa)
+class _Tally:
+    def __init__(self, key, candidates):
+        self.key = key
+        self.candidates = candidates
+        self.samples = 0
+        self.wins = 0
+        self.unknown = 0
+        self.move_samples = 0
+        self.move_unknown = [0] * len(candidates)
+        self.move_wins = [0] * len(candidates)
+        self.next_seed = 0
+
+    def add(self, result):
+        solvable, outcomes = result
+        self.samples += 1
+        self.wins += solvable is True
+        self.unknown += solvable is None
+        if outcomes:
+            self.move_samples += 1
+            for idx, outcome in enumerate(outcomes):
+                self.move_unknown[idx] += outcome is None
+                self.move_wins[idx] += outcome is True
+
+    def half_width(self):
+        low, high = wilson_interval(self.wins, self.samples - self.unknown)
+        return (high - low) / 2
+
+    def estimate(self, final):
+        position = _odds(None, self.samples, self.unknown, self.wins)
+        moves = [_odds(move, self.move_samples, unknown, wins)
+                 for move, unknown, wins in zip(self.candidates, self.move_unknown, self.move_wins)]
+        moves.sort(key=lambda odds: -1 if odds.rate is None else odds.rate, reverse=True)
+        return Estimate(position, moves if self.move_samples else [], final, self.key)
+
+# Szacowanie szans wygranej metodą Monte Carlo, bez podglądania kart: nieznane karty (zakryte
+# w kolumnach i nieodkryta jeszcze kolejność stosu rezerwowego) są wielokrotnie losowo rozkładane
+# na swoje miejsca, a każde ułożenie ocenia solver z małym limitem węzłów. Losowania są liczone
+# w puli procesów (gdy workers > 1), a wyniki zapamiętywane dla klucza informacji o pozycji.
+# Szanse to odsetek wygranych wśród ułożeń, które solver rozstrzygnął; liczba nierozstrzygniętych
+# jest podawana osobno.
+class OddsEstimator:
+    UPDATE_INTERVAL = 0.5 # Co ile sekund (najwyżej) przekazywany jest wynik częściowy
+
+    def __init__(self, workers=None, sample_nodes=SAMPLE_NODES, cache_size=256):
+        self.workers = workers or os.cpu_count() or 1
+        self.sample_nodes = sample_nodes
+        self.cache = TranspositionTable(cache_size)
+        self._pool = self._new_pool() if self.workers > 1 else None
+
+    # Pula procesów do liczenia losowań. Procesy są uruchamiane metodą spawn, a nie domyślnym
+    # na Linuksie fork - szacowanie działa w wątku interfejsu gry, obok wątków wejścia i podpowiedzi,
+    # a kopia procesu wielowątkowego mogłaby odziedziczyć zablokowane przez nie blokady.
+    def _new_pool(self):
+        return multiprocessing.get_context("spawn").Pool(self.workers)
+
+    # Szacuje szanse wygranej w bieżącej pozycji silnika (i, z per_move=True, po każdym dozwolonym
+    # ruchu). Kończy, gdy przedział ufności szans pozycji jest węższy niż ±target, po max_samples
+    # losowaniach, po time_limit sekundach albo po ustawieniu zdarzenia cancel. Wyniki częściowe
+    # są przekazywane do on_update(estimate) co UPDATE_INTERVAL sekund.
+    def estimate(self, engine, per_move=True, time_limit=None, target=TARGET_HALF_WIDTH,
+                 max_samples=MAX_SAMPLES, cancel=None, on_update=None):
+        stock_known = engine.stock_seen
+        key = information_key(engine)
+        tally = self.cache.get((key, per_move))
+        if tally is None:
+            candidates = tuple(legal_moves(engine)) if per_move else ()
+            tally = _Tally(key, candidates)
+            self.cache.store((key, per_move), tally)
+        unknown = [card & ~HIDDEN_BIT for column in engine.tableau for card in column if is_hidden(card)]
+        if not stock_known:
+            unknown += engine.reserve_stock
+        unknown.sort()
+        task = (engine.difficulty, engine.save_state(), tuple(unknown), stock_known, tally.candidates)
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        last_update = time.perf_counter()
+
+        def done():
+            if tally.samples >= max_samples or (tally.samples >= MIN_SAMPLES and tally.half_width() <= target):
+                return True
+            if not unknown and tally.samples: # Nic nie jest ukryte - jedno ułożenie wystarczy
+                return True
+            return (cancel is not None and cancel.is_set()) or \
+                (deadline is not None and time.perf_counter() > deadline)
+
+        for result in self._results(task, tally, done):
+            tally.add(result)
+            if on_update is not None and time.perf_counter() - last_update >= self.UPDATE_INTERVAL:
+                on_update(tally.estimate(False))
+                last_update = time.perf_counter()
+        final = tally.samples >= max_samples or tally.half_width() <= target or (not unknown and tally.samples > 0)
+        return tally.estimate(final)
+
+    # Wyniki kolejnych losowań (dopóki done() nie zwróci True): liczone w tym wątku albo w puli
+    # procesów, która ma zawsze po dwa zadania na proces w kolejce
+    def _results(self, task, tally, done):
+        if self.workers <= 1:
+            while not done():
+                seed = tally.next_seed
+                tally.next_seed += 1
+                yield _evaluate_sample((*task, seed, self.sample_nodes))
+            return
+        if self._pool is None: # Pula zamknięta przez close()
+            self._pool = self._new_pool()
+        results = queue.Queue()
+        pending = 0
+        while not done():
+            while pending < self.workers * 2:
+                seed = tally.next_seed
+                tally.next_seed += 1
+                self._pool.apply_async(_evaluate_sample, ((*task, seed, self.sample_nodes),),
+                                       callback=results.put, error_callback=results.put)
+                pending += 1
+            result = results.get()
+            pending -= 1
+            if isinstance(result, BaseException):
+                raise result
+            yield result
+        # Zadania jeszcze liczone w puli kończą się w tle; ich wyniki są pomijane
+
+    # Zamyka pulę procesów (kolejne szacowanie utworzy ją na nowo)
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+# Szacowanie szans w osobnym wątku na potrzeby interfejsu gry: każde nowe zlecenie przerywa
+# poprzednie, a wyniki (częściowe i końcowy) są przekazywane do on_update w wątku roboczym
+class OddsEngine:
+    TIME_LIMIT = 30 # Najdłuższy czas szacowania jednej pozycji (w sekundach)
+
+    def __init__(self, on_update, workers=None):
+        self.on_update = on_update
+        self.estimator = OddsEstimator(workers)
+        self._cancel = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Zaczyna szacować szanse dla bieżącej pozycji silnika i zwraca jej klucz informacji
+    def start(self, engine):
+        self.cancel()
+        cancel = self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(engine.copy(), cancel), daemon=True)
+        self._thread.start()
+        return information_key(engine)
+
+    # Przerywa trwające szacowanie (jego wyniki nie będą już przekazywane)
+    def cancel(self):
+        if self._cancel is not None:
+            self._cancel.set()
+            self._cancel = None
+
+    # Przerywa szacowanie i zamyka pulę procesów
+    def close(self):
+        self.cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.estimator.close()
+
+    def _run(self, state, cancel):
+        def report(estimate):
+            if not cancel.is_set():
+                self.on_update(estimate)
+        with self._lock: # Przerwane szacowanie poprzedniej pozycji kończy się po bieżącym losowaniu
+            if not cancel.is_set():
+                report(self.estimator.estimate(state, time_limit=self.TIME_LIMIT, cancel=cancel, on_update=report))
@@ -1,90 +1,122 @@
-import random
-from colorama import Fore, Style
-import keyboard
+import time
+_STARTUP_BEGIN = time.perf_counter() # Początek uruchamiania (przed importem pozostałych modułów) - do pomiaru czasu startu
 import os
-import json
+import sys
+import argparse
+from collections import namedtuple
 from datetime import datetime
-from pyfiglet import Figlet
-import copy
-from collections import deque
-from rich.console import Console
-from rich.text import Text
-from rich.panel import Panel
-from rich.table import Table
-
-# Pojedyncza karta do gry
-class Card:
-    def __init__(self, value, suit, hidden=False):
-        self.value = value
-        self.suit = suit
-        self.hidden = hidden
-
-    def __repr__(self):
-        return f"Card({self.value}{self.suit}{'H' if self.hidden else ''})"
-
-    def is_red(self):
-        return self.suit in "♥♦"
-    
-    # Zwraca surowe dane karty do zapisu stanu
-    def get_raw_data(self):
-        return [self.value, self.suit, self.hidden]
-
-# Główna klasa zarządzająca logiką i stanem gry
+from engine import Engine, Move, DRAW, RESERVE, FINAL, TABLEAU, is_hidden
+from deals import encode_deal, parse_deal
+from render import TerminalRenderer
+from scores import ScoreStore
+from glyphs import GLYPHS, CARD_WIDTH, CARD_HEIGHT, PARTIAL_WIDTH
+# Biblioteki interfejsu (rich, colorama) i moduły funkcji gry (podpowiedzi z solverem, powtórki,
+# dziennik, pomiary, źródła klawiszy) są importowane dopiero tam, gdzie są potrzebne - polecenia
+# bez interfejsu gry (--simulate, --build-pool, --replay --headless) ich nie wczytują
+_IMPORTS_DONE = time.perf_counter()
+
+_CLEAR_SCREEN = "\x1b[H\x1b[2J\x1b[3J"
+
+# Zaznaczenie kursora: strefa silnika (RESERVE, FINAL lub TABLEAU), indeks kolumny tableau lub kupki
+# końcowej oraz zaznaczone wiersze - od start_row, length kart. W rezerwie i na kupce końcowej
+# zaznaczona jest zawsze jedna karta (start_row 0). Sprawdzenie, czy karta jest zaznaczona,
+# oraz rozszerzenie i zmniejszenie zaznaczenia nie zależą od liczby zaznaczonych kart.
+Selection = namedtuple("Selection", ["zone", "column", "start_row", "length"])
+RESERVE_SELECTION = Selection(RESERVE, 0, 0, 1)
+
+# Zaznaczenie miejsca w górnym rzędzie planszy: 0 - rezerwa, 1-4 - kupki końcowe
+def _top_row_selection(slot):
+    return Selection(FINAL, slot - 1, 0, 1) if slot else RESERVE_SELECTION
+
+# Zaznaczenie ostatniej karty kolumny tableau (w pustej kolumnie - miejsca na kartę)
+def _last_card_selection(tableau, col):
+    return Selection(TABLEAU, col, max(len(tableau[col]) - 1, 0), 1)
+
+# Główna klasa gry: interfejs w konsoli i obsługa sterowania nad silnikiem zasad (Engine)
 class Game:
-    VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-    SUITS = ["♠", "♥", "♦", "♣"]
-    SCORES_FILE = "scores.json"
-    CARD_WIDTH = 7
-    CARD_HEIGHT = 5
-    DRAW3_PARTIAL_WIDTH = 4
-    MAX_UNDO_HISTORY = 3
+    SCORES_FILE = "scores.jsonl"
+    LEGACY_SCORES_FILE = "scores.json" # Poprzedni format rankingu, importowany przy pierwszym uruchomieniu
+    CARD_WIDTH = CARD_WIDTH
+    CARD_HEIGHT = CARD_HEIGHT
+    DRAW3_PARTIAL_WIDTH = PARTIAL_WIDTH
     LEADERBOARD_TOP_N = 5
+    JOURNAL_FILE = "last_game.journal" # Dziennik ruchów bieżącej gry (wznawianie przerwanej gry)
+    METRICS_ENV = "PASJANS_METRICS" # Zmienna środowiskowa włączająca pomiary (metrics.METRICS_ENV - sprawdzana bez importu modułu)
+    REPLAY_DIR = "replays" # Katalog z powtórkami rozegranych gier
+    REPLAY_KEEP = 100 # Liczba przechowywanych powtórek (starsze są usuwane)
+    DEAL_POOL_FILE = "deal_pool.bin" # Pula rozdań ze stopniami trudności (--build-pool)
+    REPLAY_PAGE = 10 # Liczba ruchów przewijanych strzałkami góra/dół w trybie powtórki
+    FRAME_INTERVAL = 1 / 30 # Najkrótszy odstęp między klatkami (w sekundach)
+    HINT_BUDGET_MS = 500 # Czas szukania podpowiedzi (w milisekundach)
+    HINT_READY = "hint-ready" # Zdarzenie w kolejce wejścia: podpowiedź jest gotowa (nie jest klawiszem)
+    ODDS_READY = "odds-ready" # Zdarzenie w kolejce wejścia: nowy (częściowy) wynik szacowania szans wygranej
+    EVENTS = (HINT_READY, ODDS_READY) # Zdarzenia, które nie pochodzą z klawiatury
+    BANNER_TEXT = "PASJANS"
+    BANNER_FONT = "slant"
+    BANNER_CACHE_FILE = ".pasjans_banner" # Wygenerowany baner menu (bez importu pyfiglet przy kolejnych uruchomieniach)
+    _menu_header = None # Gotowy (z kodami kolorów) nagłówek menu - baner i powitanie, wspólny dla wszystkich gier
 
     # Inicjalizuje stan gry
     def __init__(self):
-        self.deck_source_data = []
-        self.tableau = [[] for _ in range(7)]
-        self.reserve_stock = []
-        self.waste_pile_draw1 = []
-        self.waste_pile_draw3 = []
-        self.visible_draw3_cards = [None, None, None]
-        self.final_stacks = [[] for _ in range(4)]
-        self.current_reserve_card_obj = None
-        self.selected_cards_coords = []
+        self.engine = Engine()
+        self._start_move_count = 0 # Licznik ruchów silnika w chwili rozpoczęcia (wznowienia) gry
+        self.selection = None # Zaznaczenie kursora (Selection); None - bez kursora
         self.confirmed_selection = False
-        self.original_selected_coords = []
+        self.original_selection = None # Zaznaczenie podniesionych kart (miejsce, z którego je wzięto)
         self.message = ""
-        self.moving_final_card_obj = None
-        self.move_count = 0
         self.game_over = False
         self.difficulty = None
-        self.first_reveal_done = False
-        self.game_state_history = deque(maxlen=self.MAX_UNDO_HISTORY)
-        self.undo_actions_available = 0
-        self.rich_console = Console()
+        self.requested_deal = None
+        self.deal_grade = None # Stopień trudności rozdania losowanego z puli (None - dowolne rozdanie)
+        self.deal_pool = None  # Pula rozdań (DealPool), otwierana przy pierwszym wyborze stopnia trudności
+        self.resume_requested = False
+        self.auto_play = True # Automatyczne odkładanie bezpiecznych kart na kupki końcowe po każdym ruchu
+        self._rich_console = None # Konsola rich (rich_console), tworzona przy pierwszym użyciu
+        self.renderer = TerminalRenderer()
+        self.scores = ScoreStore(self.SCORES_FILE, self.LEGACY_SCORES_FILE, self.LEADERBOARD_TOP_N)
+        self.journal = None # Dziennik ruchów (GameJournal), otwierany przy rozpoczęciu lub wznowieniu gry
+        self.replay_player = None # Odtwarzacz powtórki (tylko w trybie powtórki)
+        self.startup_report = False # Po pierwszym wyświetleniu menu wypisz czas uruchomienia i zakończ
+        self.metrics = None # Pomiary czasu obsługi klawiszy i rysowania (None - wyłączone)
+        if os.environ.get(self.METRICS_ENV):
+            from metrics import Metrics
+            self.metrics = Metrics.from_env()
+        self.hints = None # Wyszukiwanie podpowiedzi (HintEngine), tworzone przy pierwszej prośbie o podpowiedź
+        self.hint_budget_ms = self.HINT_BUDGET_MS
+        self._hint = None       # Ostatnia gotowa podpowiedź (ustawiana przez wątek podpowiedzi)
+        self._hint_state = None # Skrót stanu, dla którego szukana jest podpowiedź (None - nie jest szukana)
+        self.odds = None        # Szacowanie szans wygranej (OddsEngine), tworzone przy pierwszym włączeniu odczytu
+        self.odds_workers = None # Liczba procesów szacowania szans (None - liczba rdzeni)
+        self._odds = None       # Ostatni wynik szacowania szans (ustawiany przez wątek szacowania)
+        self._odds_key = None   # Klucz pozycji, dla której liczone są szanse (None - odczyt szans wyłączony)
+        self._events = None     # Kolejka zdarzeń działającej pętli zdarzeń
+        self.input_backend = "keyboard" # Źródło wciśnięć klawiszy (INPUT_BACKENDS)
+        self._frames_deferred = False # Klatki są rysowane przez pętlę zdarzeń, a nie przez każdą akcję
+        self._frame_pending = False
+
+    # Konsola rich do wypisywania tekstu z formatowaniem (import rich przy pierwszym użyciu)
+    @property
+    def rich_console(self):
+        if self._rich_console is None:
+            from rich.console import Console
+            self._rich_console = Console()
+        return self._rich_console
+
+    @rich_console.setter
+    def rich_console(self, console):
+        self._rich_console = console
 
     # Wyświetla tabelę najlepszych wyników
     def _display_leaderboard(self, new_score_timestamp=None):
-        scores = []
-        if os.path.exists(self.SCORES_FILE):
-            try:
-                with open(self.SCORES_FILE, 'r') as f:
-                    scores = json.load(f)
-                if not isinstance(scores, list):
-                    scores = []
-            except json.JSONDecodeError:
-                scores = []
-
+        from rich.panel import Panel
+        from rich.text import Text
+        scores = self.scores.top()
         if not scores:
             print("")
             self.rich_console.print(Panel(Text("Brak zapisanych wyników. Wygraj, aby się tu pojawić!", justify="center"), title="[dim]Tabela wyników[/dim]", border_style="dim white"))
             return False
 
-        def sort_key(score):
-            difficulty_order = {'trudny': 0, 'łatwy': 1}
-            return (score.get('moves', float('inf')), difficulty_order.get(score.get('difficulty', 'łatwy'), 1))
-
-        scores.sort(key=sort_key)
+        from rich.table import Table
 
         table = Table(title=f"\n[bold yellow]Najlepsze wyniki (TOP {self.LEADERBOARD_TOP_N})[/bold yellow]", show_header=True, header_style="bold magenta", title_justify="left")
         table.add_column("Miejsce", style="dim", width=7, justify="center")
@@ -95,7 +127,7 @@ class Game:
         is_new_score_on_top = False
         new_score_rank = -1
 
-        for i, score in enumerate(scores[:self.LEADERBOARD_TOP_N]):
+        for i, score in enumerate(scores):
             rank = str(i + 1)
             moves = str(score.get('moves', 'N/A'))
             difficulty_val = score.get('difficulty', 'N/A').capitalize()
@@ -128,118 +160,244 @@ class Game:
 
     # Wyświetla menu główne i obsługuje wybór poziomu trudności
     def _display_main_menu(self):
-        f = Figlet(font='slant')
-        os.system('cls' if os.name == 'nt' else 'clear')
-        self.rich_console.print(Text("===============================================", style="bold green"))
-        self.rich_console.print(Text(f.renderText('PASJANS'), style="bold green"), end="")
-        self.rich_console.print(Text("===============================================", style="bold green"))
-
-        self.rich_console.print("\n[bold cyan]Witaj w grze Pasjans.[/bold cyan]")
-
-        self.rich_console.print("\n[bold]Wybierz poziom trudności:[/bold]")
-        self.rich_console.print("  [magenta]1.[/magenta] Łatwy (dobieranie 1 karty)")
-        self.rich_console.print("  [magenta]2.[/magenta] Trudny (dobieranie 3 kart, używasz wierzchniej)")
-
-        self._display_leaderboard()
+        from inputs import INPUT_BACKENDS
+        self._draw_main_menu()
+        if self.startup_report:
+            self._report_startup_time()
+            return
 
-        self.rich_console.print("\n[yellow]ESC[/yellow] - Wyjście")
-        
         while True:
-            choice = keyboard.read_key(suppress=True)
-            os.system('cls' if os.name == 'nt' else 'clear')
+            choice = INPUT_BACKENDS[self.input_backend].read_key()
+            error_message = "Nieprawidłowy wybór, spróbuj ponownie."
+            if choice == '3':
+                try:
+                    deal = self._read_line("Podaj numer lub identyfikator rozdania: ")
+                    parse_deal(deal)
+                    self.requested_deal = deal.strip()
+                    error_message = None
+                except ValueError as e:
+                    error_message = str(e)
             if choice == '1':
                 self.difficulty = 'łatwy'
                 break
             elif choice == '2':
                 self.difficulty = 'trudny'
                 break
+            elif choice == '4' and os.path.exists(self.JOURNAL_FILE):
+                self.resume_requested = True
+                break
+            elif choice == '5' and os.path.exists(self.DEAL_POOL_FILE):
+                error_message = self._next_deal_grade()
             elif choice.lower() == 'esc':
+                self._clear_screen()
                 self.rich_console.print("\n[bold blue]Do zobaczenia![/bold blue]")
                 exit()
-            
-            self.rich_console.print(Text("===============================================", style="bold green"))
-            self.rich_console.print(Text(f.renderText('PASJANS'), style="bold green"), end="")
-            self.rich_console.print(Text("===============================================", style="bold green"))
-            self._display_leaderboard()
-            self.rich_console.print("\n[bold cyan]Witaj w grze Pasjans.[/bold cyan]")
-            self.rich_console.print("\n[bold]Wybierz poziom trudności:[/bold]")
-            self.rich_console.print("  [magenta]1.[/magenta] Łatwy (dobieranie 1 karty)")
-            self.rich_console.print("  [magenta]2.[/magenta] Trudny (dobieranie 3 kart, używasz wierzchniej)")
-            self.rich_console.print("\n[yellow]ESC[/yellow] - Wyjście")
-            self.rich_console.print(Panel("[bold red]Nieprawidłowy wybór, spróbuj ponownie.[/bold red]", border_style="red"))
-
-    # Resetuje i przygotowuje stan gry do nowej rozgrywki
-    def _initialize_game_state(self):
-        self.deck_source_data = []
-        self.tableau = [[] for _ in range(7)]
-        self.reserve_stock = []
-        self.waste_pile_draw1 = []
-        self.waste_pile_draw3 = []
-        self.final_stacks = [[] for _ in range(4)]
-        self.current_reserve_card_obj = None
-        self.visible_draw3_cards = [None, None, None]
-        self.selected_cards_coords = []
+            self._draw_main_menu(error_message)
+        self._clear_screen()
+
+    # Przełącza stopień trudności rozdania na następny (dowolne -> proste -> ... -> dowolne);
+    # zwraca komunikat o błędzie albo None
+    def _next_deal_grade(self):
+        from dealpool import DealPool, GRADES
+        if self.deal_pool is None:
+            self.deal_pool = DealPool.open(self.DEAL_POOL_FILE)
+            if self.deal_pool is None:
+                return "Nie udało się otworzyć puli rozdań."
+        grades = (None,) + GRADES
+        self.deal_grade = grades[(grades.index(self.deal_grade) + 1) % len(grades)]
+        return None
+
+    # Czyści ekran przed wyświetleniem menu (sekwencją ANSI, bez uruchamiania polecenia clear)
+    def _clear_screen(self):
+        if os.name == 'nt':
+            os.system('cls')
+        else:
+            self.rich_console.file.write(_CLEAR_SCREEN)
+            self.rich_console.file.flush()
+
+    # Rysuje menu główne: nagłówek, opcje, ranking i ewentualny komunikat o błędzie
+    def _draw_main_menu(self, error_message=None):
+        self._clear_screen()
+        self.rich_console.file.write(self._get_menu_header())
+        self._print_menu_options()
+        self._display_leaderboard()
+        self.rich_console.print("\n[yellow]ESC[/yellow] - Wyjście")
+        if error_message:
+            from rich.panel import Panel
+            self.rich_console.print(Panel(f"[bold red]{error_message}[/bold red]", border_style="red"))
+
+    # Zwraca nagłówek menu (baner i powitanie) gotowy do wypisania - składany tylko przy pierwszym użyciu
+    def _get_menu_header(self):
+        if Game._menu_header is None:
+            from rich.text import Text
+            rule = Text("===============================================", style="bold green")
+            with self.rich_console.capture() as capture:
+                self.rich_console.print(rule)
+                self.rich_console.print(Text(self._load_banner(), style="bold green"), end="")
+                self.rich_console.print(rule)
+                self.rich_console.print("\n[bold cyan]Witaj w grze Pasjans.[/bold cyan]")
+            Game._menu_header = capture.get()
+        return Game._menu_header
+
+    # Zwraca baner menu. Generowanie napisu przez pyfiglet (import biblioteki i wczytanie fontu)
+    # trwa dłużej niż reszta startu gry, więc gotowy napis jest zapamiętywany w pliku BANNER_CACHE_FILE.
+    def _load_banner(self):
+        key = f"{self.BANNER_FONT}:{self.BANNER_TEXT}\n"
+        try:
+            with open(self.BANNER_CACHE_FILE, "r", encoding="utf-8") as f:
+                cached = f.read()
+            if cached.startswith(key):
+                return cached[len(key):]
+        except OSError:
+            pass
+        from pyfiglet import Figlet
+        banner = Figlet(font=self.BANNER_FONT).renderText(self.BANNER_TEXT)
+        try:
+            with open(self.BANNER_CACHE_FILE, "w", encoding="utf-8") as f:
+                f.write(key + banner)
+        except OSError:
+            pass
+        return banner
+
+    # Wypisuje czas uruchomienia gry: import modułów i pierwsze wyświetlenie menu (--startup-time)
+    def _report_startup_time(self):
+        now = time.perf_counter()
+        print(f"\nCzas uruchomienia: {(now - _STARTUP_BEGIN) * 1000:.1f} ms "
+              f"(import modułów: {(_IMPORTS_DONE - _STARTUP_BEGIN) * 1000:.1f} ms, "
+              f"menu: {(now - _IMPORTS_DONE) * 1000:.1f} ms)")
+
+    # Wypisuje opcje menu głównego wraz z wybranym rozdaniem
+    def _print_menu_options(self):
+        self.rich_console.print("\n[bold]Wybierz poziom trudności:[/bold]")
+        self.rich_console.print("  [magenta]1.[/magenta] Łatwy (dobieranie 1 karty)")
+        self.rich_console.print("  [magenta]2.[/magenta] Trudny (dobieranie 3 kart, używasz wierzchniej)")
+        self.rich_console.print("  [magenta]3.[/magenta] Wybierz rozdanie (numer lub identyfikator)")
+        if os.path.exists(self.JOURNAL_FILE):
+            self.rich_console.print("  [magenta]4.[/magenta] Wznów ostatnią grę")
+        if os.path.exists(self.DEAL_POOL_FILE):
+            grade = self.deal_grade or "dowolne"
+            self.rich_console.print(f"  [magenta]5.[/magenta] Trudność rozdania: [cyan]{grade}[/cyan]")
+        if self.requested_deal is not None:
+            self.rich_console.print(f"\n[bold]Wybrane rozdanie:[/bold] [cyan]{self.requested_deal}[/cyan]")
+
+    # Wczytuje linię tekstu, pomijając klawisze wciśnięte wcześniej podczas obsługi menu
+    def _read_line(self, prompt):
+        if os.name == 'nt':
+            import msvcrt
+            while msvcrt.kbhit():
+                msvcrt.getwch()
+        else:
+            import termios
+            termios.tcflush(sys.stdin, termios.TCIFLUSH)
+        return input(prompt)
+
+    # Resetuje i przygotowuje stan gry do nowej rozgrywki (rozdanie o podanym numerze lub
+    # identyfikatorze, a gdy nie podano - losowe, z puli rozdań, jeśli wybrano stopień trudności)
+    def _initialize_game_state(self, deal=None):
+        deal_number, deck = parse_deal(deal) if deal is not None else (None, None)
+        message = ""
+        if deal is None and self.deal_grade is not None:
+            deal_number = self.deal_pool.draw(self.difficulty, self.deal_grade)
+            if deal_number is None:
+                message = f"Brak rozdań o trudności '{self.deal_grade}' w puli - rozdano losową grę."
+        engine = Engine(self.difficulty)
+        engine.new_deal(deal_number, deck)
+        self._set_engine(engine)
+        self.message = message
+
+    # Wznawia grę zapisaną w dzienniku ruchów; jeśli się nie da, rozpoczyna nową grę na poziomie łatwym
+    def _resume_game(self):
+        from journal import GameJournal
+        self.journal = GameJournal(self.JOURNAL_FILE)
+        try:
+            engine, auto_play = self.journal.resume()
+        except (OSError, ValueError) as e:
+            self.difficulty = 'łatwy'
+            self._initialize_game_state()
+            self._start_journal()
+            self.message = f"Nie udało się wznowić gry: {e}"
+            return
+        self.difficulty = engine.difficulty
+        if auto_play is not None:
+            self.auto_play = auto_play
+        self._set_engine(engine)
+        self.message = f"Wznowiono grę (wykonane ruchy: {engine.move_count})."
+
+    # Otwiera dziennik ruchów dla rozdanej właśnie gry (poprzedni dziennik jest zastępowany)
+    def _start_journal(self):
+        from journal import GameJournal
+        if self.journal is None:
+            self.journal = GameJournal(self.JOURNAL_FILE)
+        self.journal.start(self.engine)
+
+    # Ustawia silnik z rozdaną (lub odtworzoną) grą i czyści stan interfejsu
+    def _set_engine(self, engine):
+        self.engine = engine
+        self._start_move_count = engine.move_count
         self.confirmed_selection = False
-        self.original_selected_coords = []
+        self.original_selection = None
         self.message = ""
-        self.moving_final_card_obj = None
-        self.move_count = 0
         self.game_over = False
-        self.first_reveal_done = False
-        self.game_state_history.clear()
-        self.undo_actions_available = 0
-        self._generate_deck_data()
-        self._generate_tableau_and_reserve()
-        if len(self.tableau) > 1 and len(self.tableau[1]) > 1:
-            self.selected_cards_coords = [[1, 1]]
-        elif self.tableau and self.tableau[0]:
-            self.selected_cards_coords = [[0, 0]]
-        else:
-            self.selected_cards_coords = [[0,0]]
-        
+        self._reset_selection()
+
+    # Ustawia kursor na ostatniej karcie drugiej (lub pierwszej) kolumny tableau
+    def _reset_selection(self):
+        tableau = self.engine.tableau
+        self.selection = _last_card_selection(tableau, 1 if len(tableau[1]) > 1 else 0)
+
+    # Zwraca stos, z którego gracz podniósł karty, i indeks pierwszej podniesionej karty w tym stosie
+    # (karty nie są kopiowane - leżą na swoim miejscu, dopóki ruch nie zostanie wykonany)
+    def _held_source(self):
+        held = self.original_selection
+        if held.zone == RESERVE:
+            return [self.engine.current_reserve_card], 0
+        pile = self.engine.final_stacks[held.column] if held.zone == FINAL else self.engine.tableau[held.column]
+        return pile, len(pile) - held.length
+
+    # Zwraca karty trzymane przez gracza (podniesione, ale jeszcze nie położone)
+    def _held_cards(self):
+        if not self.confirmed_selection:
+            return []
+        pile, start = self._held_source()
+        return pile[start:]
+
     # Rysuje kolumny tableau
     def display_tableau(self):
+        from colorama import Fore
+        selection = self.selection
+        held = self.original_selection
+        held_src_col = None
+        held_target_col = None
+        if self.confirmed_selection and selection != held:
+            # Trzymane karty rysowane są w miejscu kursora zamiast w kolumnie źródłowej
+            held_pile, held_start = self._held_source()
+            if held.zone == TABLEAU:
+                held_src_col = held.column
+            if selection.zone == TABLEAU:
+                held_target_col = selection.column
+
         col_blocks = []
         max_height = 0
-        for col_idx, column in enumerate(self.tableau):
+        for col_idx, column in enumerate(self.engine.tableau):
+            n = visible = len(column)
+            if col_idx == held_src_col:
+                n = visible = held_start
+            if col_idx == held_target_col:
+                n += held.length
+            sel_start = sel_end = 0
+            if selection is not None and selection.zone == TABLEAU and selection.column == col_idx:
+                sel_start = selection.start_row
+                sel_end = sel_start + selection.length
             block = []
-            n = len(column)
-            for row_idx, card_obj in enumerate(column):
-                current_card_is_actually_hidden = card_obj.hidden
-                
-                if not column:
-                    continue
-
-                sel = [col_idx, row_idx] in self.selected_cards_coords
-                hide_this_card_because_held_over_final = False
-                if self.confirmed_selection and sel:
-                    if self.original_selected_coords and \
-                       [col_idx, row_idx] in self.original_selected_coords and \
-                       self.selected_cards_coords and \
-                       self.selected_cards_coords[0][1] == -1:
-                        hide_this_card_because_held_over_final = True
-                
-                if hide_this_card_because_held_over_final:
-                    if row_idx < n - 1:
-                        block.extend([" " * self.CARD_WIDTH] * 3)
-                    else:
-                        block.extend([" " * self.CARD_WIDTH] * self.CARD_HEIGHT)
-                    continue
-                
-                border_to_use = Fore.LIGHTBLACK_EX
-                if not current_card_is_actually_hidden:
-                    border_to_use = Fore.RED if card_obj.is_red() else Fore.WHITE
-                
+            for row_idx in range(n):
+                # Trzymane karty są brane wprost ze stosu źródłowego, bez kopiowania kolumn
+                card = column[row_idx] if row_idx < visible else held_pile[held_start + row_idx - visible]
+                sel = sel_start <= row_idx < sel_end
+                border_to_use = None # Domyślna ramka: szara dla zakrytej karty, w kolorze karty dla odkrytej
                 if sel:
                     border_to_use = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
-                
-                if current_card_is_actually_hidden:
-                    full = [ border_to_use + "┌─────┐" + Style.RESET_ALL, border_to_use + "│││││││" + Style.RESET_ALL, border_to_use + "│││││││" + Style.RESET_ALL, border_to_use + "│││││││" + Style.RESET_ALL, border_to_use + "└─────┘" + Style.RESET_ALL, ]
-                else:
-                    color = Fore.RED if card_obj.is_red() else Fore.WHITE
-                    pad = " " if card_obj.value != "10" else ""
-                    full = [ border_to_use + "┌─────┐" + Style.RESET_ALL, border_to_use + "│" + color + f"{card_obj.value + pad}   " + border_to_use + "│" + Style.RESET_ALL, border_to_use + "│" + color + f"  {card_obj.suit}  " + border_to_use + "│" + Style.RESET_ALL, border_to_use + "│" + color + f"   {pad + card_obj.value}" + border_to_use + "│" + Style.RESET_ALL, border_to_use + "└─────┘" + Style.RESET_ALL, ]
-                
+                full = GLYPHS.face(card, border_to_use)
+
                 if row_idx < n - 1:
                     block.extend(full[:3])
                 else:
@@ -259,181 +417,111 @@ class Game:
                     row_str.append(" " * self.CARD_WIDTH)
             print("  ".join(row_str))
 
-    # Tworzy nową, potasowaną talię kart
-    def _generate_deck_data(self):
-        self.deck_source_data.clear()
-        _ = [self.deck_source_data.append([v,s]) for s in self.SUITS for v in self.VALUES]
-        random.shuffle(self.deck_source_data)
-
-    # Upewnia się, że istnieją dokładnie cztery kupki końcowe
-    def _ensure_four_final_piles(self):
-        while len(self.final_stacks) < 4:
-            self.final_stacks.append([])
-        while len(self.final_stacks) > 4:
-            self.final_stacks.pop()
-
-    # Generuje wygląd karty
-    def _get_card_face_lines(self, card_obj, border_color_override=None, is_hidden_override=False, width=CARD_WIDTH):
-        if width == self.DRAW3_PARTIAL_WIDTH:
-            if not card_obj or is_hidden_override:
-                border = Fore.LIGHTBLACK_EX if border_color_override is None else border_color_override
-                return [border + "┌───" + Style.RESET_ALL,
-                        border + "│││ " + Style.RESET_ALL,
-                        border + "│││ " + Style.RESET_ALL,
-                        border + "│││ " + Style.RESET_ALL,
-                        border + "└───" + Style.RESET_ALL]
-            else:
-                color = Fore.RED if card_obj.is_red() else Fore.WHITE
-                pad = " " if card_obj.value != "10" else ""
-                border = border_color_override if border_color_override else color
-                return [border + "┌───" + Style.RESET_ALL,
-                        border + "│" + Style.RESET_ALL + color + f"{card_obj.value + pad}" + Style.RESET_ALL + border + " " + Style.RESET_ALL,
-                        border + "│ " + Style.RESET_ALL + color + f"{card_obj.suit} " + Style.RESET_ALL + border + "" + Style.RESET_ALL,
-                        border + "│   " + Style.RESET_ALL,
-                        border + "└───" + Style.RESET_ALL]
-
-        if not card_obj or is_hidden_override:
-            border = Fore.LIGHTBLACK_EX if border_color_override is None else border_color_override
-            return [ border + "┌─────┐" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "│││││││" + Style.RESET_ALL, border + "└─────┘" + Style.RESET_ALL, ]
-        else:
-            color = Fore.RED if card_obj.is_red() else Fore.WHITE
-            pad = " " if card_obj.value != "10" else ""
-            border = border_color_override if border_color_override else color
-            return [ border + "┌─────┐" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"{card_obj.value + pad}   " + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"  {card_obj.suit}  " + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "│" + Style.RESET_ALL + color + f"   {pad + card_obj.value}" + Style.RESET_ALL + border + "│" + Style.RESET_ALL, border + "└─────┘" + Style.RESET_ALL, ]
+    # Zwraca wygląd karty (gotowe linie z atlasu GLYPHS)
+    def _get_card_face_lines(self, card, border_color_override=None, is_hidden_override=False, width=CARD_WIDTH):
+        return GLYPHS.face(card, border_color_override, width, is_hidden_override)
 
     # Wyświetla obszar rezerwy i kupek końcowych
     def display_reserve_and_final_stacks(self):
-        self._ensure_four_final_piles()
+        from colorama import Fore
+        engine = self.engine
         blocks = []
         
-        if self.reserve_stock or self.waste_pile_draw1 or self.waste_pile_draw3 or self.first_reveal_done:
-            blocks.append([Fore.LIGHTBLACK_EX + l + Style.RESET_ALL for l in ["┌─────┐"]+["│││││││"]*3+["└─────┘"]])
+        if engine.stock_count or engine.waste_count or engine.first_reveal_done:
+            blocks.append(GLYPHS.face(None))
         else:
             blocks.append([" " * self.CARD_WIDTH] * self.CARD_HEIGHT)
         
-        is_sel_reserve_area = self.selected_cards_coords and self.selected_cards_coords[0] == [0, -1]
+        selection = self.selection
+        is_sel_reserve_area = selection is not None and selection.zone == RESERVE
         reserve_border_color_for_empty_slot = Fore.LIGHTBLACK_EX
         if is_sel_reserve_area:
             reserve_border_color_for_empty_slot = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
+
+        held = self._held_cards()
+        held_zone, held_idx = (self.original_selection.zone, self.original_selection.column) if held else (None, None)
+        held_from_reserve = held_zone == RESERVE
+
+        # Karta podniesiona z rezerwy i przeniesiona w inne miejsce znika z rezerwy
+        card_on_reserve_slot = engine.current_reserve_card
+        if held_from_reserve and not is_sel_reserve_area:
+            card_on_reserve_slot = None
+
+        border_for_reserve_card = None
+        if is_sel_reserve_area and not held_from_reserve:
+            border_for_reserve_card = Fore.YELLOW
         
         if self.difficulty == 'trudny':
             draw3_block_lines = [""] * self.CARD_HEIGHT
-            if not self.first_reveal_done: # Karty ukryte w rezerwie
+            if not engine.first_reveal_done: # Karty ukryte w rezerwie
                 empty_partial = [" " * self.DRAW3_PARTIAL_WIDTH] * self.CARD_HEIGHT
                 empty_full_slot_lines = [" " * (self.CARD_WIDTH - 2)] * self.CARD_HEIGHT
                 if is_sel_reserve_area:
-                    empty_full_slot_lines = [reserve_border_color_for_empty_slot+l+Style.RESET_ALL for l in ["┌─────┐"]+["│     │"]*3+["└─────┘"]]
+                    empty_full_slot_lines = GLYPHS.slot(reserve_border_color_for_empty_slot)
 
                 for i in range(self.CARD_HEIGHT):
                     draw3_block_lines[i] += empty_partial[i]
                     draw3_block_lines[i] += empty_partial[i]
                     draw3_block_lines[i] += empty_full_slot_lines[i]
             else: # Karty pokazane w rezerwie
-                card1_disp = self.visible_draw3_cards[0]
-                card2_disp = self.visible_draw3_cards[1]
-                active_slot_content = self.current_reserve_card_obj
-
-                if self.confirmed_selection and self.original_selected_coords and \
-                   self.original_selected_coords[0] == [0, -1]:
-                    card_held_from_reserve = self.current_reserve_card_obj
-                    if self.selected_cards_coords[0][1] != -1:
-                        pass
-                    elif self.selected_cards_coords[0][0] != 0:
-                        if card_held_from_reserve is self.visible_draw3_cards[0]:
-                            card1_disp = None
-                        if card_held_from_reserve is self.visible_draw3_cards[1]:
-                            card2_disp = None
-                        if card_held_from_reserve is active_slot_content:
-                            active_slot_content = None
-
-                card1_lines = self._get_card_face_lines(card1_disp, None, False, width=self.DRAW3_PARTIAL_WIDTH)
+                card1_lines = self._get_card_face_lines(engine.visible_draw3_cards[0], None, False, width=self.DRAW3_PARTIAL_WIDTH)
                 for i in range(self.CARD_HEIGHT):
                     draw3_block_lines[i] += card1_lines[i]
 
-                card2_lines = self._get_card_face_lines(card2_disp, None, False, width=self.DRAW3_PARTIAL_WIDTH)
+                card2_lines = self._get_card_face_lines(engine.visible_draw3_cards[1], None, False, width=self.DRAW3_PARTIAL_WIDTH)
                 for i in range(self.CARD_HEIGHT):
                     draw3_block_lines[i] += card2_lines[i]
                 
-                border_for_active_slot = None
-                if is_sel_reserve_area and not (self.confirmed_selection and self.original_selected_coords and self.original_selected_coords[0] == [0,-1] and self.selected_cards_coords[0] == [0,-1]):
-                    border_for_active_slot = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
-                
-                if self.confirmed_selection and self.original_selected_coords and self.original_selected_coords[0] == [0,-1] and is_sel_reserve_area:
-                    card3_lines = self._get_card_face_lines(self.current_reserve_card_obj, Fore.GREEN, width=self.CARD_WIDTH)
-                elif active_slot_content:
-                    card3_lines = self._get_card_face_lines(active_slot_content, border_for_active_slot, width=self.CARD_WIDTH)
+                if held_from_reserve and is_sel_reserve_area:
+                    card3_lines = self._get_card_face_lines(card_on_reserve_slot, Fore.GREEN, width=self.CARD_WIDTH)
+                elif card_on_reserve_slot is not None:
+                    card3_lines = self._get_card_face_lines(card_on_reserve_slot, border_for_reserve_card, width=self.CARD_WIDTH)
                 else:
-                    card3_lines = [reserve_border_color_for_empty_slot+l+Style.RESET_ALL for l in ["┌─────┐"]+["│     │"]*3+["└─────┘"]]
+                    card3_lines = GLYPHS.slot(reserve_border_color_for_empty_slot)
                 
                 for i in range(self.CARD_HEIGHT):
                     draw3_block_lines[i] += card3_lines[i]
             
             blocks.append(draw3_block_lines)
 
-            if self.first_reveal_done:
+            if engine.first_reveal_done:
                 blocks.append([""] * self.CARD_HEIGHT) 
             else:
                 blocks.append([" "] * self.CARD_HEIGHT)
         else: # Tryb łatwy
-            if not self.first_reveal_done:
+            if not engine.first_reveal_done:
                 if is_sel_reserve_area:
-                    blocks.append([reserve_border_color_for_empty_slot+l+Style.RESET_ALL for l in ["┌─────┐"]+["│     │"]*3+["└─────┘"]])
+                    blocks.append(GLYPHS.slot(reserve_border_color_for_empty_slot))
                 else:
                     blocks.append([" " * self.CARD_WIDTH] * self.CARD_HEIGHT)
             else:
-                card_on_reserve_slot = self.current_reserve_card_obj
-                if self.confirmed_selection and self.original_selected_coords and \
-                   self.original_selected_coords[0] == [0,-1] and \
-                   (self.selected_cards_coords[0][1] != -1 or self.selected_cards_coords[0][0] != 0):
-                    card_on_reserve_slot = None
-
-                border_easy_reserve = None
-                if is_sel_reserve_area and not (self.confirmed_selection and self.original_selected_coords and self.original_selected_coords[0] == [0,-1] and self.selected_cards_coords[0] == [0,-1]):
-                    border_easy_reserve = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
-                
-                if self.confirmed_selection and self.original_selected_coords and \
-                   self.original_selected_coords[0] == [0,-1] and \
-                   is_sel_reserve_area:
-                     blocks.append(self._get_card_face_lines(self.current_reserve_card_obj, Fore.GREEN))
-                elif card_on_reserve_slot:
-                    blocks.append(self._get_card_face_lines(card_on_reserve_slot, border_easy_reserve))
+                if held_from_reserve and is_sel_reserve_area:
+                    blocks.append(self._get_card_face_lines(card_on_reserve_slot, Fore.GREEN))
+                elif card_on_reserve_slot is not None:
+                    blocks.append(self._get_card_face_lines(card_on_reserve_slot, border_for_reserve_card))
                 else:
-                    blocks.append([reserve_border_color_for_empty_slot+l+Style.RESET_ALL for l in ["┌─────┐"]+["│     │"]*3+["└─────┘"]])
+                    blocks.append(GLYPHS.slot(reserve_border_color_for_empty_slot))
             blocks.append([" " * self.CARD_WIDTH] * self.CARD_HEIGHT)
         
         for pile_idx in range(4):
-            is_selected_this_final_pile = (self.selected_cards_coords and self.selected_cards_coords[0][0] == pile_idx + 1 and self.selected_cards_coords[0][1] == -1)
-            card_natively_on_this_final_pile = self.final_stacks[pile_idx][-1] if self.final_stacks[pile_idx] else None
-            
-            ghost_to_show_on_this_pile = None
-            if self.confirmed_selection and is_selected_this_final_pile:
-                if self.original_selected_coords[0][1] == -1 and self.original_selected_coords[0][0] > 0:
-                    ghost_to_show_on_this_pile = self.moving_final_card_obj
-                elif self.original_selected_coords[0][1] == -1 and self.original_selected_coords[0][0] == 0:
-                    ghost_to_show_on_this_pile = self.current_reserve_card_obj
-                elif self.original_selected_coords[0][1] != -1:
-                    if self.final_stacks[pile_idx]:
-                        ghost_to_show_on_this_pile = self.final_stacks[pile_idx][-1]
-            
-            if ghost_to_show_on_this_pile is not None and card_natively_on_this_final_pile is ghost_to_show_on_this_pile:
-                card_natively_on_this_final_pile = None
-            elif self.moving_final_card_obj and card_natively_on_this_final_pile is self.moving_final_card_obj and \
-                 self.original_selected_coords and self.original_selected_coords[0][0]-1 == pile_idx and \
-                 not is_selected_this_final_pile:
-                 card_natively_on_this_final_pile = None
-
-            if ghost_to_show_on_this_pile:
-                blocks.append(self._get_card_face_lines(ghost_to_show_on_this_pile, Fore.GREEN))
-            elif card_natively_on_this_final_pile:
-                border_final = Fore.RED if card_natively_on_this_final_pile.is_red() else Fore.WHITE
+            is_selected_this_final_pile = selection is not None and selection.zone == FINAL and selection.column == pile_idx
+            pile = engine.final_stacks[pile_idx]
+            if held_zone == FINAL and held_idx == pile_idx: # Podniesiona karta nie leży już na swojej kupce
+                pile = pile[:-1]
+            card_natively_on_this_final_pile = pile[-1] if pile else None
+
+            if held and is_selected_this_final_pile:
+                blocks.append(self._get_card_face_lines(held[0], Fore.GREEN))
+            elif card_natively_on_this_final_pile is not None:
+                border_final = None
                 if is_selected_this_final_pile:
-                    border_final = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
+                    border_final = Fore.YELLOW
                 blocks.append(self._get_card_face_lines(card_natively_on_this_final_pile, border_final))
             else:
                 border_empty_final = Fore.LIGHTBLACK_EX
                 if is_selected_this_final_pile:
-                    border_empty_final = Fore.GREEN if self.confirmed_selection else Fore.YELLOW
-                blocks.append([border_empty_final+l+Style.RESET_ALL for l in ["┌─────┐"]+["│     │"]*3+["└─────┘"]])
+                    border_empty_final = Fore.YELLOW
+                blocks.append(GLYPHS.slot(border_empty_final))
         
         # Wypisanie wszystkich bloków z odpowiednim odstępem
         for r in range(self.CARD_HEIGHT):
@@ -466,211 +554,38 @@ class Game:
             if current_line_output.strip():
                 print(current_line_output)
 
-    # Rozdaje karty do kolumn tableau i tworzy stos rezerwowy
-    def _generate_tableau_and_reserve(self):
-        card_counter = 0
-        self.tableau = [[] for _ in range(7)]
-        self.waste_pile_draw1 = []
-        self.waste_pile_draw3 = []
-        for i in range(7):
-            for j in range(i + 1):
-                if card_counter < len(self.deck_source_data):
-                    v,s = self.deck_source_data[card_counter]
-                    self.tableau[i].append(Card(v,s,hidden=(j!=i)))
-                    card_counter += 1
-                else:
-                    break
-        self.reserve_stock = [Card(v,s) for v,s in self.deck_source_data[card_counter:]]
-        self.current_reserve_card_obj = None
-        self.visible_draw3_cards = [None,None,None]
-        self.first_reveal_done = False
-
-    # Sprawdza, czy daną kartę można umieścić na kupce końcowej
-    def _can_place_on_final(self, card_obj_to_place, final_stack_list):
-        if not card_obj_to_place or not isinstance(card_obj_to_place,Card):
-            return False
-        v,s = card_obj_to_place.value, card_obj_to_place.suit
-        ci = self.VALUES.index(v) if v in self.VALUES else -1
-        if ci == -1:
-            return False
-        if not final_stack_list:
-            return v == "A"
-        lc = final_stack_list[-1]
-        if not lc or not isinstance(lc,Card):
-            return False
-        lv,ls = lc.value, lc.suit
-        li = self.VALUES.index(lv) if lv in self.VALUES else -1
-        if li == -1:
-            return False
-        return s == ls and ci == li + 1
-
-    # Zapisuje aktualny stan gry na potrzeby funkcji cofania
-    def _save_state_for_undo(self):
-        if self.game_over:
-            return
-        state = {
-            'tableau': [[card.get_raw_data() for card in col] for col in self.tableau],
-            'final_stacks': [[card.get_raw_data() for card in stack] for stack in self.final_stacks],
-            'reserve_stock': [card.get_raw_data() for card in self.reserve_stock],
-            'waste_pile_draw1': [card.get_raw_data() for card in self.waste_pile_draw1],
-            'waste_pile_draw3': [card.get_raw_data() for card in self.waste_pile_draw3],
-            'visible_draw3_cards': [(card.get_raw_data() if card else None) for card in self.visible_draw3_cards],
-            'current_reserve_card_obj': self.current_reserve_card_obj.get_raw_data() if self.current_reserve_card_obj else None,
-            'move_count': self.move_count,
-            'first_reveal_done': self.first_reveal_done,
-        }
-        self.game_state_history.append(copy.deepcopy(state))
-        self.undo_actions_available = len(self.game_state_history)
-
-    # Przywraca poprzedni stan gry z historii
-    def _restore_state_from_undo(self, state):
-        self.tableau = [[Card(val, suit, hidden) for val, suit, hidden in col_data] for col_data in state['tableau']]
-        self.final_stacks = [[Card(val, suit, hidden) for val, suit, hidden in stack_data] for stack_data in state['final_stacks']]
-        self.reserve_stock = [Card(val, suit, False) for val, suit, _ in state['reserve_stock']]
-        self.waste_pile_draw1 = [Card(val, suit, False) for val, suit, _ in state['waste_pile_draw1']]
-        self.waste_pile_draw3 = [Card(val, suit, False) for val, suit, _ in state['waste_pile_draw3']]
-        
-        self.visible_draw3_cards = []
-        for card_data in state['visible_draw3_cards']:
-            if card_data:
-                self.visible_draw3_cards.append(Card(card_data[0], card_data[1], card_data[2]))
-            else:
-                self.visible_draw3_cards.append(None)
-        
-        crc_data = state['current_reserve_card_obj']
-        if crc_data:
-            self.current_reserve_card_obj = Card(crc_data[0], crc_data[1], crc_data[2])
-        else:
-            self.current_reserve_card_obj = None
-            
-        self.first_reveal_done = state['first_reveal_done']
-        
-        self.selected_cards_coords = []
-        if len(self.tableau) > 1 and len(self.tableau[1]) > 1:
-            self.selected_cards_coords = [[1, 1]]
-        elif self.tableau and self.tableau[0]:
-            self.selected_cards_coords = [[0, 0]]
-        else:
-            self.selected_cards_coords = [[0,0]]
-        self.confirmed_selection = False
-        self.original_selected_coords = []
-        self.moving_final_card_obj = None
-        self.message = "Ruch cofnięty."
-
-    # Pomocnicza funkcja do cofania nieudanego ruchu w obrębie tableau
-    def _undo_failed_tableau_move(self):
-        if not self.original_selected_coords or not self.selected_cards_coords:
-            if self.original_selected_coords:
-                self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-            return
-
-        current_col = self.selected_cards_coords[0][0]
-        current_min_row = min(r for _, r in self.selected_cards_coords)
-        num_moved_cards = len(self.selected_cards_coords)
-
-        if not (0 <= current_col < len(self.tableau) and \
-                current_min_row + num_moved_cards <= len(self.tableau[current_col])):
-            self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-            return
-
-        cards_to_put_back = self.tableau[current_col][current_min_row : current_min_row + num_moved_cards]
-        
-        self.tableau[current_col] = self.tableau[current_col][:current_min_row] + self.tableau[current_col][current_min_row + num_moved_cards:]
-
-        original_col_src = self.original_selected_coords[0][0]
-        
-        if 0 <= original_col_src < len(self.tableau):
-            self.tableau[original_col_src].extend(cards_to_put_back)
-        else:
-            self.message = "Błąd"
-
-        self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-
     # Przesuwa zaznaczenie/kartę w poziomie (lewo/prawo)
     def move_selection_horizontal(self, is_right):
         if self.game_over:
             return
-        if not self.selected_cards_coords:
+        selection = self.selection
+        if selection is None:
             return
         
+        engine = self.engine
         direction = 1 if is_right else -1
-        current_col_sel, current_row_sel = self.selected_cards_coords[0]
-
-        def find_next_tableau_col_for_move(s, d):
-            if 0 <= s + d < len(self.tableau):
-                return s + d
-            return None
 
         if self.confirmed_selection:
-            orig_col_src, orig_row_type_src = self.original_selected_coords[0]
-
-            if current_row_sel == -1: # Poruszanie się po górnym rzędzie (rezerwa, kupki końcowe)
-                card_being_moved = None
-                is_originally_from_reserve = (orig_row_type_src == -1 and orig_col_src == 0)
-                is_originally_from_final = (orig_row_type_src == -1 and 1 <= orig_col_src <= 4)
-                is_originally_from_tableau_to_final = (orig_row_type_src != -1)
-
-                if is_originally_from_reserve:
-                    card_being_moved = self.current_reserve_card_obj
-                    if card_being_moved is None and current_col_sel > 0 and self.final_stacks[current_col_sel - 1]:
-                        card_being_moved = self.final_stacks[current_col_sel - 1][-1]
-                elif is_originally_from_final:
-                    card_being_moved = self.moving_final_card_obj
-                elif is_originally_from_tableau_to_final:
-                    if current_col_sel > 0 and self.final_stacks[current_col_sel - 1]:
-                        card_being_moved = self.final_stacks[current_col_sel - 1][-1]
-                
-                if card_being_moved:
-                    new_target_zone_col_idx = current_col_sel + direction
-
-                    if 0 <= new_target_zone_col_idx <= 4: # Sprawdzenie granic (0 dla rezerwy, 1-4 dla kupek końcowych)
-                        if current_col_sel == 0 and is_originally_from_reserve and self.current_reserve_card_obj is card_being_moved:
-                            self.current_reserve_card_obj = None
-                        elif current_col_sel > 0: # Była na kupce końcowej
-                            if self.final_stacks[current_col_sel - 1] and \
-                               self.final_stacks[current_col_sel - 1][-1] is card_being_moved:
-                                self.final_stacks[current_col_sel - 1].pop()
-                        
-                        self.selected_cards_coords = [[new_target_zone_col_idx, -1]]
-
-                        # Dodaj kartę na nową pozycję
-                        if new_target_zone_col_idx == 0:
-                            if is_originally_from_reserve:
-                                self.current_reserve_card_obj = card_being_moved
-                            else:
-                                self.selected_cards_coords = [[current_col_sel, -1]]
-                                if current_col_sel > 0:
-                                    self.final_stacks[current_col_sel - 1].append(card_being_moved)
-                        elif new_target_zone_col_idx > 0:
-                            self.final_stacks[new_target_zone_col_idx - 1].append(card_being_moved)
-            elif current_row_sel != -1: # Poruszanie się po kolumnach tableau
-                num_cards_in_sel = len(self.selected_cards_coords)
-                min_row_on_tab = min(r for _,r in self.selected_cards_coords)
-                if not (0 <= current_col_sel < len(self.tableau) and \
-                        self.tableau[current_col_sel] and \
-                        min_row_on_tab < len(self.tableau[current_col_sel]) and \
-                        num_cards_in_sel <= len(self.tableau[current_col_sel]) - min_row_on_tab):
-                    self.display_game()
-                    return
-                
-                cards_to_move = self.tableau[current_col_sel][min_row_on_tab : min_row_on_tab + num_cards_in_sel]
-                new_target_tab_col = find_next_tableau_col_for_move(current_col_sel, direction)
-                
-                if new_target_tab_col is not None:
-                    self.tableau[current_col_sel] = self.tableau[current_col_sel][:min_row_on_tab] + self.tableau[current_col_sel][min_row_on_tab + num_cards_in_sel:]
-                    new_start_row_in_target = len(self.tableau[new_target_tab_col])
-                    self.tableau[new_target_tab_col].extend(cards_to_move)
-                    self.selected_cards_coords = [[new_target_tab_col, new_start_row_in_target + i] for i in range(num_cards_in_sel)]
+            if selection.zone != TABLEAU: # Poruszanie się po górnym rzędzie (rezerwa, kupki końcowe)
+                is_originally_from_reserve = self.original_selection.zone == RESERVE
+                new_target_slot = (selection.column + 1 if selection.zone == FINAL else 0) + direction
+                if 0 <= new_target_slot <= 4: # Sprawdzenie granic (0 dla rezerwy, 1-4 dla kupek końcowych)
+                    if new_target_slot > 0 or is_originally_from_reserve:
+                        self.selection = _top_row_selection(new_target_slot)
+            else: # Poruszanie się po kolumnach tableau
+                new_target_tab_col = selection.column + direction
+                if 0 <= new_target_tab_col < len(engine.tableau):
+                    self._hover_tableau_column(new_target_tab_col)
         else: # Nawigacja bez podniesionej karty
-            if current_row_sel == -1: # Nawigacja w górnym rzędzie
-                if current_col_sel == 0: # Z rezerwy
+            if selection.zone != TABLEAU: # Nawigacja w górnym rzędzie
+                if selection.zone == RESERVE: # Z rezerwy
                     if is_right:
                         for i in range(4): # Szuka pierwszej zajętej kupki końcowej
-                            if self.final_stacks[i]:
-                                self.selected_cards_coords = [[i + 1, -1]]
+                            if engine.final_stacks[i]:
+                                self.selection = Selection(FINAL, i, 0, 1)
                                 break
-                elif 1 <= current_col_sel <= 4: # Z kupek końcowych
-                    current_final_idx = current_col_sel - 1
+                else: # Z kupek końcowych
+                    current_final_idx = selection.column
                     found_next_final_selection = False
                     temp_check_idx = current_final_idx
 
@@ -678,540 +593,180 @@ class Game:
                         temp_check_idx += direction
                         if not (0 <= temp_check_idx < 4):
                             break
-                        if self.final_stacks[temp_check_idx]:
-                            self.selected_cards_coords = [[temp_check_idx + 1, -1]]
+                        if engine.final_stacks[temp_check_idx]:
+                            self.selection = Selection(FINAL, temp_check_idx, 0, 1)
                             found_next_final_selection = True
                             break
                     if not found_next_final_selection:
-                        if direction == -1: 
-                            if self.first_reveal_done and (self.current_reserve_card_obj or (self.difficulty == 'trudny' and any(c for c in self.visible_draw3_cards if c is not None))):
-                                self.selected_cards_coords = [[0, -1]] # Na rezerwę
+                        if direction == -1 and self._can_interact_with_reserve():
+                            self.selection = RESERVE_SELECTION # Na rezerwę
             else: # Nawigacja w tableau
-                new_col_candidate = current_col_sel
+                new_col_candidate = selection.column
                 while True:
                     new_col_candidate += direction
-                    if not (0 <= new_col_candidate < len(self.tableau)):
+                    if not (0 <= new_col_candidate < len(engine.tableau)):
                         break
-                    if self.tableau[new_col_candidate]: # Znajduje następną niepustą kolumnę
-                        self.selected_cards_coords = [[new_col_candidate, len(self.tableau[new_col_candidate]) - 1]]
+                    if engine.tableau[new_col_candidate]: # Znajduje następną niepustą kolumnę
+                        self.selection = _last_card_selection(engine.tableau, new_col_candidate)
                         break
         self.display_game()
 
+    # Ustawia kursor z podniesionymi kartami nad kolumną tableau (karty dokładane są na jej koniec)
+    def _hover_tableau_column(self, col):
+        held = self.original_selection
+        if held.zone == TABLEAU and held.column == col:
+            self.selection = held
+            return
+        self.selection = Selection(TABLEAU, col, len(self.engine.tableau[col]), held.length)
+
+    # Sprawdza, czy w rezerwie jest odkryta karta, na którą można przenieść kursor
+    def _can_interact_with_reserve(self):
+        engine = self.engine
+        return engine.first_reveal_done and \
+               (engine.current_reserve_card is not None or \
+                (self.difficulty == 'trudny' and any(c is not None for c in engine.visible_draw3_cards)))
+
     # Sprawdza, czy warunki wygranej zostały spełnione
     def _check_win_condition(self):
         if self.game_over:
             return True
-        for stack in self.final_stacks:
-            if len(stack) != 13:
-                return False
-            if stack[-1].value != "K":
-                return False
+        if not self.engine.is_won():
+            return False
         
         self.game_over = True
-        self.message = f"Gratulacje! Wygrałeś w {self.move_count} ruchach!"
+        if self.journal is not None:
+            self.journal.discard()
+        self.message = f"Gratulacje! Wygrałeś w {self.engine.move_count} ruchach!"
         current_score_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        score_entry = {"moves": self.move_count, "timestamp": current_score_timestamp, "difficulty": self.difficulty}
-        scores = []
-        if os.path.exists(self.SCORES_FILE):
-            try:
-                with open(self.SCORES_FILE, 'r') as f:
-                    scores = json.load(f)
-                if not isinstance(scores, list):
-                    scores = []
-            except json.JSONDecodeError:
-                scores = []
-        scores.append(score_entry)
+        score_entry = {"moves": self.engine.move_count, "timestamp": current_score_timestamp, "difficulty": self.difficulty}
         try:
-            with open(self.SCORES_FILE, 'w') as f:
-                json.dump(scores, f, indent=4)
-        except IOError:
+            self.scores.append(score_entry)
+        except OSError:
             self.message += " (Nie udało się zapisać wyniku)"
+        else:
+            moves = self.engine.move_count
+            self.message += (f"\nTo {self.scores.rank(moves, self.difficulty)}. miejsce na poziomie {self.difficulty} "
+                             f"(najlepsze {self.scores.top_percent(moves, self.difficulty):.1f}% "
+                             f"z {self.scores.count(self.difficulty)} wyników).")
         
-        self.display_game()
+        self.display_game(force=True)
         self._display_leaderboard(new_score_timestamp=current_score_timestamp)
+        self.renderer.invalidate()
         return True
 
-    # Uzupełnia zestaw trzech kart w trybie trudnym.
-    def _refill_draw3_window(self, card_just_used=None):
-        if self.difficulty != 'trudny':
-            return
-        
-        if card_just_used:
-            for i in range(3):
-                if self.visible_draw3_cards[i] is card_just_used:
-                    self.visible_draw3_cards[i] = None
-                    break
-        
-        current_visible = [card for card in self.visible_draw3_cards if card is not None]
-        self.visible_draw3_cards = [None, None, None]
-
-        current_idx = 2
-        for card in reversed(current_visible):
-            if current_idx >= 0:
-                self.visible_draw3_cards[current_idx] = card
-                current_idx -= 1
-            else:
-                break
-
-        for i in range(3):
-            if self.visible_draw3_cards[i] is None:
-                if self.reserve_stock:
-                    self.visible_draw3_cards[i] = self.reserve_stock.pop(0)
-                elif self.waste_pile_draw3:
-                    if not self.reserve_stock and self.waste_pile_draw3:
-                        self.reserve_stock = self.waste_pile_draw3[:]
-                        self.waste_pile_draw3 = []
-                        if self.reserve_stock:
-                            self.visible_draw3_cards[i] = self.reserve_stock.pop(0)
-                        else:
-                            break
-                    else:
-                        break
-                else:
-                    break
-
-        new_active_card = None
-        if self.visible_draw3_cards[2] is not None:
-            new_active_card = self.visible_draw3_cards[2]
-        elif self.visible_draw3_cards[1] is not None:
-            new_active_card = self.visible_draw3_cards[1]
-        elif self.visible_draw3_cards[0] is not None:
-            new_active_card = self.visible_draw3_cards[0]
-        
-        self.current_reserve_card_obj = new_active_card
-
     # Obsługuje logikę podniesienia (pierwsze wciśnięcie Enter) i umieszczenia karty (drugie Enter)
     def confirm_selection(self):
         if self.game_over:
             return
-        if not self.selected_cards_coords:
+        selection = self.selection
+        if selection is None:
             self.display_game()
             return
 
         if not self.confirmed_selection: # Pierwsze wciśnięcie Enter - podniesienie karty
-            sel_c, sel_r = self.selected_cards_coords[0]
-            valid_pickup = False
-            if sel_r == -1: # Podnoszenie z rezerwy lub kupki końcowej
-                if (sel_c == 0 and self.first_reveal_done and self.current_reserve_card_obj) or \
-                   (1 <= sel_c <= 4 and self.final_stacks[sel_c-1]):
-                    valid_pickup = True
-            else: # Podnoszenie z tableau
-                all_visible_in_stack = True
-                if not self.selected_cards_coords: # Powinno być zawsze true, ale dla bezpieczeństwa
-                    all_visible_in_stack = False
-                else:
-                    for sc, sr in self.selected_cards_coords:
-                        if not (0 <= sc < len(self.tableau) and 0 <= sr < len(self.tableau[sc])):
-                            all_visible_in_stack = False
-                            break
-                        if self.tableau[sc][sr].hidden:
-                            all_visible_in_stack = False
-                            break
-                if all_visible_in_stack and self.selected_cards_coords:
-                    valid_pickup = True
-            
-            if valid_pickup:
-                self._save_state_for_undo()
-                self.original_selected_coords = [c[:] for c in self.selected_cards_coords]
+            count = selection.length
+            if selection.zone == TABLEAU: # Zaznaczenie musi sięgać do ostatniej karty kolumny
+                if selection.start_row + count != len(self.engine.tableau[selection.column]):
+                    count = 0
+            if count and self.engine.can_pick_up(selection.zone, selection.column, count):
+                self.original_selection = selection
                 self.confirmed_selection = True
-                self.moving_final_card_obj = None
-                if self.original_selected_coords[0][1] == -1 and 1 <= self.original_selected_coords[0][0] <= 4:
-                    # Jeśli podnosimy z kupki końcowej, zabierz kartę od razu
-                    final_pile_idx = self.original_selected_coords[0][0] - 1
-                    if self.final_stacks[final_pile_idx]:
-                        self.moving_final_card_obj = self.final_stacks[final_pile_idx].pop()
             else:
                 self.message = "Nie można podnieść."
             self.display_game()
             return
         
         # Drugie wciśnięcie Enter - umieszczenie karty
-        source_col_orig, source_row_type_orig = self.original_selected_coords[0]
-        target_col, target_row = self.selected_cards_coords[0]
-        
-        move_successful = False
-        action_taken = False
-        
-        # Przypadek 1: z rezerwy na kupkę końcową
-        if source_row_type_orig == -1 and source_col_orig == 0 and \
-           target_row == -1 and 1 <= target_col <= 4:
-            action_taken = True
-            target_final_pile_idx = target_col - 1
-            
-            card_placed_on_final = None
-            if self.final_stacks[target_final_pile_idx]:
-                card_placed_on_final = self.final_stacks[target_final_pile_idx][-1]
-            
-            if not card_placed_on_final:
-                self.selected_cards_coords = [[0, -1]]
-            elif self._can_place_on_final(card_placed_on_final, self.final_stacks[target_final_pile_idx][:-1]):
-                move_successful = True
-                if self.difficulty == 'trudny':
-                    self._refill_draw3_window(card_just_used=card_placed_on_final)
-                self.selected_cards_coords = [[0, -1]]
-            else: # Nie można umieścić
-                self.message = "Nie można tutaj umieścić tej karty."
-                if self.final_stacks[target_final_pile_idx] and self.final_stacks[target_final_pile_idx][-1] is card_placed_on_final:
-                    self.final_stacks[target_final_pile_idx].pop()
-                
-                self.current_reserve_card_obj = card_placed_on_final
-                if self.difficulty == 'trudny':
-                    is_card_in_visible = any(self.visible_draw3_cards[i] is card_placed_on_final for i in range(3))
-                    if not is_card_in_visible:
-                        for i in range(2, -1, -1):
-                            if self.visible_draw3_cards[i] is None:
-                                self.visible_draw3_cards[i] = card_placed_on_final
-                                is_card_in_visible = True
-                                break
-                        if not is_card_in_visible:
-                            self.visible_draw3_cards[2] = card_placed_on_final
-                    self._refill_draw3_window()
-                self.selected_cards_coords = [[0, -1]]
-        
-        # Przypadek 2: z kupki końcowej na inną kupkę końcową
-        elif source_row_type_orig == -1 and 1 <= source_col_orig <= 4 and target_row == -1 and 1 <= target_col <= 4:
-            action_taken = True
-            idx_final_target = target_col - 1
-            original_final_pile_idx = source_col_orig - 1
-            
-            card_to_validate = None
-            if self.final_stacks[idx_final_target] and self.final_stacks[idx_final_target][-1] is self.moving_final_card_obj:
-                card_to_validate = self.moving_final_card_obj
-            
-            if not card_to_validate:
-                if self.moving_final_card_obj:
-                    self.final_stacks[original_final_pile_idx].append(self.moving_final_card_obj)
-                self.selected_cards_coords = [[source_col_orig, -1]]
-            elif self._can_place_on_final(card_to_validate, self.final_stacks[idx_final_target][:-1]):
-                move_successful = True
-            else:
-                self.message = "Nie można tutaj umieścić tej karty."
-                if self.final_stacks[idx_final_target] and self.final_stacks[idx_final_target][-1] is card_to_validate:
-                    self.final_stacks[idx_final_target].pop()
-                if self.moving_final_card_obj:
-                    self.final_stacks[original_final_pile_idx].append(self.moving_final_card_obj)
-                self.selected_cards_coords = [[source_col_orig, -1]]
-        
-        # Przypadek 3: z tableau na kupkę końcową
-        elif source_row_type_orig != -1 and target_row == -1 and 1 <= target_col <= 4:
-            action_taken = True
-            idx_final_target = target_col - 1
-            if not self.final_stacks[idx_final_target]:
-                self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-            else:
-                card_moved_to_final = self.final_stacks[idx_final_target][-1]
-                if self._can_place_on_final(card_moved_to_final, self.final_stacks[idx_final_target][:-1]):
-                    move_successful = True
-                    orig_tab_col_idx = self.original_selected_coords[0][0]
-                    if self.tableau[orig_tab_col_idx] and self.tableau[orig_tab_col_idx][-1].hidden:
-                        self.tableau[orig_tab_col_idx][-1].hidden = False
-                else:
-                    self.message = "Nie można tutaj umieścić tej karty."
-                    card_to_return_to_tableau = self.final_stacks[idx_final_target].pop()
-                    orig_tab_col_idx, orig_tab_row_idx = self.original_selected_coords[0]
-                    if 0 <= orig_tab_col_idx < len(self.tableau):
-                        insert_pos = min(orig_tab_row_idx, len(self.tableau[orig_tab_col_idx]))
-                        self.tableau[orig_tab_col_idx].insert(insert_pos, card_to_return_to_tableau)
-                    self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-        
-        # Przypadek 4: z tableau na tableau
-        elif source_row_type_orig != -1 and target_row != -1:
-            action_taken = True
-            current_tableau_col, current_tableau_start_row = target_col, min(r for _,r in self.selected_cards_coords)
-            
-            valid_move_tableau = False
-            if not (0 <= current_tableau_col < len(self.tableau) and 0 <= current_tableau_start_row <= len(self.tableau[current_tableau_col])):
-                self.message = "Błąd"
-            elif not self.tableau[current_tableau_col] or current_tableau_start_row == len(self.tableau[current_tableau_col]): # Przenoszenie na pustą kolumnę lub na koniec istniejącej
-                is_target_col_empty_before_move = (len(self.tableau[current_tableau_col]) - len(self.selected_cards_coords) == 0)
-                if self.tableau[current_tableau_col] and current_tableau_start_row < len(self.tableau[current_tableau_col]):
-                    first_card_of_moved_stack = self.tableau[current_tableau_col][current_tableau_start_row]
-                    if first_card_of_moved_stack.value == "K" and is_target_col_empty_before_move:
-                        valid_move_tableau = True
-            else: # Przenoszenie na istniejącą kartę
-                top_card_of_stack = self.tableau[current_tableau_col][current_tableau_start_row]
-                if current_tableau_start_row == 0:
-                    if top_card_of_stack.value == "K":
-                        valid_move_tableau = True
-                else:
-                    card_underneath = self.tableau[current_tableau_col][current_tableau_start_row - 1]
-                    if not card_underneath.hidden:
-                        val_idx_moved = self.VALUES.index(top_card_of_stack.value) if top_card_of_stack.value in self.VALUES else -1
-                        val_idx_under = self.VALUES.index(card_underneath.value) if card_underneath.value in self.VALUES else -1
-                        if val_idx_moved != -1 and val_idx_under != -1 and \
-                           top_card_of_stack.is_red() != card_underneath.is_red() and \
-                           val_idx_under - val_idx_moved == 1:
-                            valid_move_tableau = True
-            
-            if valid_move_tableau:
-                move_successful = True
-                if self.tableau[source_col_orig] and self.tableau[source_col_orig][-1].hidden: # Odkryj kartę pod spodem w kolumnie źródłowej
-                    self.tableau[source_col_orig][-1].hidden = False
+        held = self.original_selection
+        if selection == held: # Gracz kliknął Enter na tym samym miejscu
+            self.message = "Wybór odznaczony."
+        else:
+            move = Move(held.zone, held.column, selection.zone, selection.column, held.length)
+            if self._apply_move(move):
+                if held.zone == RESERVE and selection.zone == FINAL:
+                    self.selection = RESERVE_SELECTION
             else:
                 self.message = "Nie można tutaj umieścić tej karty."
-                self._undo_failed_tableau_move() # Przywróć karty na oryginalne miejsce
-        
-        # Przypadek 5: z rezerwy na tableau LUB z kupki końcowej na tableau
-        elif (source_row_type_orig == -1 and source_col_orig == 0 and target_row != -1) or \
-             (source_row_type_orig == -1 and 1 <= source_col_orig <= 4 and target_row != -1):
-            action_taken = True
-            tableau_target_col = target_col
-            if not self.tableau[tableau_target_col] or not self.tableau[tableau_target_col][-1]: # Karta powinna już tam być
-                self.message = "Błąd"
-                self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-            else:
-                card_moved_to_tableau = self.tableau[tableau_target_col][-1] # Karta, która została przeniesiona na tableau
-                valid_move_to_tableau = False
-                if len(self.tableau[tableau_target_col]) == 1: # Jeśli to jedyna karta w kolumnie
-                    if card_moved_to_tableau.value == "K":
-                        valid_move_to_tableau = True
-                else: # Kładziemy na inną kartę
-                    card_underneath_in_tableau = self.tableau[tableau_target_col][-2]
-                    if not card_underneath_in_tableau.hidden:
-                        val_idx_moved = self.VALUES.index(card_moved_to_tableau.value) if card_moved_to_tableau.value in self.VALUES else -1
-                        val_idx_under = self.VALUES.index(card_underneath_in_tableau.value) if card_underneath_in_tableau.value in self.VALUES else -1
-                        if val_idx_moved != -1 and val_idx_under != -1 and \
-                           card_moved_to_tableau.is_red() != card_underneath_in_tableau.is_red() and \
-                           val_idx_under - val_idx_moved == 1:
-                            valid_move_to_tableau = True
-                
-                if valid_move_to_tableau:
-                    move_successful = True
-                    if source_row_type_orig == -1 and source_col_orig == 0 : # Jeśli z rezerwy
-                        if self.difficulty == 'trudny':
-                            self._refill_draw3_window(card_just_used=card_moved_to_tableau)
-                else: # Nieprawidłowy ruch na tableau
-                    self.message = "Nie można tutaj umieścić tej karty."
-                    card_to_return_from_tableau = self.tableau[tableau_target_col].pop()
-                    if source_row_type_orig == -1 and source_col_orig == 0: # Wróć do rezerwy
-                        self.current_reserve_card_obj = card_to_return_from_tableau
-                        if self.difficulty == 'trudny':
-                            is_card_in_visible = any(self.visible_draw3_cards[i] is card_to_return_from_tableau for i in range(3))
-                            if not is_card_in_visible:
-                                for i in range(2, -1, -1):
-                                    if self.visible_draw3_cards[i] is None:
-                                        self.visible_draw3_cards[i] = card_to_return_from_tableau
-                                        is_card_in_visible = True; break
-                                if not is_card_in_visible: self.visible_draw3_cards[2] = card_to_return_from_tableau
-                            self._refill_draw3_window()
-                    elif source_row_type_orig == -1 and 1 <= source_col_orig <= 4: # Wróć na kupkę końcową
-                        self.final_stacks[source_col_orig-1].append(card_to_return_from_tableau)
-                    self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-
-        if not action_taken: # Żaden z powyższych przypadków nie został dopasowany
-            if self.original_selected_coords == self.selected_cards_coords: # Gracz kliknął Enter na tym samym miejscu
-                if source_row_type_orig == -1 and 1 <= source_col_orig <= 4 and self.moving_final_card_obj:
-                    self.final_stacks[source_col_orig-1].append(self.moving_final_card_obj)
-                self.message = "Wybór odznaczony."
-                if self.game_state_history: # Usunięcie stanu zapisanego przy podniesieniu
-                    self.game_state_history.pop()
-                    self.undo_actions_available = len(self.game_state_history)
-            else: # Nieprawidłowy ruch, który nie pasuje do żadnej logiki
-                self.message = "Nieprawidłowy ruch."
-                if source_row_type_orig != -1 and target_row != -1: # Jeśli ruch był Tableau -> Tableau, cofnij
-                    self._undo_failed_tableau_move()
-                else: # Jeśli inaczej, zresetuj zaznaczenie do oryginalnego
-                    self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
-                    if self.moving_final_card_obj and source_row_type_orig == -1 and 1 <= source_col_orig <= 4:
-                        self.final_stacks[source_col_orig-1].append(self.moving_final_card_obj)
-                if self.game_state_history and not action_taken: # Usunięcie stanu zapisanego przy podniesieniu
-                    self.game_state_history.pop()
-                    self.undo_actions_available = len(self.game_state_history)
-        
-        if move_successful:
-            self.move_count += 1
-        elif action_taken and not move_successful:
-            # Jeśli podjęto próbę ruchu, ale się nie udała, usuń stan z historii (bo nieudany ruch nie powinien być cofnięty)
-            if self.game_state_history:
-                self.game_state_history.pop()
-                self.undo_actions_available = len(self.game_state_history)
-        
+                self.selection = held
+
+        self.confirmed_selection = False
+        self.original_selection = None
         if self._check_win_condition():
             return
-        
-        self.confirmed_selection = False
-        self.original_selected_coords = []
-        self.moving_final_card_obj = None
         self.display_game()
 
     # Rozszerza zaznaczenie w pionie (góra/dół) lub przenosi między strefami.
     def extend_selection(self, is_up):
         if self.game_over:
             return
-        if not self.selected_cards_coords:
+        selection = self.selection
+        if selection is None:
             return
         
-        current_col_sel, current_row_sel = self.selected_cards_coords[0]
+        engine = self.engine
+        col = selection.column
+        in_tableau = selection.zone == TABLEAU
 
         if self.confirmed_selection: # Karta jest podniesiona
-            orig_col_src, orig_row_type_src = self.original_selected_coords[0]
-            current_target_col, current_target_row = self.selected_cards_coords[0]
-
             if is_up: # Ruch w górę z podniesioną kartą
+                if not in_tableau: # Kursor już jest na rezerwie/final
+                    pass
                 # Przypadek: Karta z rezerwy, obecnie na tableau, wraca do rezerwy/final
-                if orig_row_type_src == -1 and orig_col_src == 0 and current_target_row != -1:
-                    card_on_tableau_from_reserve = self.tableau[current_target_col][current_target_row]
-                        
-                    if 0 <= current_target_col <= 2: # Wróć do rezerwy (jeśli tableau col 0-2)
-                        self.tableau[current_target_col].pop(current_target_row)
-                        self.current_reserve_card_obj = card_on_tableau_from_reserve
-                        if self.difficulty == 'trudny':
-                            is_card_in_visible = any(self.visible_draw3_cards[i] is card_on_tableau_from_reserve for i in range(3))
-                            if not is_card_in_visible:
-                                for i in range(2, -1, -1):
-                                    if self.visible_draw3_cards[i] is None:
-                                        self.visible_draw3_cards[i] = card_on_tableau_from_reserve
-                                        is_card_in_visible = True
-                                        break
-                                if not is_card_in_visible: 
-                                    self.visible_draw3_cards[2] = card_on_tableau_from_reserve
-                            self._refill_draw3_window()
-                        self.selected_cards_coords = [[0, -1]]
+                elif self.original_selection.zone == RESERVE:
+                    if 0 <= col <= 2: # Wróć do rezerwy (jeśli tableau col 0-2)
+                        self.selection = RESERVE_SELECTION
                         self.message = "Karta wraca do Rezerwy (Enter/Esc)."
-                    elif 3 <= current_target_col <= 6: # Przenieś na kupkę końcową (jeśli tableau col 3-6)
-                        target_final_idx = current_target_col - 3
-                        moved_card = self.tableau[current_target_col].pop(current_target_row)
-                        self.final_stacks[target_final_idx].append(moved_card)
-                        if self.difficulty == 'łatwy': 
-                            self.current_reserve_card_obj = None
-                        self.selected_cards_coords = [[target_final_idx + 1, -1]]
-                    else:
-                        self.message = "Nieprawidłowa kolumna Tableau."
-                    self.display_game()
-                    return
-
+                    else: # Przenieś na kupkę końcową (jeśli tableau col 3-6)
+                        self.selection = Selection(FINAL, col - 3, 0, 1)
                 # Przypadek: Karta z tableau/final, obecnie na tableau, próba przeniesienia na final
-                elif (orig_row_type_src != -1 and current_target_row != -1) or \
-                     (orig_row_type_src == -1 and 1 <= orig_col_src <= 4 and current_target_row != -1):
-                    is_single_card = (orig_row_type_src != -1 and len(self.original_selected_coords) == 1) or \
-                                     (orig_row_type_src == -1 and 1 <= orig_col_src <= 4) # Sprawdź, czy to pojedyncza karta
-                    if not is_single_card:
-                        self.message = "Tylko pojedynczą kartę można przenieść na kupkę końcową w ten sposób."
-                    elif not (0 <= current_target_col < len(self.tableau) and \
-                              0 <= current_target_row < len(self.tableau[current_target_col])):
-                        self.message = "Błąd identyfikacji karty na tableau."
-                    else:
-                        target_final_idx = -1
-                        if 3 <= current_target_col <= 6: # Mapowanie kolumn tableau 3-6 na kupki końcowe 0-3
-                            target_final_idx = current_target_col - 3
-                        if target_final_idx != -1:
-                            moved_card = self.tableau[current_target_col].pop(current_target_row)
-                            self.final_stacks[target_final_idx].append(moved_card)
-                            self.selected_cards_coords = [[target_final_idx + 1, -1]]
-                        
-                    self.display_game()
-                    return
-
-                # Przypadek: kursor już jest na rezerwie/final
-                elif current_target_row == -1:
-                    pass
-                    self.display_game()
-                    return
+                elif self.original_selection.length != 1:
+                    self.message = "Tylko pojedynczą kartę można przenieść na kupkę końcową w ten sposób."
+                elif 3 <= col <= 6: # Mapowanie kolumn tableau 3-6 na kupki końcowe 0-3
+                    self.selection = Selection(FINAL, col - 3, 0, 1)
             
             else: # Ruch w dół z podniesioną kartą
-                if self.confirmed_selection:
-                    orig_col_src, orig_row_type_src = self.original_selected_coords[0]
-                    current_target_col, current_target_row = self.selected_cards_coords[0] # Gdzie kursor jest teraz
-
-                    # Przypadek: oryginalnie z rezerwy, kursor nad rezerwą, przenosimy na tableau[0]
-                    if orig_row_type_src == -1 and orig_col_src == 0 and self.current_reserve_card_obj is not None:
-                        card_instance_from_reserve = self.current_reserve_card_obj
-                        target_tab_col = 0 # Domyślnie na pierwszą kolumnę tableau
-                        
-                        self.tableau[target_tab_col].append(card_instance_from_reserve)
-                        self.current_reserve_card_obj = None # Opróżnij rezerwę
-                        self.selected_cards_coords = [[target_tab_col, len(self.tableau[target_tab_col]) - 1]]
-                        self.display_game()
-                        return
-                    
-                    # Przypadek: karta z final lub tableau (przez final) lub rezerwy (przez final), kursor nad final, przenosimy na tableau pod nim
-                    elif \
-                        (orig_row_type_src == -1 and 1 <= orig_col_src <= 4 and current_target_row == -1 and current_target_col == orig_col_src) or \
-                        (orig_row_type_src != -1 and current_target_row == -1 and 1 <= current_target_col <= 4) or \
-                        (orig_row_type_src == -1 and orig_col_src == 0 and current_target_row == -1 and 1 <= current_target_col <= 4 and self.current_reserve_card_obj is None):
-                        
-                        card_to_move_from_final_area = None
-                        final_pile_idx_source_for_move = -1
-
-                        # Karta była oryginalnie z Final i jest w self.moving_final_card_obj
-                        if self.moving_final_card_obj and orig_row_type_src == -1 and 1 <= orig_col_src <= 4 and current_target_col == orig_col_src:
-                            card_to_move_from_final_area = self.moving_final_card_obj
-                            final_pile_idx_source_for_move = orig_col_src - 1
-                            self.moving_final_card_obj = None
-                        # Karta trafiła na Final pile (z tableau lub rezerwy) i jest na końcu stosu
-                        elif current_target_row == -1 and 1 <= current_target_col <=4 and self.final_stacks[current_target_col-1]:
-                            final_pile_idx_source_for_move = current_target_col -1
-                            card_to_move_from_final_area = self.final_stacks[final_pile_idx_source_for_move].pop()
-                            if self.moving_final_card_obj and self.moving_final_card_obj == card_to_move_from_final_area:
-                                self.moving_final_card_obj = None # Jeśli to była ta sama karta co w moving_final_card_obj
-                        
-                        if card_to_move_from_final_area:
-                            target_tab_col_to_place = final_pile_idx_source_for_move + 3 # Mapowanie kupki końcowej na kolumnę tableau
-                            if 0 <= target_tab_col_to_place < len(self.tableau):
-                                self.tableau[target_tab_col_to_place].append(card_to_move_from_final_area)
-                                self.selected_cards_coords = [[target_tab_col_to_place, len(self.tableau[target_tab_col_to_place]) - 1]]
-                            else: # Nie udało się przenieść
-                                if orig_row_type_src == -1 and 1 <= orig_col_src <= 4: # Jeśli oryginalnie z Final, wraca do moving_final_card_obj
-                                    self.moving_final_card_obj = card_to_move_from_final_area
-                                else: # Inaczej (z tableau przez Final LUB z rezerwy przez Final) wraca na stos Final
-                                    self.final_stacks[final_pile_idx_source_for_move].append(card_to_move_from_final_area)
-                                self.message = "Brak odpowiedniej kolumny Tableau."
-                                self.selected_cards_coords = [[current_target_col, -1]] # Kursor wraca na Final Pile
-                        else:
-                            self.message = "Błąd."
-                            self.selected_cards_coords = [[current_target_col, -1]]
-
-                        self.display_game(); return
+                # Przypadek: oryginalnie z rezerwy, kursor nad rezerwą, przenosimy na tableau[0]
+                if selection.zone == RESERVE:
+                    self._hover_tableau_column(0)
+                # Przypadek: kursor nad kupką końcową, przenosimy na kolumnę tableau pod nią
+                elif selection.zone == FINAL:
+                    self._hover_tableau_column(col + 3)
         else: # Nawigacja bez podniesionej karty
             can_extend_further_up_in_tableau = False
-            if current_row_sel != -1 and is_up: # Próba rozszerzenia zaznaczenia w górę w tej samej kolumnie tableau
-                if current_row_sel > 0:
-                    if 0 <= current_col_sel < len(self.tableau) and (current_row_sel - 1) < len(self.tableau[current_col_sel]):
-                        card_above = self.tableau[current_col_sel][current_row_sel - 1]
-                        if not card_above.hidden:
-                            self.selected_cards_coords.insert(0, [current_col_sel, current_row_sel - 1])
-                            can_extend_further_up_in_tableau = True
+            if in_tableau and is_up: # Próba rozszerzenia zaznaczenia w górę w tej samej kolumnie tableau
+                row_above = selection.start_row - 1
+                if 0 <= row_above < len(engine.tableau[col]) and not is_hidden(engine.tableau[col][row_above]):
+                    self.selection = Selection(TABLEAU, col, row_above, selection.length + 1)
+                    can_extend_further_up_in_tableau = True
             
             if not can_extend_further_up_in_tableau: # Nie można rozszerzyć w górę lub ruch w dół
                 special_reserve_interaction = False
-                can_interact_with_reserve = self.first_reveal_done and \
-                                            (self.current_reserve_card_obj or \
-                                             (self.difficulty == 'trudny' and any(c for c in self.visible_draw3_cards if c is not None)))
+                can_interact_with_reserve = self._can_interact_with_reserve()
                 
                 if can_interact_with_reserve: # Interakcja z rezerwą
-                    if is_up and current_row_sel != -1 and (0 <= current_col_sel <= 2): # Z tableau (kolumny 0-2) na rezerwę
-                        self.selected_cards_coords = [[0, -1]]
+                    if is_up and in_tableau and col <= 2: # Z tableau (kolumny 0-2) na rezerwę
+                        self.selection = RESERVE_SELECTION
                         special_reserve_interaction = True
-                    elif not is_up and current_col_sel == 0 and current_row_sel == -1: # Z rezerwy na tableau[0]
-                        if self.tableau[0]:
-                            self.selected_cards_coords = [[0, len(self.tableau[0])-1]]
-                        else:
-                            self.selected_cards_coords = [[0,0]] # Zaznacz miejsce na kartę
+                    elif not is_up and selection.zone == RESERVE: # Z rezerwy na tableau[0]
+                        self.selection = _last_card_selection(engine.tableau, 0) # W pustej kolumnie - miejsce na kartę
                         special_reserve_interaction = True
                 
                 if not special_reserve_interaction: # Inne przypadki nawigacji
-                    if current_row_sel != -1: # Jesteśmy w tableau
+                    if in_tableau: # Jesteśmy w tableau
                         if is_up: # Strzałka w górę z tableau (kolumny > 2) na kupkę końcową lub rezerwę
-                            if current_col_sel > 2 :
-                                target_final_idx = current_col_sel - 3
-                                if 0 <= target_final_idx < 4 and self.final_stacks[target_final_idx]:
-                                    self.selected_cards_coords = [[target_final_idx + 1, -1]]
+                            if col > 2 :
+                                target_final_idx = col - 3
+                                if 0 <= target_final_idx < 4 and engine.final_stacks[target_final_idx]:
+                                    self.selection = Selection(FINAL, target_final_idx, 0, 1)
                                 elif can_interact_with_reserve:
-                                    self.selected_cards_coords = [[0, -1]]
+                                    self.selection = RESERVE_SELECTION
                             elif can_interact_with_reserve:
-                                self.selected_cards_coords = [[0, -1]]
-                        elif not is_up and len(self.selected_cards_coords) > 1: # Strzałka w dół, zmniejsz zaznaczenie w tableau
-                            self.selected_cards_coords.pop(0)
+                                self.selection = RESERVE_SELECTION
+                        elif not is_up and selection.length > 1: # Strzałka w dół, zmniejsz zaznaczenie w tableau
+                            self.selection = Selection(TABLEAU, col, selection.start_row + 1, selection.length - 1)
                     else: # Górny rząd (rezerwa lub kupki końcowe)
-                        target_tableau_col_non_confirmed = -1
-                        if not is_up and 1 <= current_col_sel <= 4 : # Strzałka w dół z kupki końcowej
-                            final_idx = current_col_sel - 1
-                            target_tableau_col_non_confirmed = final_idx + 3 # Mapowanie na kolumnę tableau
-                            if 0 <= target_tableau_col_non_confirmed < len(self.tableau):
-                                if self.tableau[target_tableau_col_non_confirmed]:
-                                    self.selected_cards_coords = [[target_tableau_col_non_confirmed, len(self.tableau[target_tableau_col_non_confirmed]) - 1]]
-                                else: # Pusta kolumna tableau
-                                    self.selected_cards_coords = [[target_tableau_col_non_confirmed, 0]]
+                        if not is_up and selection.zone == FINAL: # Strzałka w dół z kupki końcowej
+                            self.selection = _last_card_selection(engine.tableau, col + 3) # Mapowanie na kolumnę tableau
         self.display_game()
 
     # Odkrywa nową kartę/karty z rezerwy.
@@ -1223,175 +778,237 @@ class Game:
             self.display_game()
             return
         
-        self._save_state_for_undo()
+        self._apply_move(DRAW)
+        if self.engine.current_reserve_card is None and not self.message:
+            self.message = "Brak kart."
 
-        if not self.first_reveal_done:
-            self.first_reveal_done = True
-        
-        self.move_count +=1
-        
-        if self.difficulty == 'łatwy':
-            if self.current_reserve_card_obj is not None:
-                self.waste_pile_draw1.append(self.current_reserve_card_obj)
-                self.current_reserve_card_obj = None
-            
-            if not self.reserve_stock and self.waste_pile_draw1:
-                self.reserve_stock = self.waste_pile_draw1[:]
-                self.reserve_stock.reverse()
-                self.waste_pile_draw1 = []
-            
-            if self.reserve_stock:
-                self.current_reserve_card_obj = self.reserve_stock.pop(0)
-            else:
-                self.message = "Brak kart."
-        
-        elif self.difficulty == 'trudny':
-            for card_in_window in reversed(self.visible_draw3_cards): # Przenieś widoczne karty do waste
-                if card_in_window:
-                    self.waste_pile_draw3.append(card_in_window)
-            
-            self.visible_draw3_cards = [None, None, None]
-            drawn_this_turn = []
-            
-            for _ in range(3): # Dobierz do 3 kart
-                if self.reserve_stock:
-                    drawn_this_turn.append(self.reserve_stock.pop(0))
-                elif self.waste_pile_draw3: # Jeśli rezerwa pusta, odwróć waste
-                    if not self.reserve_stock and self.waste_pile_draw3:
-                        self.reserve_stock = self.waste_pile_draw3[:]
-                        self.waste_pile_draw3 = []
-                        if self.reserve_stock:
-                            drawn_this_turn.append(self.reserve_stock.pop(0))
-                        else: break # Brak kart nawet po odwróceniu
-                    else: break # Waste jest pusty
-                else: break # Rezerwa i waste są puste
-            
-            for i in range(len(drawn_this_turn)):
-                self.visible_draw3_cards[i] = drawn_this_turn[i]
-            
-            self._refill_draw3_window()
-            
-            if not self.current_reserve_card_obj and not self.reserve_stock and not self.waste_pile_draw3:
-                self.message = "Brak kart."
+        self.selection = RESERVE_SELECTION
+        if self._check_win_condition():
+            return
+        self.display_game()
 
-        self.selected_cards_coords = [[0, -1]]
+    # Wykonuje ruch w silniku, a po nim (jeśli tryb jest włączony) automatycznie odkłada bezpieczne
+    # karty na kupki końcowe - ruch i odłożone karty to jeden wpis do cofnięcia i jedna klatka
+    def _apply_move(self, move):
+        moves_before = self.engine.move_count
+        if not self.engine.apply(move, auto_play=self.auto_play):
+            return False
+        if self.journal is not None:
+            self.journal.record_move(move, self.auto_play)
+        self._report_auto_moves(self.engine.move_count - moves_before - 1)
+        return True
+
+    # Zaczyna szukać podpowiedzi dla bieżącego stanu gry (w tle - gra w tym czasie działa normalnie)
+    def request_hint(self):
+        if self.game_over:
+            return
+        if self.confirmed_selection:
+            self.message = "Zakończ ruch."
+            self.display_game()
+            return
+        if self.hints is None:
+            from hints import HintEngine
+            self.hints = HintEngine(self._on_hint_ready, self.hint_budget_ms)
+        self._hint_state = self.hints.start(self.engine)
+        self.message = "Szukam podpowiedzi..."
         self.display_game()
 
-    # Główna funkcja odświeżająca i rysująca całe UI gry
-    def display_game(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        self.display_reserve_and_final_stacks()
-        print()
-        self.display_tableau()
-        
-        status_line = Text()
-        status_line.append(f"Ruchy: {self.move_count}\n", style="bold")
-        
-        self.rich_console.print(status_line)
+    # Wywoływane w wątku podpowiedzi: przekazuje gotową podpowiedź do pętli zdarzeń
+    def _on_hint_ready(self, hint):
+        self._hint = hint
+        events = self._events
+        if events is not None:
+            events.put(self.HINT_READY)
+
+    # Wyświetla gotową podpowiedź, jeśli dotyczy bieżącego stanu gry
+    def _show_hint(self):
+        hint = self._hint
+        if hint is None or hint.state_key != self._hint_state:
+            return
+        self._hint_state = None
+        from hints import describe_hint
+        self.message = describe_hint(hint)
+        self.display_game()
+
+    # Jeśli podczas szukania podpowiedzi stan gry się zmienił, zaczyna szukać od nowa dla nowego stanu
+    def _refresh_hint(self):
+        if self._hint_state is None:
+            return
+        from solver import zobrist_hash
+        if zobrist_hash(self.engine) != self._hint_state:
+            self._hint_state = self.hints.start(self.engine)
 
+    # Włącza/wyłącza odczyt szans wygranej, szacowanych w tle dla każdej kolejnej pozycji
+    def toggle_odds(self):
         if self.game_over:
-            self.rich_console.print(Panel(Text(self.message, justify="center"), title="[bold green]Koniec Gry![/bold green]", border_style="green", padding=(1,2)))
-            self.rich_console.print("[bold yellow]Wciśnij Spację aby wyjść.[/bold yellow]")
-        elif self.message:
-            panel_style = "blue"
-            if "Nie można" in self.message or "Błąd" in self.message:
-                panel_style = "bold red"
-            elif "udało się" in self.message.lower() or "przeniesiono" in self.message.lower() or "Karta na" in self.message or "Final -> Final" in self.message :
-                panel_style = "bold green"
-            self.rich_console.print(Panel(Text(self.message, justify="center"), border_style=panel_style ))
-        elif self.confirmed_selection:
-            self.rich_console.print(Text.assemble(
-                ("Użyj ", "bold"),
-                ("Strzałek", "bold magenta"),
-                (", ", "bold"),
-                ("Enter", "bold green"),
-                (" aby umieścić, ", "bold"),
-                ("Esc", "bold yellow"),
-                (" aby anulować.", "bold")
-            ))
+            return
+        if self._odds_key is not None:
+            self._odds_key = None
+            self.odds.cancel()
+            self.message = "Szanse wygranej: wyłączone."
         else:
-            self.rich_console.print(Text.assemble(
-                ("Użyj ", "bold"),
-                ("Strzałek", "bold magenta"),
-                (" do nawigacji. ", "bold"),
-                ("Enter", "bold green"),
-                (" aby podnieść.", "bold")
-            ))
-            self.rich_console.print(Text.assemble(
-                ("\nNaciśnij: ", "bold"),
-                ("'s'", "bold blue"), (" - Dobierz, ", "bold"),
-                ("'c'", "bold yellow"), (" - Cofnij ", "bold"),
-                ("(", "dim"), (f"{self.undo_actions_available}", "dim yellow" if self.undo_actions_available > 0 else "dim"), (")", "dim"),
-                (", ", "bold"),
-                ("Spacja", "bold red"), (" - Zakończ grę.", "bold")
-            ))
+            if self.odds is None:
+                from odds import OddsEngine
+                self.odds = OddsEngine(self._on_odds_update, self.odds_workers)
+            self._odds_key = self.odds.start(self.engine)
+        self.display_game()
+
+    # Wywoływane w wątku szacowania: przekazuje wynik (częściowy lub końcowy) do pętli zdarzeń
+    def _on_odds_update(self, estimate):
+        self._odds = estimate
+        events = self._events
+        if events is not None:
+            events.put(self.ODDS_READY)
+
+    # Rysuje klatkę z nowym wynikiem szacowania, jeśli dotyczy bieżącej pozycji
+    def _show_odds(self):
+        if self._odds is not None and self._odds.key == self._odds_key:
+            self.display_game()
+
+    # Jeśli pozycja się zmieniła (z punktu widzenia gracza), zaczyna szacować szanse od nowa
+    def _refresh_odds(self):
+        if self._odds_key is None:
+            return
+        from odds import information_key
+        if information_key(self.engine) != self._odds_key:
+            self._odds_key = self.odds.start(self.engine)
+
+    # Opis szans wygranej do paska stanu: szansa (wśród losowań rozstrzygniętych przez solver)
+    # z przedziałem ufności, odsetek losowań nierozstrzygniętych i najlepszy ruch
+    def _odds_text(self):
+        odds = self._odds
+        if odds is None or odds.key != self._odds_key or odds.position.rate is None:
+            return "Szanse wygranej: liczę..."
+        position = odds.position
+        text = (f"Szanse wygranej: {position.rate:.0%} ({position.low:.0%}-{position.high:.0%}, "
+                f"losowań: {position.samples}, nierozstrzygniętych: {position.unknown / position.samples:.0%}"
+                f"{'' if odds.final else '...'})")
+        if odds.moves and odds.moves[0].wins:
+            from replay import describe_move
+            best = odds.moves[0]
+            text += f"   najlepszy ruch: {describe_move(best.move)} ({best.rate:.0%})"
+        return text
+
+    # Włącza/wyłącza automatyczne odkładanie kart (po włączeniu od razu odkłada bezpieczne karty)
+    def toggle_auto_play(self):
+        if self.game_over:
+            return
+        if self.confirmed_selection:
+            self.message = "Zakończ ruch."
+            self.display_game()
+            return
+
+        self.auto_play = not self.auto_play
+        if self.journal is not None:
+            self.journal.record_auto_play(self.auto_play)
+        self.message = f"Automatyczne odkładanie kart: {'włączone' if self.auto_play else 'wyłączone'}."
+        if self.auto_play:
+            self._report_auto_moves(len(self.engine.auto_play()))
+            if self._check_win_condition():
+                return
+        self.display_game()
+
+    # Informuje o automatycznie odłożonych kartach i poprawia kursor, jeśli wskazywał zdjęte karty
+    def _report_auto_moves(self, count):
+        if not count:
+            return
+        self.message = f"Automatycznie przeniesiono na kupki końcowe kart: {count}."
+        selection = self.selection
+        if selection.zone == TABLEAU:
+            if selection.start_row + selection.length > len(self.engine.tableau[selection.column]):
+                self.selection = _last_card_selection(self.engine.tableau, selection.column)
+
+    # Główna funkcja odświeżająca i rysująca całe UI gry (klatka trafia na ekran przez TerminalRenderer).
+    # W pętli zdarzeń (_run_event_loop) tylko zaznacza, że klatkę trzeba narysować - pętla rysuje ją
+    # raz po obsłużeniu wszystkich oczekujących klawiszy; force=True rysuje klatkę od razu.
+    def display_game(self, force=False):
+        if self._frames_deferred and not force:
+            self._frame_pending = True
+            return
+        self._frame_pending = False
+        from rich.panel import Panel
+        from rich.text import Text
+        with self.renderer.frame(self.rich_console):
+            self.display_reserve_and_final_stacks()
+            print()
+            self.display_tableau()
+        
+            status_line = Text()
+            status_line.append(f"Ruchy: {self.engine.move_count}", style="bold")
+            if self.engine.deal_number is not None:
+                status_line.append(f"   Rozdanie nr {self.engine.deal_number}", style="dim")
+            status_line.append(f"   ID: {encode_deal(self.engine.deck_source_data)}", style="dim")
+            if self._odds_key is not None:
+                status_line.append(f"\n{self._odds_text()}", style="bold cyan")
+            status_line.append("\n")
+        
+            self.rich_console.print(status_line)
+
+            if self.replay_player is not None:
+                player = self.replay_player
+                self.rich_console.print(Panel(Text(f"Powtórka: ruch {player.position} z {len(player)}", justify="center"), border_style="blue"))
+                self.rich_console.print(Text.assemble(
+                    ("Strzałki ", "bold magenta"), ("←/→", "bold"), (" - ruch wstecz/dalej, ", "bold"),
+                    ("↑/↓", "bold"), (f" - o {self.REPLAY_PAGE} ruchów, ", "bold"),
+                    ("Home/End", "bold yellow"), (" - początek/koniec, ", "bold"),
+                    ("Spacja", "bold red"), (" - wyjście.", "bold")
+                ))
+            elif self.game_over:
+                self.rich_console.print(Panel(Text(self.message, justify="center"), title="[bold green]Koniec Gry![/bold green]", border_style="green", padding=(1,2)))
+                self.rich_console.print("[bold yellow]Wciśnij Spację aby wyjść.[/bold yellow]")
+            elif self.message:
+                panel_style = "blue"
+                if "Nie można" in self.message or "Błąd" in self.message:
+                    panel_style = "bold red"
+                elif "udało się" in self.message.lower() or "przeniesiono" in self.message.lower() or "Karta na" in self.message or "Final -> Final" in self.message :
+                    panel_style = "bold green"
+                self.rich_console.print(Panel(Text(self.message, justify="center"), border_style=panel_style ))
+            elif self.confirmed_selection:
+                self.rich_console.print(Text.assemble(
+                    ("Użyj ", "bold"),
+                    ("Strzałek", "bold magenta"),
+                    (", ", "bold"),
+                    ("Enter", "bold green"),
+                    (" aby umieścić, ", "bold"),
+                    ("Esc", "bold yellow"),
+                    (" aby anulować.", "bold")
+                ))
+            else:
+                self.rich_console.print(Text.assemble(
+                    ("Użyj ", "bold"),
+                    ("Strzałek", "bold magenta"),
+                    (" do nawigacji. ", "bold"),
+                    ("Enter", "bold green"),
+                    (" aby podnieść.", "bold")
+                ))
+                self.rich_console.print(Text.assemble(
+                    ("\nNaciśnij: ", "bold"),
+                    ("'s'", "bold blue"), (" - Dobierz, ", "bold"),
+                    ("'c'", "bold yellow"), (" - Cofnij ", "bold"),
+                    ("(", "dim"), (f"{self.engine.undo_actions_available}", "dim yellow" if self.engine.undo_actions_available > 0 else "dim"), (")", "dim"),
+                    (", ", "bold"),
+                    ("'p'", "bold yellow"), (" - Ponów ", "bold"),
+                    ("(", "dim"), (f"{self.engine.redo_actions_available}", "dim yellow" if self.engine.redo_actions_available > 0 else "dim"), (")", "dim"),
+                    (", ", "bold"),
+                    ("'a'", "bold yellow"), (" - Auto ", "bold"),
+                    ("(", "dim"), ("wł." if self.auto_play else "wył.", "dim yellow" if self.auto_play else "dim"), (")", "dim"),
+                    (", ", "bold"),
+                    ("'h'", "bold yellow"), (" - Podpowiedź", "bold"),
+                    (", ", "bold"),
+                    ("'w'", "bold yellow"), (" - Szanse", "bold"),
+                    (", ", "bold"),
+                    ("Spacja", "bold red"), (" - Zakończ grę.", "bold")
+                ))
         self.message = ""
 
     # Anuluje aktualnie podniesioną kartę (wciśnięcie Esc)
     def cancel_selection(self):
         if self.game_over:
             return
-        if self.confirmed_selection:
-            if self.game_state_history: # Usuń stan zapisany przy podniesieniu, bo ruch nie został dokonany
-                self.game_state_history.pop()
-                self.undo_actions_available = len(self.game_state_history)
-
-            orig_c, orig_r_type = self.original_selected_coords[0]
-            sel_c, sel_r = self.selected_cards_coords[0]
-            src_tab = (orig_r_type != -1)
-            src_res = (orig_r_type == -1 and orig_c == 0)
-            src_fin = (orig_r_type == -1 and 1 <= orig_c <= 4)
-            cur_fin = (sel_r == -1 and 1 <= sel_c <= 4)
-            cur_tab = (sel_r != -1)
-            
-            if src_tab and cur_fin: # Z tableau na final -> karta wraca na tableau
-                fin_idx_target = sel_c - 1
-                if 0 <= fin_idx_target < len(self.final_stacks) and self.final_stacks[fin_idx_target]:
-                    card_to_return = self.final_stacks[fin_idx_target].pop()
-                    orig_tab_col, orig_tab_row = self.original_selected_coords[0]
-                    self.tableau[orig_tab_col].insert(min(orig_tab_row, len(self.tableau[orig_tab_col])), card_to_return)
-            
-            elif src_res and cur_tab: # Z rezerwy na tableau -> karta wraca do rezerwy
-                tab_col_where_card_is, tab_row_where_card_is = sel_c, sel_r
-                if 0 <= tab_col_where_card_is < len(self.tableau) and \
-                   0 <= tab_row_where_card_is < len(self.tableau[tab_col_where_card_is]) and \
-                   self.tableau[tab_col_where_card_is][tab_row_where_card_is]:
-                    
-                    card_to_return = self.tableau[tab_col_where_card_is].pop(tab_row_where_card_is)
-                    self.current_reserve_card_obj = card_to_return
-                    if self.difficulty == 'trudny':
-                        is_card_in_visible = any(self.visible_draw3_cards[i] is card_to_return for i in range(3))
-                        if not is_card_in_visible:
-                            for i in range(2, -1, -1):
-                                if self.visible_draw3_cards[i] is None:
-                                    self.visible_draw3_cards[i] = card_to_return
-                                    is_card_in_visible = True; break
-                            if not is_card_in_visible: self.visible_draw3_cards[2] = card_to_return
-                        self._refill_draw3_window()
-            
-            elif src_fin and cur_tab: # Z final na tableau -> karta wraca na final
-                tab_col_where_card_is, tab_row_where_card_is = sel_c, sel_r
-                if 0 <= tab_col_where_card_is < len(self.tableau) and \
-                   0 <= tab_row_where_card_is < len(self.tableau[tab_col_where_card_is]) and \
-                   self.tableau[tab_col_where_card_is][tab_row_where_card_is]:
-                    card_to_return = self.tableau[tab_col_where_card_is].pop(tab_row_where_card_is)
-                    self.final_stacks[orig_c-1].append(card_to_return)
-            
-            elif src_tab and cur_tab and self.selected_cards_coords != self.original_selected_coords: # Z tableau na inne tableau
-                self._undo_failed_tableau_move() # Przywróć karty na oryginalne miejsce w tableau
-            
-            elif self.moving_final_card_obj and src_fin: # Karta była na Final, została podniesiona (w moving_final_card_obj)
-                if cur_fin and self.final_stacks[sel_c-1] and self.final_stacks[sel_c-1][-1] == self.moving_final_card_obj: # Jeśli jest na innej kupce final
-                    self.final_stacks[sel_c-1].pop() # Usuń ją stamtąd
-                elif sel_r == -1 and sel_c == 0: # Jeśli jest nad rezerwą
-                    pass # Nic nie rób, current_reserve_card_obj powinien być None
-                self.final_stacks[orig_c-1].append(self.moving_final_card_obj) # Przywróć na oryginalną kupkę final
-
-            if self.original_selected_coords:
-                self.selected_cards_coords = [c[:] for c in self.original_selected_coords]
+        if self.confirmed_selection: # Karty nie zostały jeszcze przeniesione, wystarczy przywrócić kursor
+            self.selection = self.original_selection
             self.confirmed_selection = False
-            self.original_selected_coords = []
-            self.moving_final_card_obj = None
+            self.original_selection = None
             self.message = "Anulowano."
         
         self.display_game()
@@ -1406,64 +1023,270 @@ class Game:
             self.display_game()
             return
             
-        if self.game_state_history:
-            last_state = self.game_state_history.pop()
-            self._restore_state_from_undo(last_state)
-            self.undo_actions_available = len(self.game_state_history)
+        if self.engine.undo():
+            if self.journal is not None:
+                self.journal.record_undo()
+            self._reset_selection()
+            self.message = "Ruch cofnięty."
         else:
             self.message = "Brak ruchów do cofnięcia."
 
         self.display_game()
 
+    # Ponawia ostatnio cofnięty ruch
+    def redo_last_move(self):
+        if self.game_over:
+            return
+        
+        if self.confirmed_selection:
+            self.message = "Zakończ lub anuluj (esc) obecny ruch przed ponowieniem."
+            self.display_game()
+            return
+
+        if self.engine.redo():
+            if self.journal is not None:
+                self.journal.record_redo()
+            self._reset_selection()
+            self.message = "Ruch ponowiony."
+            if self._check_win_condition():
+                return
+        else:
+            self.message = "Brak ruchów do ponowienia."
+
+        self.display_game()
+
     # Główna pętla gry i obsługa klawiatury
     def run(self):
         self._display_main_menu()
 
-        if self.difficulty is None:
+        # Wznawiana gra ma poziom trudności zapisany w dzienniku - ustawia go dopiero _resume_game()
+        if self.resume_requested:
+            self._resume_game()
+        elif self.difficulty is None:
             return
-        
-        self._initialize_game_state()
+        else:
+            self._initialize_game_state(self.requested_deal)
+            self._start_journal()
         self.display_game()
-        kb_events = []
-
-        def on_right(e):
-            self.move_selection_horizontal(True)
-        def on_left(e):
-            self.move_selection_horizontal(False)
-        def on_up(e):
-            self.extend_selection(True)
-        def on_down(e):
-            self.extend_selection(False)
-        def on_enter(e):
-            self.confirm_selection()
-        def on_s(e):
-            self.reveal_reserve_card()
-        def on_esc(e):
-            self.cancel_selection()
-        def on_c(e):
-            self.undo_last_move()
-        
-        kb_events.append(keyboard.on_press_key("right", on_right, suppress=True))
-        kb_events.append(keyboard.on_press_key("left", on_left, suppress=True))
-        kb_events.append(keyboard.on_press_key("up", on_up, suppress=True))
-        kb_events.append(keyboard.on_press_key("down", on_down, suppress=True))
-        kb_events.append(keyboard.on_press_key("enter", on_enter, suppress=True))
-        kb_events.append(keyboard.on_press_key("s", on_s, suppress=True))
-        kb_events.append(keyboard.on_press_key("esc", on_esc, suppress=True))
-        kb_events.append(keyboard.on_press_key("c", on_c, suppress=True))
-        
+
+        handlers = {
+            "right": lambda: self.move_selection_horizontal(True),
+            "left": lambda: self.move_selection_horizontal(False),
+            "up": lambda: self.extend_selection(True),
+            "down": lambda: self.extend_selection(False),
+            "enter": self.confirm_selection,
+            "s": self.reveal_reserve_card,
+            "esc": self.cancel_selection,
+            "c": self.undo_last_move,
+            "p": self.redo_last_move,
+            "a": self.toggle_auto_play,
+            "h": self.request_hint,
+            self.HINT_READY: self._show_hint,
+            "w": self.toggle_odds,
+            self.ODDS_READY: self._show_odds,
+        }
         try:
-            keyboard.wait('space')
-        except Exception as e:
-            print(f"Błąd: {e}")
+            self._run_event_loop(handlers)
         finally:
-            for hook in kb_events:
-                keyboard.unhook(hook)
+            if self.journal is not None:
+                self.journal.close()
+        self._save_replay()
+        self._write_metrics()
 
         if not self.game_over:
             self.rich_console.print("\n[bold blue]Do zobaczenia![/bold blue]")
 
+    # Zapisuje powtórkę zakończonej gry w katalogu REPLAY_DIR (błąd zapisu nie przerywa programu)
+    # i usuwa najstarsze powtórki ponad REPLAY_KEEP. Gra bez ruchów - także wznowiona i od razu
+    # przerwana, której powtórka już istnieje - nie jest zapisywana.
+    def _save_replay(self):
+        if not self.engine.undo_journal or self.engine.move_count == self._start_move_count:
+            return
+        from replay import Replay
+        replay = Replay.from_engine(self.engine)
+        path = os.path.join(self.REPLAY_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.replay")
+        try:
+            os.makedirs(self.REPLAY_DIR, exist_ok=True)
+            replay.save(path)
+            self._prune_replays()
+        except OSError:
+            return
+        self.rich_console.print(f"[dim]Powtórka gry zapisana w pliku {path}[/dim]")
+
+    # Usuwa najstarsze powtórki, zostawiając REPLAY_KEEP najnowszych (nazwy plików to data i godzina,
+    # więc kolejność nazw jest kolejnością zapisu)
+    def _prune_replays(self):
+        names = sorted(name for name in os.listdir(self.REPLAY_DIR) if name.endswith(".replay"))
+        for name in names[:-self.REPLAY_KEEP]:
+            os.remove(os.path.join(self.REPLAY_DIR, name))
+
+    # Przewija powtórkę do podanego ruchu i rysuje planszę
+    def _seek_replay(self, step):
+        self.engine = self.replay_player.seek(step)
+        self.display_game()
+
+    # Tryb powtórki: odtwarza zapisaną grę w interfejsie gry, od ruchu start
+    def run_replay(self, path, start=0):
+        from replay import Replay, ReplayPlayer
+        try:
+            player = ReplayPlayer(Replay.load(path))
+            player.seek(start)
+        except (OSError, ValueError) as e:
+            print(f"Nie udało się wczytać powtórki: {e}")
+            return
+        self.replay_player = player
+        self.difficulty = player.engine.difficulty
+        self.selection = None # Bez kursora - w powtórce nie ma wyboru kart
+        self._seek_replay(player.position)
+
+        self._run_event_loop({
+            "right": lambda: self._seek_replay(player.position + 1),
+            "left": lambda: self._seek_replay(player.position - 1),
+            "up": lambda: self._seek_replay(player.position + self.REPLAY_PAGE),
+            "down": lambda: self._seek_replay(player.position - self.REPLAY_PAGE),
+            "home": lambda: self._seek_replay(0),
+            "end": lambda: self._seek_replay(len(player)),
+        })
+        self._write_metrics()
+
+    # Pętla zdarzeń: klawisze z wybranego źródła (input_backend) trafiają do kolejki, a wszystkie
+    # akcje gry są wykonywane w tym jednym wątku, po kolei. Klawisze, które nadeszły podczas
+    # obsługi poprzednich (np. przytrzymana strzałka), są obsługiwane razem i kończą się jedną
+    # klatką, a klatki są rysowane najwyżej co FRAME_INTERVAL sekund. Spacja kończy pętlę.
+    def _run_event_loop(self, handlers, source=None):
+        if source is None:
+            from inputs import INPUT_BACKENDS
+            source = INPUT_BACKENDS[self.input_backend]([key for key in handlers if key not in self.EVENTS] + ["space"])
+        self._events = source.queue
+        last_frame = 0.0
+        last_key = None # Ostatnio obsłużony klawisz - w pomiarach to jemu przypisywany jest czas rysowania klatki
+        self._frames_deferred = True
+        try:
+            with source:
+                running = True
+                while running:
+                    timeout = None
+                    if self._frame_pending: # Czeka najwyżej do chwili, w której można narysować klatkę
+                        timeout = max(0.0, last_frame + self.FRAME_INTERVAL - time.monotonic())
+                    for key, count in source.queue.get_batch(timeout):
+                        if key == "space":
+                            running = False
+                            break
+                        handler = handlers.get(key)
+                        if handler is None:
+                            continue
+                        last_key = key
+                        for _ in range(count):
+                            if self.metrics is None:
+                                handler()
+                            else:
+                                self._measure_handler(key, handler)
+                    self._refresh_hint()
+                    self._refresh_odds()
+                    if self._frame_pending and (not running or time.monotonic() - last_frame >= self.FRAME_INTERVAL):
+                        if self.metrics is None:
+                            self.display_game(force=True)
+                        else:
+                            self._measure_frame(last_key)
+                        last_frame = time.monotonic()
+        except Exception as e:
+            print(f"Błąd: {e}")
+        finally:
+            self._frames_deferred = False
+            self._events = None
+            self._hint_state = None
+            if self.hints is not None:
+                self.hints.cancel()
+            self._odds_key = None
+            if self.odds is not None:
+                self.odds.close()
+
+    # Wykonuje akcję klawisza, mierząc jej czas i liczbę nowych wpisów w dzienniku cofania
+    def _measure_handler(self, key, handler):
+        undo_before = len(self.engine.undo_journal)
+        start = time.perf_counter()
+        handler()
+        elapsed = time.perf_counter() - start
+        self.metrics.record_update(key, elapsed, len(self.engine.undo_journal) - undo_before)
+
+    # Rysuje klatkę, mierząc czas rysowania i liczbę bajtów wysłanych do terminala
+    def _measure_frame(self, key):
+        start = time.perf_counter()
+        self.display_game(force=True)
+        self.metrics.record_render(key, time.perf_counter() - start, self.renderer.bytes_written)
+
+    # Zapisuje pomiary do pliku i wypisuje ich zestawienie (jeśli pomiary są włączone)
+    def _write_metrics(self):
+        if self.metrics is None or not self.metrics.updates:
+            return
+        for line in self.metrics.summary_lines():
+            print(line)
+        if self.metrics.write():
+            print(f"Pomiary zapisane w pliku {self.metrics.path}")
+
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    from inputs import INPUT_BACKENDS # Lekki moduł bez zależności - potrzebny już do opisu opcji
+    parser = argparse.ArgumentParser(description="Pasjans w konsoli")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="zamiast gry przeanalizuj solverem N kolejnych rozdań i wypisz statystyki")
+    parser.add_argument("--difficulty", choices=["łatwy", "trudny"], default="łatwy",
+                        help="poziom trudności rozdań w symulacji")
+    parser.add_argument("--workers", type=int, metavar="K",
+                        help="liczba procesów symulacji i szacowania szans wygranej (domyślnie liczba rdzeni)")
+    parser.add_argument("--seed", type=int, default=0, help="numer pierwszego rozdania w symulacji")
+    parser.add_argument("--nodes", type=int, default=20000,
+                        help="limit węzłów przeszukiwania solvera na jedno rozdanie")
+    parser.add_argument("--db", default="solved_deals", metavar="BAZA",
+                        help="baza przeanalizowanych rozdań używana przez symulację i tworzenie puli (pliki BAZA.idx i BAZA.log)")
+    parser.add_argument("--no-db", action="store_true",
+                        help="analizuj w symulacji wszystkie rozdania od nowa, bez bazy rozdań")
+    parser.add_argument("--build-pool", type=int, metavar="N",
+                        help="zamiast gry przeanalizuj N kolejnych rozdań na każdym poziomie i zapisz "
+                             f"wygrywalne w puli rozdań ({Game.DEAL_POOL_FILE}) z podziałem na stopnie trudności")
+    parser.add_argument("--replay", metavar="PLIK", help="odtwórz powtórkę gry zapisaną w pliku")
+    parser.add_argument("--seek", type=int, default=0, metavar="K", help="rozpocznij powtórkę od ruchu K")
+    parser.add_argument("--headless", action="store_true",
+                        help="wypisz ruchy powtórki w konsoli zamiast odtwarzać ją w interfejsie gry")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="wyświetl menu, wypisz czas uruchomienia i zakończ")
+    parser.add_argument("--metrics", metavar="PLIK",
+                        help="mierz czas obsługi klawiszy i rysowania klatek, wyniki zapisz w pliku JSON "
+                             f"(to samo włącza zmienna środowiskowa {Game.METRICS_ENV})")
+    parser.add_argument("--hint-ms", type=int, default=Game.HINT_BUDGET_MS, metavar="MS",
+                        help="czas szukania podpowiedzi (klawisz 'h') w milisekundach")
+    parser.add_argument("--input", choices=sorted(INPUT_BACKENDS), default="keyboard",
+                        help="źródło klawiszy: keyboard (globalne przechwytywanie klawiatury) lub stdin "
+                             "(terminal, bez uprawnień administratora)")
+    args = parser.parse_args()
+
+    if args.simulate is not None:
+        from simulate import run_simulation
+        run_simulation(args.simulate, args.difficulty, args.workers, args.seed, args.nodes,
+                       None if args.no_db else args.db)
+    elif args.build_pool is not None:
+        from dealpool import run_build_pool
+        try:
+            run_build_pool(Game.DEAL_POOL_FILE, args.build_pool, args.workers, args.seed, args.nodes,
+                           None if args.no_db else args.db)
+        except ValueError as e:
+            print(f"Nie udało się utworzyć puli rozdań: {e}")
+    elif args.replay is not None and args.headless:
+        from replay import run_headless
+        try:
+            run_headless(args.replay, args.seek)
+        except (OSError, ValueError) as e:
+            print(f"Nie udało się wczytać powtórki: {e}")
+    else:
+        game = Game()
+        game.input_backend = args.input
+        game.startup_report = args.startup_time
+        game.hint_budget_ms = args.hint_ms
+        game.odds_workers = args.workers
+        if args.metrics:
+            from metrics import Metrics
+            game.metrics = Metrics(args.metrics)
+        if args.replay is not None:
+            game.run_replay(args.replay, args.seek)
+        else:
+            game.run()
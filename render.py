@@ -0,0 +1,166 @@
+import io
+import re
+import shutil
+import sys
+import unicodedata
+from contextlib import contextmanager, redirect_stdout
+
+# Sekwencje ANSI używane przez renderer
+_SGR = re.compile(r"\x1b\[[0-9;]*m")
+_RESET = "\x1b[0m"
+_CLEAR_SCREEN = "\x1b[H\x1b[2J"
+_CLEAR_LINE_END = "\x1b[K"
+_CLEAR_BELOW = "\x1b[J"
+
+# Przerwa (w komórkach) między zmienionymi fragmentami wiersza, poniżej której fragmenty są
+# wysyłane razem - przepisanie kilku niezmienionych znaków jest tańsze niż nowe pozycjonowanie kursora
+_MERGE_GAP = 4
+
+def _move_to(row, col):
+    return f"\x1b[{row + 1};{col + 1}H"
+
+# Dzieli wiersz z kodami kolorów na komórki (aktywne kody kolorów, znak). Zwraca None dla wierszy
+# ze znakami o szerokości innej niż jedna kolumna - takie wiersze są przepisywane w całości.
+def _parse_cells(line):
+    cells = []
+    style = ""
+    pos = 0
+    for match in _SGR.finditer(line):
+        for char in line[pos:match.start()]:
+            if unicodedata.east_asian_width(char) in "WF" or unicodedata.combining(char):
+                return None
+            cells.append((style, char))
+        code = match.group()
+        style = "" if code in (_RESET, "\x1b[m") else style + code
+        pos = match.end()
+    for char in line[pos:]:
+        if unicodedata.east_asian_width(char) in "WF" or unicodedata.combining(char):
+            return None
+        cells.append((style, char))
+    return cells
+
+# Zapisuje komórki jako tekst, dodając kody kolorów tylko tam, gdzie styl się zmienia
+def _emit_cells(cells):
+    out = []
+    style = ""
+    for cell_style, char in cells:
+        if cell_style != style:
+            out.append(_RESET + cell_style)
+            style = cell_style
+        out.append(char)
+    if style:
+        out.append(_RESET)
+    return "".join(out)
+
+# Renderer terminala z buforem klatki: klatka jest najpierw rysowana do pamięci, porównywana
+# z poprzednią, a do terminala trafiają tylko zmienione komórki (z pozycjonowaniem kursora),
+# w jednym zapisie.
+class TerminalRenderer:
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.bytes_written = 0
+        self._previous = None # Wiersze poprzedniej klatki jako pary (tekst, komórki) albo None - pełne przerysowanie
+        self._terminal_size = None
+
+    # Wymusza pełne przerysowanie przy następnej klatce (np. po wypisaniu czegoś poza rendererem)
+    def invalidate(self):
+        self._previous = None
+
+    # Przechwytuje wszystko, co zostanie wypisane przez print() i podaną konsolę rich
+    # wewnątrz bloku with, i wysyła na ekran jako jedną klatkę
+    @contextmanager
+    def frame(self, rich_console=None):
+        buffer = io.StringIO()
+        original_file = None
+        if rich_console is not None:
+            original_file = rich_console.file
+            rich_console.file = buffer
+        try:
+            with redirect_stdout(buffer):
+                yield buffer
+        finally:
+            if rich_console is not None:
+                rich_console.file = original_file
+        self.draw(buffer.getvalue())
+
+    # Wyświetla klatkę (tekst z kodami kolorów ANSI), wysyłając tylko różnice względem poprzedniej
+    def draw(self, text):
+        lines = text.split("\n")
+        if lines and lines[-1] == "":
+            lines.pop()
+
+        size = shutil.get_terminal_size()
+        if size != self._terminal_size:
+            self._terminal_size = size
+            self._previous = None
+
+        previous = self._previous
+        out = []
+        # Klatka wyższa niż terminal przewija ekran, więc wiersze nie trafiają już pod swoje numery
+        # i różnice nie mogą być nanoszone pozycjonowaniem kursora
+        scrolls = len(lines) >= size.lines
+        if previous is None or scrolls or any(self._visible_width(line) > size.columns for line in lines):
+            # Pełne przerysowanie (pierwsza klatka, zmiana rozmiaru terminala, klatka wyższa
+            # niż terminal lub zawijane wiersze)
+            out.append(_CLEAR_SCREEN)
+            out.append("\n".join(line + _RESET for line in lines))
+            current = None if scrolls else [(line, None) for line in lines]
+        else:
+            current = []
+            for row, line in enumerate(lines):
+                old_line, old_cells = previous[row] if row < len(previous) else ("", [])
+                if line == old_line:
+                    current.append((line, old_cells))
+                    continue
+                if old_cells is None:
+                    old_cells = _parse_cells(old_line)
+                cells = _parse_cells(line)
+                if cells is None or old_cells is None:
+                    out.append(_move_to(row, 0) + line + _RESET + _CLEAR_LINE_END)
+                else:
+                    out.append(self._diff_line(row, old_cells, cells))
+                current.append((line, cells))
+            if len(previous) > len(lines):
+                out.append(_move_to(len(lines), 0) + _CLEAR_BELOW)
+        # Kursor pod klatką (przy przewiniętym ekranie - w nowym wierszu pod ostatnim wierszem klatki)
+        out.append("\n" if scrolls else _move_to(len(lines), 0))
+
+        data = "".join(out)
+        self.stream.write(data)
+        self.stream.flush()
+        self.bytes_written = len(data.encode("utf-8", "replace"))
+        self._previous = current
+
+    # Zwraca sekwencję aktualizującą jeden wiersz: tylko zmienione fragmenty i wyczyszczenie końcówki
+    @staticmethod
+    def _diff_line(row, old_cells, new_cells):
+        if old_cells == new_cells:
+            return ""
+        out = []
+        common = min(len(old_cells), len(new_cells))
+        col = 0
+        while col < common:
+            if old_cells[col] == new_cells[col]:
+                col += 1
+                continue
+            start = col
+            end = col + 1
+            gap = 0
+            col += 1
+            while col < common and gap < _MERGE_GAP:
+                if old_cells[col] == new_cells[col]:
+                    gap += 1
+                else:
+                    gap = 0
+                    end = col + 1
+                col += 1
+            out.append(_move_to(row, start) + _emit_cells(new_cells[start:end]))
+        if len(new_cells) > common:
+            out.append(_move_to(row, common) + _emit_cells(new_cells[common:]))
+        elif len(old_cells) > common:
+            out.append(_move_to(row, common) + _CLEAR_LINE_END)
+        return "".join(out)
+
+    @staticmethod
+    def _visible_width(line):
+        return len(_SGR.sub("", line))
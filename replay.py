@@ -0,0 +1,158 @@
+import os
+import struct
+from bisect import bisect_right
+
+from engine import BatchEntry, STOCK, RESERVE, FINAL, TABLEAU
+from journal import pack_move, unpack_move, pack_deal, unpack_deal
+
+# Plik powtórki: znacznik _MAGIC, opis rozdania (journal.pack_deal), liczba ruchów i same ruchy
+# (po 2 bajty, journal.pack_move), a na końcu klatki kluczowe - ich liczba, a dla każdej numer
+# ruchu, długość zapisu i pełny stan planszy po tym ruchu (Engine.save_state)
+_MAGIC = b"PSR1"
+_COUNT = struct.Struct("<I")
+_MOVE = struct.Struct("<H")
+_KEYFRAME = struct.Struct("<IH")
+
+# Co ile ruchów zapisywana jest klatka kluczowa - przejście do dowolnego ruchu wymaga wykonania
+# najwyżej tylu ruchów od najbliższej wcześniejszej klatki
+KEYFRAME_INTERVAL = 50
+
+_ZONE_NAMES = {STOCK: "stos", RESERVE: "rezerwa", FINAL: "kupka końcowa", TABLEAU: "kolumna"}
+
+# Zwraca ruchy, które doprowadziły grę do bieżącego stanu (bez ruchów cofniętych), z grupami
+# ruchów (BatchEntry, np. automatyczne odkładanie kart) rozwiniętymi na pojedyncze ruchy
+def game_moves(engine):
+    moves = []
+    for entry in engine.undo_journal:
+        if isinstance(entry, BatchEntry):
+            moves.extend(entry.moves)
+        else:
+            moves.append(entry.move)
+    return moves
+
+# Krótki opis ruchu do wypisania (np. "kolumna 3 -> kupka końcowa 1")
+def describe_move(move):
+    if move.src == STOCK:
+        return "dobranie z rezerwy"
+    src = _ZONE_NAMES[move.src] + ("" if move.src == RESERVE else f" {move.src_idx + 1}")
+    dst = f"{_ZONE_NAMES[move.dst]} {move.dst_idx + 1}"
+    cards = f" (kart: {move.count})" if move.count > 1 else ""
+    return f"{src} -> {dst}{cards}"
+
+# Zapis rozegranej gry: rozdanie, ruchy i klatki kluczowe (stan planszy co KEYFRAME_INTERVAL ruchów)
+class Replay:
+    def __init__(self, deal, moves, keyframes):
+        self.deal = deal # Opis rozdania (journal.pack_deal)
+        self.moves = moves
+        self.keyframe_steps = [step for step, _ in keyframes]
+        self.keyframes = [state for _, state in keyframes]
+
+    # Tworzy powtórkę gry rozegranej w silniku (ruchy cofnięte nie wchodzą do powtórki)
+    @classmethod
+    def from_engine(cls, engine, interval=KEYFRAME_INTERVAL):
+        moves = game_moves(engine)
+        deal = pack_deal(engine)
+        board, _ = unpack_deal(deal)
+        keyframes = []
+        for step, move in enumerate(moves, 1):
+            board._perform(move)
+            if step % interval == 0:
+                keyframes.append((step, board.save_state()))
+        return cls(deal, moves, keyframes)
+
+    # Zapisuje powtórkę do pliku (najpierw pod tymczasową nazwą, więc plik nigdy nie jest urwany)
+    def save(self, path):
+        out = [_MAGIC, self.deal, _COUNT.pack(len(self.moves))]
+        out += [_MOVE.pack(pack_move(move)) for move in self.moves]
+        out.append(_COUNT.pack(len(self.keyframes)))
+        for step, state in zip(self.keyframe_steps, self.keyframes):
+            out += [_KEYFRAME.pack(step, len(state)), state]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(out))
+        os.replace(temp_path, path)
+
+    # Wczytuje powtórkę z pliku; dla uszkodzonego pliku zgłasza ValueError
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("Nieprawidłowy plik powtórki.")
+        try:
+            _, pos = unpack_deal(data, len(_MAGIC))
+            deal = data[len(_MAGIC):pos]
+            count, = _COUNT.unpack_from(data, pos)
+            pos += _COUNT.size
+            moves = [unpack_move(code) for code, in _MOVE.iter_unpack(data[pos:pos + count * _MOVE.size])]
+            pos += count * _MOVE.size
+            keyframe_count, = _COUNT.unpack_from(data, pos)
+            pos += _COUNT.size
+            keyframes = []
+            for _ in range(keyframe_count):
+                step, size = _KEYFRAME.unpack_from(data, pos)
+                pos += _KEYFRAME.size
+                keyframes.append((step, data[pos:pos + size]))
+                pos += size
+        except struct.error:
+            raise ValueError("Nieprawidłowy plik powtórki.")
+        if len(moves) != count or pos != len(data):
+            raise ValueError("Nieprawidłowy plik powtórki.")
+        return cls(deal, moves, keyframes)
+
+# Odtwarzacz powtórki: silnik (engine) w stanie po ruchu o numerze position. Przejście do ruchu k
+# wczytuje najbliższą wcześniejszą klatkę kluczową (wyszukiwanie binarne) i wykonuje tylko ruchy
+# od niej; krótkie kroki w przód i w tył korzystają z bieżącego stanu i dziennika cofania silnika.
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.engine, _ = unpack_deal(replay.deal)
+        self._initial_state = self.engine.save_state()
+        self.position = 0
+
+    def __len__(self):
+        return len(self.replay.moves)
+
+    # Ustawia planszę w stanie po ruchu o podanym numerze (0 - rozdanie); zwraca silnik
+    def seek(self, step):
+        step = max(0, min(step, len(self)))
+        engine = self.engine
+        if step < self.position and self.position - step <= len(engine.undo_journal):
+            for _ in range(self.position - step):
+                engine.undo()
+            engine.redo_moves.clear()
+            engine.move_count = step
+            self.position = step
+            return engine
+
+        idx = bisect_right(self.replay.keyframe_steps, step) - 1
+        keyframe_step = self.replay.keyframe_steps[idx] if idx >= 0 else 0
+        if not keyframe_step <= self.position <= step: # Od bieżącego stanu nie da się dojść do celu szybciej
+            engine.load_state(self.replay.keyframes[idx] if idx >= 0 else self._initial_state)
+            self.position = keyframe_step
+        for move in self.replay.moves[self.position:step]:
+            if not engine.apply(move):
+                raise ValueError("Nieprawidłowy ruch w pliku powtórki.")
+        self.position = step
+        return engine
+
+    # Przesuwa powtórkę o podaną liczbę ruchów (ujemna - wstecz)
+    def step(self, delta=1):
+        return self.seek(self.position + delta)
+
+# Odtwarza powtórkę bez interfejsu: wypisuje kolejne ruchy z liczbą kart na kupkach końcowych
+# (od ruchu start do końca gry albo do ruchu stop)
+def run_headless(path, start=0, stop=None):
+    player = ReplayPlayer(Replay.load(path))
+    engine = player.seek(start)
+    deal = f"nr {engine.deal_number}" if engine.deal_number is not None else "z identyfikatora"
+    print(f"Powtórka: poziom {engine.difficulty}, rozdanie {deal}, ruchów: {len(player)}")
+    stop = len(player) if stop is None else min(stop, len(player))
+    for position in range(player.position, stop):
+        move = player.replay.moves[position]
+        engine = player.step()
+        on_final = sum(map(len, engine.final_stacks))
+        print(f"{position + 1:>5}. {describe_move(move):<40} na kupkach końcowych: {on_final}")
+    if player.position == len(player):
+        print("Gra wygrana." if engine.is_won() else "Gra nieukończona.")
+    return player
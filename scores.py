@@ -0,0 +1,308 @@
+import heapq
+import json
+import os
+from array import array
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+
+# Kolejność poziomów trudności przy równej liczbie ruchów (wynik na trudnym poziomie jest wyżej)
+DIFFICULTY_ORDER = {'trudny': 0, 'łatwy': 1}
+
+# Blokada pliku na czas odczytu (współdzielona) lub zapisu (wyłączna) - chroni przed wyścigami
+# między procesami korzystającymi z tego samego pliku wyników
+@contextmanager
+def locked(file, exclusive):
+    if os.name == 'nt':
+        import msvcrt
+        position = file.tell()
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1) # Windows nie ma blokad współdzielonych
+        try:
+            file.seek(position)
+            yield
+        finally:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+# Liczba ruchów wyniku; wyniki bez liczby ruchów są w rankingu na końcu
+def _score_moves(entry):
+    moves = entry.get('moves')
+    return moves if isinstance(moves, int) else float('inf')
+
+# Magazyn wyników: plik, do którego wyniki są tylko dopisywane (jeden wiersz JSON na wynik),
+# oraz zbudowane z niego w pamięci widoki rankingu. Każdy zapis to jedno dopisanie pod wyłączną
+# blokadą pliku zakończone fsync. Przy odczycie plik jest czytany tylko wtedy, gdy zmienił się
+# jego rozmiar lub czas modyfikacji, i tylko od miejsca, w którym skończył się poprzedni odczyt
+# (nowe wiersze mogą pochodzić także z innych procesów). Wiersz urwany przez awarię jest pomijany.
+#
+# Dla każdego poziomu trudności przechowywane są:
+#   - kopiec top_n najlepszych wyników (ranking wyświetlany w grze),
+#   - posortowana tablica liczb ruchów wszystkich wyników (miejsce i percentyl dowolnego wyniku).
+#
+# Widoki są zapisywane w pliku indeksu (path.idx) po każdym odczycie nowych wierszy, razem
+# z tożsamością pliku wyników (urządzenie, i-węzeł), liczbą wczytanych bajtów, ostatnimi bajtami
+# przed tym miejscem i czasem modyfikacji pliku. Nowy proces wczytuje gotowe widoki z indeksu i doczytuje z pliku wyników
+# tylko dalsze wiersze; indeks jest budowany od nowa tylko wtedy, gdy nie pasuje do pliku wyników.
+class ScoreStore:
+    INSERT_LIMIT = 64 # Największa liczba nowych wyników wstawianych do tablicy ruchów pojedynczo
+    INDEX_VERSION = 1
+    _TAIL = 32 # Liczba końcowych bajtów wczytanej części pliku wyników zapisywanych w indeksie
+
+    def __init__(self, path, legacy_path=None, top_n=5):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.legacy_path = legacy_path # Stary plik wyników (lista JSON) importowany przy pierwszym użyciu
+        self.top_n = top_n
+        self._reset(None)
+
+    def __len__(self):
+        self.refresh()
+        return self._count
+
+    # Zapisuje nowy wynik (słownik z polami moves, timestamp, difficulty)
+    def append(self, entry):
+        self._import_legacy()
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with open(self.path, "ab") as f:
+            with locked(f, exclusive=True):
+                size = os.fstat(f.fileno()).st_size
+                if size:
+                    with open(self.path, "rb") as tail:
+                        tail.seek(size - 1)
+                        if tail.read(1) != b"\n": # Urwany wiersz po awarii - nowy wynik zaczyna się od nowej linii
+                            line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+
+    # Zwraca n (najwyżej top_n) najlepszych wyników - wszystkich albo z jednego poziomu trudności -
+    # w kolejności rankingu: liczba ruchów, poziom trudności, kolejność zapisu
+    def top(self, n=None, difficulty=None):
+        self.refresh()
+        n = self.top_n if n is None else min(n, self.top_n)
+        if difficulty is not None:
+            return self._sorted_top(difficulty)[:n]
+        if self._top_all is None:
+            ranked = []
+            for difficulty, heap in self._heaps.items():
+                order = DIFFICULTY_ORDER.get(difficulty, 1)
+                ranked += [(-item[0], order, -item[1], item[2]) for item in heap]
+            ranked.sort(key=lambda item: item[:3])
+            self._top_all = [item[3] for item in ranked[:self.top_n]]
+        return self._top_all[:n]
+
+    # Miejsce wyniku o podanej liczbie ruchów wśród wyników z danego poziomu trudności
+    # (1 + liczba wyników z mniejszą liczbą ruchów)
+    def rank(self, moves, difficulty):
+        self.refresh()
+        return bisect_left(self._moves.get(difficulty, ()), moves) + 1
+
+    # Liczba zapisanych wyników (wszystkich albo z jednego poziomu trudności)
+    def count(self, difficulty=None):
+        self.refresh()
+        if difficulty is None:
+            return self._count
+        return len(self._moves.get(difficulty, ()))
+
+    # Procent najlepszych wyników z danego poziomu trudności, do których należy wynik o podanej
+    # liczbie ruchów (np. 7.0 oznacza "w najlepszych 7%")
+    def top_percent(self, moves, difficulty):
+        total = self.count(difficulty)
+        if not total:
+            return 100.0
+        return min(self.rank(moves, difficulty), total) / total * 100
+
+    # Dołącza do widoków wyniki dopisane do pliku od ostatniego odczytu. Jeśli rozmiar i czas
+    # modyfikacji pliku się nie zmieniły, kosztuje tylko jedno wywołanie stat.
+    def refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if not self._import_legacy():
+                self._reset(None)
+                return
+            stat = os.stat(self.path)
+        if self._file_state == self._state_of(stat):
+            return
+
+        with open(self.path, "rb") as f:
+            with locked(f, exclusive=False):
+                stat = os.fstat(f.fileno())
+                state = self._state_of(stat)
+                previous = self._file_state
+                # Dopisanie nie zmienia tożsamości pliku (urządzenie, i-węzeł) i nie zmniejsza go; każda
+                # inna zmiana oznacza, że plik podmieniono lub nadpisano - widoki są budowane od nowa
+                if previous is None or previous[:2] != state[:2] or stat.st_size < self._offset or \
+                        (stat.st_size == previous[2] and state != previous):
+                    self._reset(None)
+                    self._load_index(f, stat)
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+        self._file_state = state
+
+        end = data.rfind(b"\n") + 1 # Wiersz bez znaku końca linii jest jeszcze zapisywany - zostaje na później
+        added = {}
+        for raw in data[:end].splitlines():
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                added.setdefault(entry.get('difficulty'), []).append(entry)
+        for difficulty, entries in added.items():
+            self._add(difficulty, entries)
+        if end:
+            self._offset += end
+            self._tail = (self._tail + data[:end])[-self._TAIL:]
+            self._write_index(stat)
+
+    @staticmethod
+    def _state_of(stat):
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _reset(self, file_state):
+        self._heaps = {}      # poziom trudności -> kopiec top_n najlepszych wyników (najsłabszy na wierzchu)
+        self._sorted = {}     # poziom trudności -> uporządkowany ranking z kopca (None po zmianie kopca)
+        self._top_all = None  # ranking wszystkich poziomów łącznie (None po zmianie któregoś kopca)
+        self._moves = {}      # poziom trudności -> posortowana tablica liczb ruchów wszystkich wyników
+        self._count = 0
+        self._offset = 0      # Liczba bajtów pliku już wczytanych do widoków
+        self._tail = b""      # Ostatnie bajty wczytanej części pliku (do sprawdzenia, czy indeks do niego pasuje)
+        self._file_state = file_state
+
+    # Wczytuje widoki z pliku indeksu, jeśli opisuje on początek otwartego pliku wyników (f): ten sam
+    # plik (urządzenie, i-węzeł), nie dłuższy niż obecny, z tymi samymi bajtami przed końcem opisanej
+    # części, a jeśli plik od tamtej pory nie urósł - z tym samym czasem modyfikacji. Nieaktualny
+    # lub uszkodzony indeks jest pomijany (widoki zostaną zbudowane od nowa).
+    def _load_index(self, f, stat):
+        try:
+            with open(self.index_path, "rb") as index:
+                data = index.read()
+            end = data.index(b"\n")
+            header = json.loads(data[:end])
+            if header["version"] != self.INDEX_VERSION or header["top_n"] != self.top_n or \
+                    header["file"] != [stat.st_dev, stat.st_ino] or header["offset"] > stat.st_size or \
+                    (header["offset"] == stat.st_size and header["mtime"] != stat.st_mtime_ns):
+                return
+            tail = bytes.fromhex(header["tail"])
+            f.seek(header["offset"] - len(tail))
+            if f.read(len(tail)) != tail:
+                return
+            heaps = {}
+            moves = {}
+            pos = end + 1
+            for difficulty, heap, length in header["levels"]:
+                heaps[difficulty] = [tuple(item) for item in heap]
+                moves[difficulty] = array("d", data[pos:pos + length * 8])
+                pos += length * 8
+            if pos != len(data):
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self._heaps = heaps
+        self._moves = moves
+        self._count = header["count"]
+        self._offset = header["offset"]
+        self._tail = tail
+
+    # Zapisuje widoki w pliku indeksu (podmienianym atomowo). Indeks to tylko kopia danych z pliku
+    # wyników, więc błąd zapisu jest pomijany - kolejny proces zbuduje widoki z pliku wyników.
+    def _write_index(self, stat):
+        header = {
+            "version": self.INDEX_VERSION,
+            "top_n": self.top_n,
+            "file": [stat.st_dev, stat.st_ino],
+            "offset": self._offset,
+            "mtime": stat.st_mtime_ns,
+            "tail": self._tail.hex(),
+            "count": self._count,
+            "levels": [[difficulty, self._heaps.get(difficulty, []), len(moves)]
+                       for difficulty, moves in self._moves.items()],
+        }
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+                for moves in self._moves.values():
+                    f.write(moves.tobytes())
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    # Dołącza nowe wyniki jednego poziomu trudności do jego kopca i listy liczb ruchów
+    def _add(self, difficulty, entries):
+        heap = self._heaps.setdefault(difficulty, [])
+        changed = False
+        for entry in entries:
+            # Klucz (liczba ruchów, kolejność zapisu) jest zanegowany, więc na wierzchu kopca leży
+            # najsłabszy z zapamiętanych wyników - jedyny, który może zostać wyparty
+            item = (-_score_moves(entry), -self._count, entry)
+            self._count += 1
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, item)
+                changed = True
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+                changed = True
+        if changed:
+            self._sorted[difficulty] = None
+            self._top_all = None
+
+        # Pojedyncze wyniki są wstawiane na swoje miejsce (wyszukiwanie binarne), a większe porcje
+        # (np. przy pierwszym odczycie) dołączane i sortowane razem, w czasie O(n + k log k)
+        moves = self._moves.setdefault(difficulty, array("d"))
+        if len(entries) <= self.INSERT_LIMIT:
+            for entry in entries:
+                insort(moves, _score_moves(entry))
+        else:
+            moves.extend(_score_moves(entry) for entry in entries)
+            self._moves[difficulty] = array("d", sorted(moves))
+
+    def _sorted_top(self, difficulty):
+        ranked = self._sorted.get(difficulty)
+        if ranked is None:
+            heap = self._heaps.get(difficulty, [])
+            ranked = [item[2] for item in sorted(heap, key=lambda item: item[:2], reverse=True)]
+            self._sorted[difficulty] = ranked
+        return ranked
+
+    # Przenosi wyniki ze starego pliku (jedna lista JSON) do nowego magazynu, jeśli jeszcze go nie ma.
+    # Nowy plik powstaje w całości pod tymczasową nazwą i dopiero wtedy pojawia się pod właściwą.
+    # Zwraca informację, czy plik magazynu istnieje.
+    def _import_legacy(self):
+        if os.path.exists(self.path):
+            return True
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return False
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            scores = []
+        if not isinstance(scores, list):
+            scores = []
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            for entry in scores:
+                if isinstance(entry, dict):
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(temp_path, self.path) # Tworzy plik tylko wtedy, gdy inny proces nie zdążył go już utworzyć
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+        return True
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import sys
+from collections import Counter, namedtuple
+
+from dealdb import DealDatabase, DealRecord, deal_key
+from engine import Engine
+from solver import solve
+
+# Wynik analizy jednego rozdania
+DealResult = namedtuple("DealResult", ["deal_number", "solvable", "moves", "foundation", "nodes", "elapsed_ms"])
+
+# Rozdaje grę o podanym numerze i rozwiązuje ją solverem. Z bazą rozdań (database) wynik jest
+# najpierw szukany w bazie; zwraca parę (DealResult, rekord do zapisania w bazie albo None).
+def solve_deal(deal_number, difficulty, max_nodes, database=None):
+    engine = Engine(difficulty)
+    engine.new_deal(deal_number)
+    key = None
+    if database is not None:
+        key = deal_key(engine.deck_source_data, difficulty)
+        record = database.get(key)
+        if record is not None and (record.solvable is not None or record.max_nodes >= max_nodes):
+            return DealResult(deal_number, record.solvable, record.moves, record.foundation,
+                              record.nodes, record.elapsed_ms), None
+    result = solve(engine, max_nodes=max_nodes)
+    deal_result = DealResult(deal_number, result.solvable, len(result.moves), result.foundation,
+                             result.nodes, result.elapsed_ms)
+    if key is None:
+        return deal_result, None
+    return deal_result, (key, DealRecord(result.solvable, len(result.moves), result.foundation,
+                                         result.nodes, result.elapsed_ms, max_nodes))
+
+# Rozdaje grę o podanym numerze i rozwiązuje ją solverem
+def evaluate_deal(deal_number, difficulty='łatwy', max_nodes=20000):
+    return solve_deal(deal_number, difficulty, max_nodes)[0]
+
+# Zbiorcze statystyki serii rozdań. Statystyki z różnych procesów łączy się metodą merge;
+# wynik nie zależy od podziału rozdań między procesy.
+class SimulationStats:
+    MOVES_BUCKET = 10       # Szerokość przedziału histogramu liczby ruchów
+    FOUNDATION_BUCKET = 4   # Szerokość przedziału histogramu kart na kupkach końcowych
+    HISTOGRAM_WIDTH = 40
+
+    def __init__(self):
+        self.deals = 0
+        self.wins = 0
+        self.losses = 0
+        self.unknown = 0
+        self.cached = 0 # Rozdania, których wynik wzięto z bazy rozdań
+        self.win_moves = 0
+        self.nodes = 0
+        self.solve_ms = 0.0
+        self.moves_histogram = Counter()
+        self.foundation_histogram = Counter()
+
+    # Dodaje wynik pojedynczego rozdania
+    def add(self, result):
+        self.deals += 1
+        self.nodes += result.nodes
+        self.solve_ms += result.elapsed_ms
+        if result.solvable:
+            self.wins += 1
+            self.win_moves += result.moves
+            self.moves_histogram[result.moves // self.MOVES_BUCKET * self.MOVES_BUCKET] += 1
+        elif result.solvable is False:
+            self.losses += 1
+        else:
+            self.unknown += 1
+        self.foundation_histogram[result.foundation] += 1
+
+    # Dołącza statystyki innej serii rozdań
+    def merge(self, other):
+        self.deals += other.deals
+        self.wins += other.wins
+        self.losses += other.losses
+        self.unknown += other.unknown
+        self.cached += other.cached
+        self.win_moves += other.win_moves
+        self.nodes += other.nodes
+        self.solve_ms += other.solve_ms
+        self.moves_histogram.update(other.moves_histogram)
+        self.foundation_histogram.update(other.foundation_histogram)
+
+    # Odsetek wygranych wśród rozdań rozstrzygniętych przez solver (nierozstrzygnięte nie są ani
+    # wygranymi, ani przegranymi - ich liczbę podaje summary_line)
+    @property
+    def win_rate(self):
+        decided = self.wins + self.losses
+        return self.wins / decided if decided else 0.0
+
+    @property
+    def average_win_moves(self):
+        return self.win_moves / self.wins if self.wins else 0.0
+
+    # Jednowierszowe podsumowanie wyświetlane w trakcie symulacji
+    def summary_line(self):
+        average_ms = self.solve_ms / self.deals if self.deals else 0.0
+        line = (f"Rozdania: {self.deals}  wygrane: {self.wins} ({self.win_rate:.1%} rozstrzygniętych)  "
+                f"przegrane: {self.losses}  nierozstrzygnięte: {self.unknown}  "
+                f"śr. ruchów do wygranej: {self.average_win_moves:.1f}  śr. czas: {average_ms:.1f} ms")
+        if self.cached:
+            line += f"  z bazy: {self.cached}"
+        return line
+
+    # Histogramy liczby ruchów (wygrane rozdania) i kart na kupkach końcowych (wszystkie rozdania)
+    def histogram_lines(self):
+        lines = ["Liczba ruchów do wygranej:"]
+        lines += self._bars(self.moves_histogram, self.MOVES_BUCKET)
+        foundation = Counter()
+        for cards, deals in self.foundation_histogram.items():
+            foundation[cards // self.FOUNDATION_BUCKET * self.FOUNDATION_BUCKET] += deals
+        lines.append("Karty na kupkach końcowych:")
+        lines += self._bars(foundation, self.FOUNDATION_BUCKET, last=52)
+        return lines
+
+    def _bars(self, histogram, bucket, last=None):
+        if not histogram:
+            return ["  (brak danych)"]
+        peak = max(histogram.values())
+        lines = []
+        for start in range(min(histogram), max(histogram) + 1, bucket):
+            deals = histogram.get(start, 0)
+            bar = "#" * round(deals / peak * self.HISTOGRAM_WIDTH)
+            end = start + bucket - 1 if last is None else min(start + bucket - 1, last)
+            lines.append(f"  {start:>4}-{end:<4} {deals:>8}  {bar}")
+        return lines
+
+# Analizuje rozdania o numerach z przedziału [first_deal, end_deal) - zadanie dla jednego procesu.
+# Zwraca statystyki i listę nowych wyników do dopisania do bazy rozdań (zapisuje je proces główny).
+def _run_shard(shard):
+    first_deal, end_deal, difficulty, max_nodes, db_path = shard
+    stats = SimulationStats()
+    new_records = []
+    database = DealDatabase(db_path) if db_path else None
+    try:
+        for deal_number in range(first_deal, end_deal):
+            result, record = solve_deal(deal_number, difficulty, max_nodes, database)
+            stats.add(result)
+            if record is not None:
+                new_records.append(record)
+            elif database is not None:
+                stats.cached += 1
+    finally:
+        if database is not None:
+            database.close()
+    return stats, new_records
+
+# Analizuje count kolejnych rozdań, dzieląc je na porcje wykonywane w puli procesów.
+# Po każdej ukończonej porcji (w kolejności numerów rozdań) wywoływane jest on_progress(stats).
+# Z bazą rozdań (database - ścieżka bez rozszerzenia, zob. dealdb.DealDatabase) rozdania już
+# przeanalizowane nie są rozwiązywane ponownie, a nowe wyniki są do niej dopisywane.
+def simulate(count, difficulty='łatwy', workers=None, first_deal=0, max_nodes=20000,
+             shard_size=None, on_progress=None, database=None):
+    workers = workers or os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(1, min(250, count // (workers * 8)))
+    shards = [(start, min(start + shard_size, first_deal + count), difficulty, max_nodes, database)
+              for start in range(first_deal, first_deal + count, shard_size)]
+
+    stats = SimulationStats()
+    db = DealDatabase(database) if database else None
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap(_run_shard, shards) if pool else map(_run_shard, shards)
+        for shard_stats, new_records in results:
+            stats.merge(shard_stats)
+            if db is not None:
+                db.append_many(new_records)
+            if on_progress:
+                on_progress(stats)
+        if db is not None:
+            db.maybe_compact()
+    finally:
+        if pool:
+            pool.terminate()
+        if db is not None:
+            db.close()
+    return stats
+
+# Uruchamia symulację z wiersza poleceń, wypisując bieżące wyniki i histogramy na końcu
+def run_simulation(count, difficulty='łatwy', workers=None, first_deal=0, max_nodes=20000, database=None):
+    print(f"Symulacja {count} rozdań (poziom: {difficulty}, rozdania od nr {first_deal}, "
+          f"limit węzłów solvera: {max_nodes})")
+
+    def show_progress(stats):
+        sys.stdout.write("\r" + stats.summary_line())
+        sys.stdout.flush()
+
+    stats = simulate(count, difficulty, workers, first_deal, max_nodes, on_progress=show_progress,
+                     database=database)
+    print()
+    for line in stats.histogram_lines():
+        print(line)
+    return stats
@@ -0,0 +1,615 @@
+import heapq
+import random
+import time
+from collections import OrderedDict, namedtuple
+
+from engine import (Move, DRAW, RESERVE, FINAL, TABLEAU,
+                    RANK_MASK, SUIT_MASK, RED_BIT, HIDDEN_BIT, ACE, KING)
+
+# Wynik analizy rozdania: solvable to True (znaleziono rozwiązanie), False (udowodniono, że
+# rozdanie jest nie do wygrania - przeszukano wszystkie osiągalne stany) albo None (przekroczono
+# limit węzłów lub czasu).
+# moves to kompletna sekwencja ruchów (łącznie z dobraniami DRAW) do odtworzenia przez Engine.apply,
+# a foundation to największa liczba kart na kupkach końcowych osiągnięta w trakcie przeszukiwania.
+SolveResult = namedtuple("SolveResult", ["solvable", "moves", "nodes", "elapsed_ms", "foundation"])
+
+# Tablice losowych kluczy Zobrista (stałe ziarno - ten sam stan ma zawsze ten sam skrót).
+# Kolumny tableau są kodowane jako relacje "karta leży na karcie", a kupki końcowe jako
+# wysokości kolorów, dzięki czemu stany różniące się tylko kolejnością kolumn lub kupek
+# końcowych mają ten sam skrót.
+_rng = random.Random(0x5EED)
+_NO_CARD = 0x3F # Znacznik "pod kartą nie ma nic" (dno kolumny)
+_Z_TABLEAU = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(256)]
+_Z_FINAL = [[_rng.getrandbits(64) for _ in range(14)] for _ in range(4)]
+_Z_STOCK = [[_rng.getrandbits(64) for _ in range(52)] for _ in range(64)]
+_Z_WASTE = [[_rng.getrandbits(64) for _ in range(52)] for _ in range(64)]
+_Z_WINDOW = [[_rng.getrandbits(64) for _ in range(3)] for _ in range(64)]
+_Z_CURRENT = [_rng.getrandbits(64) for _ in range(64)]
+_Z_REVEALED = _rng.getrandbits(64)
+del _rng
+
+# Priorytet wpisów kolejki rozwijających stan zamianami ciągów (Solver._swaps) - po wszystkich
+# zwykłych stanach
+_SWAPS = 1 << 30
+
+# Skrót Zobrista stanu stosu rezerwowego (stos, waste, okno trzech kart i aktywna karta)
+def stock_hash(engine):
+    h = _Z_REVEALED if engine.first_reveal_done else 0
+    for i, card in enumerate(engine.reserve_stock):
+        h ^= _Z_STOCK[card & 0x3F][i]
+    for i, card in enumerate(engine.waste_pile):
+        h ^= _Z_WASTE[card & 0x3F][i]
+    for i, card in enumerate(engine.visible_draw3_cards):
+        if card is not None:
+            h ^= _Z_WINDOW[card & 0x3F][i]
+    if engine.current_reserve_card is not None:
+        h ^= _Z_CURRENT[engine.current_reserve_card & 0x3F]
+    return h
+
+# Skrót Zobrista całego stanu planszy
+def zobrist_hash(engine):
+    return board_hash(engine) ^ stock_hash(engine)
+
+# Skrót Zobrista tableau i kupek końcowych
+def board_hash(engine):
+    h = 0
+    for column in engine.tableau:
+        below = _NO_CARD
+        for card in column:
+            h ^= _Z_TABLEAU[card][below]
+            below = card & 0x3F
+    for stack in engine.final_stacks:
+        if stack:
+            h ^= _Z_FINAL[(stack[0] & SUIT_MASK) >> 4][len(stack)]
+    return h
+
+# Tablica transpozycji o ograniczonym rozmiarze: po przekroczeniu limitu usuwany jest
+# najdawniej używany wpis
+class TranspositionTable:
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        entries = self._entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+# Sprawdza, czy odłożenie karty na kupkę końcową na pewno nie odbiera wygranej, także przy
+# zdejmowaniu kart z kupek końcowych z powrotem do tableau: na kupkach leżą już obie karty
+# przeciwnego koloru o wartości o jeden niższej i wszystkie karty niższe o dwa lub więcej.
+# Każdą kartę, którą dałoby się (pośrednio) położyć na tej karcie w tableau, można wtedy zostawić
+# na kupce końcowej, więc każdą wygraną z tableau da się powtórzyć bez niej. Asy i dwójki są zawsze
+# bezpieczne (As nie przyjmuje żadnej karty, a As położony na dwójce może zamiast tego trafić
+# na kupkę końcową). Warunek jest ostrzejszy niż Engine.is_safe_for_final.
+def is_provably_safe(state, card):
+    rank = card & RANK_MASK
+    if rank <= 1:
+        return True
+    heights = state.foundation_heights
+    suit = (card & SUIT_MASK) >> 4
+    if card & RED_BIT:
+        opposite = min(heights[0], heights[3]) # ♠ i ♣
+    else:
+        opposite = min(heights[1], heights[2]) # ♥ i ♦
+    return opposite >= rank and heights[3 - suit] >= rank - 1 # Drugi kolor tej samej barwy: ♠ <-> ♣, ♥ <-> ♦
+
+# Skrót stanu do rozpoznawania powtórzeń w solverze. W trybie łatwym dobieranie przechodzi tam
+# i z powrotem po wszystkich kartach rezerwy, więc każdą z nich można zagrać w dowolnej chwili,
+# a zagranie karty nie odbiera dostępu do pozostałych. O tym, czy rozdanie da się wygrać, decyduje
+# wtedy tylko tableau i kupki końcowe (karty rezerwy to wszystkie pozostałe) - stany różniące się
+# tylko miejscem dobierania mają ten sam skrót.
+def solver_key(engine):
+    if engine.difficulty == 'trudny':
+        return zobrist_hash(engine)
+    return board_hash(engine)
+
+# Wagi oceny stanu, według której przeszukiwanie wybiera kolejny stan: karty na kupkach końcowych,
+# zakryte karty w kolumnach i puste kolumny
+FOUNDATION_WEIGHT = 10
+HIDDEN_WEIGHT = 8
+EMPTY_COLUMN_WEIGHT = 4
+
+def _score(state):
+    score = FOUNDATION_WEIGHT * sum(state.foundation_heights)
+    for idx, column in enumerate(state.tableau):
+        if column:
+            score -= HIDDEN_WEIGHT * state.column_info(idx).first_up
+        else:
+            score += EMPTY_COLUMN_WEIGHT
+    return score
+
+# Sekwencja ruchów łańcucha (Solver._chains) wraz ze skrótem, oceną i informacją, czy grę da się
+# dokończyć, dla stanu po jej wykonaniu (atrybut child - wyliczany przy tworzeniu łańcucha)
+class _Chain(tuple):
+    pass
+
+# Przeszukiwanie "najpierw najlepszy": z kolejki priorytetowej rozwijany jest zawsze stan o najlepszej
+# ocenie, a każdy stan (rozpoznawany po solver_key) jest rozwijany co najwyżej raz. Ruchy z rezerwy
+# są łączone z dobraniami potrzebnymi do dotarcia do karty ("dobierz k razy i zagraj"), więc drzewo
+# nie rozgałęzia się na każdym pojedynczym dobraniu. Skrót i ocena następnika są wyliczane z różnic
+# względem rozwijanego stanu, bez wykonywania ruchów - ruchy wykonywane są dopiero przy rozwijaniu.
+# _ordered_moves pomija tylko ruchy, które na pewno nie zmieniają wyniku (albo da się je odłożyć do
+# chwili, gdy coś z nich skorzysta - wtedy są łączone z tym ruchem w jedną sekwencję), więc wyczerpanie
+# kolejki dowodzi, że rozdania nie da się wygrać.
+class Solver:
+    def __init__(self, max_nodes=200000, time_limit=None, table_size=200000):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self._reserve_cache = TranspositionTable(table_size // 4 or 1)
+        self.nodes = 0
+        self._swappable = False # Czy ostatnie wywołanie _ordered_moves pominęło jakieś zamiany ciągów
+
+    # Szuka sekwencji ruchów wygrywającej rozdanie od podanego stanu (stan nie jest zmieniany)
+    def solve(self, engine):
+        started = time.perf_counter()
+        deadline = None if self.time_limit is None else started + self.time_limit
+        self.nodes = 0
+        self.best_foundation = sum(engine.foundation_heights)
+        state = engine.copy()
+        if self._finished(state):
+            return self._result(True, self._finish_moves(state), started)
+
+        draw3 = state.difficulty == 'trudny'
+        root = solver_key(state)
+        parents = {root: None} # skrót -> (skrót stanu poprzedniego, sekwencja ruchów) - wszystkie znane stany
+        saved = {}             # skrót -> zapis stanu (Engine.save_state) - stany już rozwinięte
+        # Wpisy kolejki: (-ocena, -numer wpisu, skrót, czy rozwinąć zamianami ciągów); przy równej ocenie
+        # najpierw rozwijane są stany znalezione najpóźniej, jak w przeszukiwaniu w głąb
+        frontier = [(-_score(state), 0, root, False)]
+        order = 0
+        while frontier:
+            priority, _, key, swaps = heapq.heappop(frontier)
+            self.nodes += 1
+            if self.nodes > self.max_nodes or \
+                    (deadline is not None and self.nodes & 0xFF == 0 and time.perf_counter() > deadline):
+                return self._result(None, [], started)
+            if swaps:
+                state.load_state(saved[key])
+                score = _score(state)
+                sequences = self._ordered_moves(state, swaps=True)
+            else:
+                if key != root:
+                    self._restore(state, parents[key], saved)
+                saved[key] = state.save_state()
+                score = -priority
+                sequences = self._ordered_moves(state)
+                if self._swappable:
+                    heapq.heappush(frontier, (_SWAPS, order, key, True))
+                    order += 1
+
+            hidden = sum(state.column_info(idx).first_up for idx in range(7))
+            on_board = sum(map(len, state.tableau)) + sum(state.foundation_heights)
+            reach = dict(state.reserve_reach(self._reserve_cache))
+            stock_before = stock_hash(state) if draw3 else 0
+            # Najbardziej obiecujące ruchy trafiają do kolejki na końcu, żeby przy równej ocenie były pierwsze
+            for sequence in reversed(sequences):
+                move = sequence[-1]
+                if type(sequence) is _Chain:
+                    child, child_score, won = sequence.child
+                else:
+                    child, child_score, revealed = self._child(state, key, score, sequence, reach)
+                    if draw3 and move.src == RESERVE:
+                        child ^= stock_before ^ self._stock_after(state, sequence)
+                    # W trybie łatwym karty rezerwy są zawsze dostępne, więc liczy się tylko tableau (_finished)
+                    won = hidden == revealed and (not draw3 or on_board + (move.src == RESERVE) == 52)
+                if child in parents:
+                    continue
+                parents[child] = (key, sequence)
+                if move.dst == FINAL and sum(state.foundation_heights) + 1 > self.best_foundation:
+                    self.best_foundation = sum(state.foundation_heights) + 1
+                if won:
+                    self._restore(state, (key, sequence), saved)
+                    return self._result(True, self._moves_to(child, parents) + self._finish_moves(state), started)
+                order += 1
+                heapq.heappush(frontier, (-child_score, -order, child, False))
+        return self._result(False, [], started)
+
+    def _result(self, solvable, moves, started):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if solvable:
+            self.best_foundation = 52
+        return SolveResult(solvable, moves, self.nodes, elapsed_ms, self.best_foundation)
+
+    # Skrót i ocena stanu po sekwencji z jednym ruchem (poza dobraniami), bez wykonywania jej, oraz
+    # liczba odkrytych przez nią kart; reach to słownik liczba dobrań -> karta rezerwy. Zmiana rezerwy
+    # w trybie trudnym nie jest tu uwzględniana (_stock_after).
+    @staticmethod
+    def _child(state, key, score, sequence, reach):
+        move = sequence[-1]
+        revealed = 0
+        if move.src == TABLEAU:
+            column = state.tableau[move.src_idx]
+            start = len(column) - move.count
+            card = column[start]
+            if start:
+                under = column[start - 1]
+                key ^= _Z_TABLEAU[card][under & 0x3F]
+                if under & HIDDEN_BIT: # Karta pod spodem zostanie odkryta
+                    below = column[start - 2] & 0x3F if start > 1 else _NO_CARD
+                    key ^= _Z_TABLEAU[under][below] ^ _Z_TABLEAU[under ^ HIDDEN_BIT][below]
+                    score += HIDDEN_WEIGHT
+                    revealed = 1
+            else:
+                key ^= _Z_TABLEAU[card][_NO_CARD]
+                score += EMPTY_COLUMN_WEIGHT
+        elif move.src == FINAL:
+            card = state.final_stacks[move.src_idx][-1]
+            suit = (card & SUIT_MASK) >> 4
+            height = state.foundation_heights[suit]
+            key ^= _Z_FINAL[suit][height]
+            if height > 1:
+                key ^= _Z_FINAL[suit][height - 1]
+            score -= FOUNDATION_WEIGHT
+        else:
+            card = reach[len(sequence) - 1]
+
+        if move.dst == FINAL:
+            suit = (card & SUIT_MASK) >> 4
+            height = state.foundation_heights[suit]
+            if height:
+                key ^= _Z_FINAL[suit][height]
+            key ^= _Z_FINAL[suit][height + 1]
+            score += FOUNDATION_WEIGHT
+        else:
+            column = state.tableau[move.dst_idx]
+            if column:
+                key ^= _Z_TABLEAU[card][column[-1] & 0x3F]
+            else:
+                key ^= _Z_TABLEAU[card][_NO_CARD]
+                score -= EMPTY_COLUMN_WEIGHT
+        return key, score, revealed
+
+    # Skrót stanu rezerwy po wykonaniu sekwencji ruchów z rezerwy (stan jest przywracany)
+    @staticmethod
+    def _stock_after(state, sequence):
+        for move in sequence:
+            state._perform(move)
+        h = stock_hash(state)
+        for _ in sequence:
+            state.undo()
+        state.redo_moves.clear()
+        return h
+
+    # Ustawia state w stanie powstałym ze stanu zapisanego w saved po sekwencji ruchów (link to para
+    # skrót stanu poprzedniego, sekwencja)
+    @staticmethod
+    def _restore(state, link, saved):
+        parent, sequence = link
+        state.load_state(saved[parent])
+        for move in sequence:
+            state._perform(move)
+
+    # Ruchy od stanu początkowego do stanu o podanym skrócie
+    @staticmethod
+    def _moves_to(key, parents):
+        sequences = []
+        while parents[key] is not None:
+            key, sequence = parents[key]
+            sequences.append(sequence)
+        return [move for sequence in reversed(sequences) for move in sequence]
+
+    # Sprawdza, czy grę da się już dokończyć samymi ruchami na kupki końcowe: wszystkie karty
+    # w kolumnach są odkryte, a w trybie trudnym rezerwa jest pusta. W trybie łatwym każda karta
+    # rezerwy jest dostępna w dowolnej chwili, a odkryte kolumny są poprawnymi ciągami, więc
+    # najniższa karta poza kupkami końcowymi zawsze może na nie trafić.
+    @staticmethod
+    def _finished(state):
+        if state.difficulty == 'trudny':
+            return state.can_auto_finish()
+        return not any(column and column[0] & HIDDEN_BIT for column in state.tableau)
+
+    # Dokańcza wygraną grę (stan spełnia _finished), zwracając wykonane ruchy
+    def _finish_moves(self, state):
+        moves = []
+        while not state.is_won():
+            for col_idx, column in enumerate(state.tableau):
+                if not column:
+                    continue
+                dst_idx = state.final_target(column[-1])
+                if dst_idx is not None:
+                    sequence = (Move(TABLEAU, col_idx, FINAL, dst_idx, 1),)
+                    break
+            else:
+                for draws, card in state.reserve_reach(self._reserve_cache):
+                    dst_idx = state.final_target(card)
+                    if dst_idx is not None:
+                        sequence = (DRAW,) * draws + (Move(RESERVE, 0, FINAL, dst_idx, 1),)
+                        break
+                else:
+                    break
+            for move in sequence:
+                state._perform(move)
+            moves.extend(sequence)
+        return moves
+
+    # Generuje dozwolone ruchy (jako sekwencje ruchów silnika) w kolejności od najbardziej
+    # obiecujących. Jeśli istnieje ruch na kupkę końcową, który na pewno nie odbiera wygranej
+    # (is_provably_safe), zwracany jest tylko on. Ruchy, które same niczego nie dają, są łączone
+    # z ruchem, który z nich korzysta: karty z kupek końcowych i (w trybie łatwym) z rezerwy trafiają
+    # do tableau w łańcuchach zakończonych przeniesieniem na nie ciągu z innej kolumny (_chains),
+    # karty z rezerwy na kupki końcowe - razem z następną kartą koloru z tableau, a przeniesienie
+    # części ciągu - razem z położeniem na odsłoniętej karcie innej karty (_swaps).
+    def _ordered_moves(self, state, swaps=False):
+        to_final = []
+        reveals = []
+        from_reserve = []
+        tableau_moves = []
+        partial = []
+        self._swappable = False
+        tableau = state.tableau
+        easy = state.difficulty != 'trudny'
+        empty_column = None
+        targets = {} # (wartość, bit czerwieni) karty -> kolumny, na których można ją położyć
+        for idx, column in enumerate(tableau):
+            if not column:
+                if empty_column is None:
+                    empty_column = idx # Wszystkie puste kolumny są równoważne - wystarczy pierwsza
+                continue
+            top = column[-1]
+            if not top & HIDDEN_BIT and top & RANK_MASK != ACE:
+                targets.setdefault(((top & RANK_MASK) - 1, ~top & RED_BIT), []).append(idx)
+        kings = () if empty_column is None else (empty_column,)
+        finals = {} # kod karty -> kupka końcowa, na którą można ją położyć
+        for idx, stack in enumerate(state.final_stacks):
+            if stack:
+                if stack[-1] & RANK_MASK != KING:
+                    finals[stack[-1] + 1] = idx # Następna karta tego samego koloru ma kod większy o 1
+            elif ACE not in finals:
+                finals[ACE] = idx
+        hidden_counts = [0] * 7
+        caps = {} # (wartość, bit czerwieni) karty -> ruchy kończące łańcuch (_chains)
+
+        def final_target(card):
+            return finals.get(ACE if card & RANK_MASK == ACE else card)
+
+        def tableau_targets(card):
+            if card & RANK_MASK == KING:
+                return kings
+            return targets.get((card & RANK_MASK, card & RED_BIT), ())
+
+        for src_idx, column in enumerate(tableau):
+            if not column:
+                continue
+            top = column[-1]
+            dst_idx = final_target(top)
+            if dst_idx is not None:
+                move = Move(TABLEAU, src_idx, FINAL, dst_idx, 1)
+                if is_provably_safe(state, top):
+                    return [(move,)]
+                to_final.append((move,))
+
+            # Przenosić można każdą część poprawnego ciągu na wierzchu kolumny
+            first_up, run_length, _ = state.column_info(src_idx)
+            hidden_counts[src_idx] = first_up
+            for start in range(len(column) - run_length, len(column)):
+                card = column[start]
+                if start == first_up:
+                    # Cały ciąg odkrytych kart: ma sens, jeśli odsłoni zakrytą kartę albo opróżni
+                    # kolumnę (przeniesienie Króla z dna kolumny daje stan równoważny). Pusta kolumna
+                    # przydaje się tylko Królowi, a gdy jakaś już jest, Król może trafić do niej - ciąg
+                    # może więc zostać na miejscu, dopóki wszystkie kolumny są zajęte.
+                    if start == 0 and (card & RANK_MASK == KING or empty_column is not None):
+                        continue
+                    useful = reveals
+                else:
+                    # Część ciągu: sama tylko wtedy, gdy odsłonięta karta może trafić na kupkę końcową
+                    useful = tableau_moves
+                    if final_target(column[start - 1]) is None:
+                        hosted = [] # Łańcuchy zakończone przeniesieniem tej części ciągu (_chains)
+                        partial.append((src_idx, start, hosted))
+                        caps.setdefault((card & RANK_MASK, card & RED_BIT), []).append(
+                            (src_idx, len(column) - start, hosted))
+                        continue
+                count = len(column) - start
+                for dst_idx in tableau_targets(card):
+                    if dst_idx != src_idx:
+                        useful.append((Move(TABLEAU, src_idx, TABLEAU, dst_idx, count),))
+                caps.setdefault((card & RANK_MASK, card & RED_BIT), []).append((src_idx, count, useful))
+
+        seen = set()
+        for draws, card in state.reserve_reach(self._reserve_cache):
+            if easy:
+                # W trybie łatwym liczba dobrań nie ma znaczenia (solver_key) - wystarczy najmniejsza
+                if card in seen:
+                    continue
+                seen.add(card)
+            dst_idx = final_target(card)
+            if dst_idx is not None:
+                sequence = (DRAW,) * draws + (Move(RESERVE, 0, FINAL, dst_idx, 1),)
+                # Tylko w trybie łatwym: zdjęcie karty nie odbiera tam dostępu do pozostałych, a w trybie
+                # trudnym zmienia ich podział na trójki
+                if easy and is_provably_safe(state, card):
+                    return [sequence]
+                if not easy:
+                    from_reserve.append(sequence)
+            if easy:
+                continue
+            for dst_idx in tableau_targets(card):
+                from_reserve.append((DRAW,) * draws + (Move(RESERVE, 0, TABLEAU, dst_idx, 1),))
+            # W trybie trudnym łańcuch kart z kupek końcowych może zakończyć karta z rezerwy - ruchy
+            # z kupek końcowych nie zmieniają rezerwy, więc liczba dobrań pozostaje ta sama
+            caps.setdefault((card & RANK_MASK, card & RED_BIT), []).append((None, draws, from_reserve))
+
+        if easy:
+            # W trybie łatwym karta rezerwy może czekać, aż na kupkę końcową trafi z tableau następna
+            # karta jej koloru - wtedy wszystkie brakujące karty koloru z rezerwy trafiają tam razem z nią
+            heights = state.foundation_heights
+            for src_idx, column in enumerate(tableau):
+                if not column:
+                    continue
+                top = column[-1]
+                rank = top & RANK_MASK
+                height = heights[(top & SUIT_MASK) >> 4]
+                missing = [top - rank + r for r in range(height, rank)] # Ten sam kolor, niższe wartości
+                if missing and all(card in seen for card in missing):
+                    self._emit_to_final(state, missing, src_idx, to_final)
+
+        links = {} # (wartość, bit czerwieni) karty -> karty, które mogą zacząć lub przedłużyć łańcuch (_chains)
+        for idx, stack in enumerate(state.final_stacks):
+            if stack:
+                links.setdefault((stack[-1] & RANK_MASK, stack[-1] & RED_BIT), []).append((stack[-1], idx))
+        if easy:
+            for card in seen:
+                links.setdefault((card & RANK_MASK, card & RED_BIT), []).append((card, None))
+        for dst_idx, column in enumerate(tableau):
+            if column:
+                top = column[-1]
+                if top & HIDDEN_BIT or top & RANK_MASK == ACE:
+                    continue
+                wanted = (((top & RANK_MASK) - 1, ~top & RED_BIT),)
+            elif dst_idx == empty_column:
+                wanted = ((KING, 0), (KING, RED_BIT))
+            else:
+                continue
+            for key in wanted:
+                for link in links.get(key, ()):
+                    self._chains(state, dst_idx, [link], links, caps)
+        # Zamiany ciągów rzadko się przydają, a ich wyliczenie jest kosztowne - solver rozwija nimi stan
+        # osobno, dopiero gdy wyczerpie wszystkie inne (_swappable mówi, czy w ogóle jakieś są)
+        self._swappable = bool(partial)
+        if swaps:
+            found = []
+            for src_idx, start, hosted in partial:
+                self._swaps(state, src_idx, start, tableau_targets, hosted, links, easy, found)
+            return found
+
+        # Najpierw odsłaniaj karty w kolumnach z największą liczbą kart zakrytych
+        reveals.sort(key=lambda sequence: -hidden_counts[sequence[-1].src_idx])
+        return to_final + reveals + from_reserve + tableau_moves
+
+    # Przeniesienie części ciągu (od pozycji start kolumny src_idx), które odsłania kartę niemogącą
+    # trafić na kupkę końcową, ma sens tylko wtedy, gdy na odsłoniętą kartę trafi potem inna karta -
+    # a może to być tylko karta tej samej wartości i barwy co przeniesiona ("bliźniak"). Do tego czasu
+    # ciąg może zostać na miejscu, więc dopisywane są tylko sekwencje: przeniesienie ciągu (na inną
+    # kolumnę albo na łańcuch z hosted) i położenie bliźniaka (z jego ciągiem z innej kolumny albo
+    # łańcuchem z rezerwy i kupek końcowych).
+    def _swaps(self, state, src_idx, start, tableau_targets, hosted, links, easy, useful):
+        column = state.tableau[src_idx]
+        card = column[start]
+        suit = (card & SUIT_MASK) >> 4
+        twin = card + ((3 - 2 * suit) << 4) # ♠ <-> ♣, ♥ <-> ♦
+        key = (twin & RANK_MASK, twin & RED_BIT)
+        if twin in column or not (links.get(key) or
+                                  any(twin in other for idx, other in enumerate(state.tableau) if idx != src_idx)):
+            return
+        count = len(column) - start
+        moves = [(Move(TABLEAU, src_idx, TABLEAU, dst_idx, count),)
+                 for dst_idx in tableau_targets(card) if dst_idx != src_idx]
+        for moved in moves + hosted:
+            for move in moved:
+                state._perform(move)
+            placements = []
+            caps = {} # Ciągi, które mogą zakończyć łańcuch (_chains) w stanie po przeniesieniu
+            for idx, other in enumerate(state.tableau):
+                if idx == src_idx or not other:
+                    continue
+                first_up, run_length, _ = state.column_info(idx)
+                for pos in range(len(other) - run_length, len(other)):
+                    caps.setdefault((other[pos] & RANK_MASK, other[pos] & RED_BIT), []).append(
+                        (idx, len(other) - pos, placements))
+                    if other[pos] == twin:
+                        placement = Move(TABLEAU, idx, TABLEAU, src_idx, len(other) - pos)
+                        state._perform(placement)
+                        useful.append(self._chain(state, tuple(moved) + (placement,)))
+                        state.undo()
+            if not easy:
+                for draws, reserve_card in state.reserve_reach(self._reserve_cache):
+                    caps.setdefault((reserve_card & RANK_MASK, reserve_card & RED_BIT), []).append(
+                        (None, draws, placements))
+            for link in links.get(key, ()):
+                if link[0] == twin:
+                    self._chains(state, src_idx, [link], links, caps)
+            for sequence in placements:
+                chain = _Chain(tuple(moved) + sequence)
+                chain.child = sequence.child
+                useful.append(chain)
+            for _ in moved:
+                state.undo()
+        state.redo_moves.clear()
+
+    # Łańcuchy kart kładzionych na kolumnę dst_idx z kupek końcowych i (w trybie łatwym) z rezerwy.
+    # Taka karta ma sens w tableau dopiero wtedy, gdy coś zostanie na nią przeniesione - do tego czasu
+    # może czekać na swoim miejscu (karty rezerwy w trybie łatwym są zawsze dostępne). Wystarczy więc
+    # sprawdzać łańcuchy zakończone przeniesieniem na ostatnią kartę ciągu z innej kolumny (caps).
+    # chain to lista par (karta, indeks kupki końcowej albo None dla karty z rezerwy).
+    def _chains(self, state, dst_idx, chain, links, caps):
+        card = chain[-1][0]
+        if card & RANK_MASK == ACE:
+            return
+        key = ((card & RANK_MASK) - 1, ~card & RED_BIT)
+        ends = [cap for cap in caps.get(key, ()) if cap[0] != dst_idx]
+        if ends:
+            self._emit_chain(state, dst_idx, chain, ends)
+        for link in links.get(key, ()):
+            self._chains(state, dst_idx, chain + [link], links, caps)
+
+    # Zamienia łańcuch na ruchy silnika (wykonując je na state, żeby policzyć dobrania) i dopisuje
+    # sekwencje zakończone każdym z ruchów ends na listę, na którą trafia sam ruch kończący
+    def _emit_chain(self, state, dst_idx, chain, ends):
+        prefix = []
+        for card, final_idx in chain:
+            if final_idx is None:
+                draws = next(d for d, c in state.reserve_reach(self._reserve_cache) if c == card)
+                link = (DRAW,) * draws + (Move(RESERVE, 0, TABLEAU, dst_idx, 1),)
+            elif is_provably_safe(state, card):
+                break # Zdjęcie wcześniejszych kart łańcucha nie uczyniło tej karty zbędną na kupce końcowej
+            else:
+                link = (Move(FINAL, final_idx, TABLEAU, dst_idx, 1),)
+            for move in link:
+                state._perform(move)
+            prefix.extend(link)
+        else:
+            prefix = tuple(prefix)
+            for src_idx, count, useful in ends:
+                if src_idx is None: # Karta z rezerwy (tryb trudny), count to liczba dobrań
+                    end = (DRAW,) * count + (Move(RESERVE, 0, TABLEAU, dst_idx, 1),)
+                else:
+                    end = (Move(TABLEAU, src_idx, TABLEAU, dst_idx, count),)
+                for move in end:
+                    state._perform(move)
+                useful.append(self._chain(state, prefix + end))
+                for _ in end:
+                    state.undo()
+        for _ in prefix:
+            state.undo()
+        state.redo_moves.clear()
+
+    # Dopisuje do useful sekwencję: karty cards z rezerwy (tryb łatwy) na kupki końcowe, a po nich
+    # wierzchnia karta kolumny src_idx
+    def _emit_to_final(self, state, cards, src_idx, useful):
+        sequence = []
+        for card in cards:
+            draws = next(d for d, c in state.reserve_reach(self._reserve_cache) if c == card)
+            sequence.extend((DRAW,) * draws)
+            sequence.append(Move(RESERVE, 0, FINAL, state.final_target(card), 1))
+            for move in sequence[-draws - 1:]:
+                state._perform(move)
+        move = Move(TABLEAU, src_idx, FINAL, state.final_target(state.tableau[src_idx][-1]), 1)
+        state._perform(move)
+        sequence.append(move)
+        useful.append(self._chain(state, sequence))
+        for _ in sequence:
+            state.undo()
+        state.redo_moves.clear()
+
+    # Łańcuch z ruchów sequence, wykonanych już na state
+    def _chain(self, state, sequence):
+        chain = _Chain(sequence)
+        chain.child = solver_key(state), _score(state), self._finished(state)
+        return chain
+
+# Sprawdza, czy rozdanie (stan silnika) da się wygrać i zwraca wynik wraz z sekwencją ruchów
+def solve(engine, max_nodes=200000, time_limit=None, table_size=200000):
+    return Solver(max_nodes, time_limit, table_size).solve(engine)
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+from rich.console import Console
+
+import inputs
+from engine import legal_moves
+from pasjans import Game
+from render import TerminalRenderer
+
+# Gra z konsolą i rendererem piszącymi do pamięci, uruchamiana w katalogu tymczasowym
+# (dziennik, ranking i powtórki nie trafiają do katalogu projektu)
+@pytest.fixture
+def game(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Game, "_load_banner", lambda self: "PASJANS\n")
+    def make():
+        game = Game()
+        game.rich_console = Console(file=io.StringIO(), width=120)
+        game.renderer = TerminalRenderer(io.StringIO())
+        return game
+    return make
+
+# Klawisze menu podawane po kolei zamiast odczytu z klawiatury
+def _press(monkeypatch, *keys):
+    pending = list(keys)
+    monkeypatch.setattr(inputs.KeyboardInput, "read_key", staticmethod(lambda: pending.pop(0)))
+
+# Przerwana gra (dziennik z kilkoma ruchami) wybrana w menu opcją 4 jest odtwarzana przez run()
+def test_menu_resumes_last_game(game, monkeypatch):
+    played = game()
+    played.difficulty = 'trudny'
+    played._initialize_game_state(11)
+    played._start_journal()
+    for _ in range(5):
+        move = next(iter(legal_moves(played.engine)))
+        assert played.engine.apply(move)
+        played.journal.record_move(move, False)
+    played.journal.close()
+    expected = played.engine.save_state()
+
+    resumed = game()
+    _press(monkeypatch, '4')
+    states = []
+    monkeypatch.setattr(Game, "_run_event_loop", lambda self, handlers: states.append(self.engine.save_state()))
+    resumed.run()
+
+    assert states == [expected]
+    assert resumed.difficulty == 'trudny'
+    assert resumed.engine.move_count == played.engine.move_count
+
+# Bez zapisanej gry opcja 4 jest ignorowana, a gra zaczyna się od wybranego poziomu
+def test_menu_without_saved_game_starts_new_game(game, monkeypatch):
+    fresh = game()
+    _press(monkeypatch, '4', '1')
+    states = []
+    monkeypatch.setattr(Game, "_run_event_loop", lambda self, handlers: states.append(self.engine.move_count))
+    fresh.run()
+
+    assert states == [0]
+    assert fresh.difficulty == 'łatwy'
+    assert not fresh.resume_requested
+
+# Powtórka jest zapisywana tylko po grze z ruchami, a w katalogu zostaje najwyżej REPLAY_KEEP powtórek
+def test_replay_saved_only_after_moves_and_pruned(game, monkeypatch, tmp_path):
+    monkeypatch.setattr(Game, "REPLAY_KEEP", 3)
+    replays = tmp_path / Game.REPLAY_DIR
+    replays.mkdir()
+    for stamp in range(5):
+        (replays / f"2020010{stamp}-000000.replay").write_bytes(b"")
+
+    played = game()
+    _press(monkeypatch, '1')
+    monkeypatch.setattr(Game, "_run_event_loop",
+                        lambda self, handlers: self._apply_move(next(iter(legal_moves(self.engine)))))
+    played.run()
+    names = sorted(path.name for path in replays.iterdir())
+    assert len(names) == 3
+    assert names[:2] == ["20200103-000000.replay", "20200104-000000.replay"]
+
+    # Wznowiona gra przerwana bez nowego ruchu nie dodaje powtórki
+    (replays / names[-1]).unlink()
+    resumed = game()
+    _press(monkeypatch, '4')
+    monkeypatch.setattr(Game, "_run_event_loop", lambda self, handlers: None)
+    resumed.run()
+    assert sorted(path.name for path in replays.iterdir()) == names[:2]
@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from render import TerminalRenderer
+
+pyte = pytest.importorskip("pyte")
+
+COLUMNS = 80
+ROWS = 24
+
+# Terminal emulowany przez pyte, do którego trafia wszystko, co wysyła renderer
+class _Terminal:
+    def __init__(self):
+        self.screen = pyte.Screen(COLUMNS, ROWS)
+        self.screen.set_mode(pyte.modes.LNM) # "\n" przechodzi na początek wiersza, jak w terminalu z ONLCR
+        self.stream = pyte.Stream(self.screen)
+        self.output = io.StringIO()
+
+    def feed(self):
+        self.stream.feed(self.output.getvalue())
+        self.output.seek(0)
+        self.output.truncate()
+
+    def rows(self):
+        return [row.rstrip() for row in self.screen.display]
+
+def _frame(height, marker):
+    return "".join(f"wiersz {row:02d}{' ' + marker if row % 3 == 0 else ''}\n" for row in range(height))
+
+@pytest.fixture
+def terminal(monkeypatch):
+    monkeypatch.setenv("COLUMNS", str(COLUMNS))
+    monkeypatch.setenv("LINES", str(ROWS))
+    return _Terminal()
+
+def _draw(terminal, renderer, text):
+    renderer.draw(text)
+    terminal.feed()
+
+# Kolejne klatki niższe od terminala są nanoszone jako różnice i dają ten sam ekran co pełne przerysowanie
+def test_diff_frames_fit_in_terminal(terminal):
+    renderer = TerminalRenderer(terminal.output)
+    _draw(terminal, renderer, _frame(10, "A"))
+    _draw(terminal, renderer, _frame(12, "B"))
+    assert terminal.rows()[:12] == _frame(12, "B").rstrip("\n").split("\n")
+    assert renderer._previous is not None # Druga klatka wysłana jako różnice
+
+# Klatka wyższa od terminala przewija ekran - każda kolejna klatka musi być przerysowana w całości,
+# a na ekranie widać dolną część ostatniej klatki
+@pytest.mark.parametrize("height", [ROWS, 40, 60])
+def test_frame_taller_than_terminal(terminal, height):
+    renderer = TerminalRenderer(terminal.output)
+    for marker in ("A", "B", "C"):
+        _draw(terminal, renderer, _frame(height, marker))
+    expected = _frame(height, "C").rstrip("\n").split("\n")[-(ROWS - 1):]
+    assert terminal.rows()[:ROWS - 1] == expected
+
+# Powrót do klatki mieszczącej się w terminalu po klatce za wysokiej
+def test_frame_shrinks_below_terminal_height(terminal):
+    renderer = TerminalRenderer(terminal.output)
+    _draw(terminal, renderer, _frame(40, "A"))
+    _draw(terminal, renderer, _frame(10, "B"))
+    _draw(terminal, renderer, _frame(10, "C"))
+    assert terminal.rows()[:10] == _frame(10, "C").rstrip("\n").split("\n")
+    assert all(row == "" for row in terminal.rows()[10:])